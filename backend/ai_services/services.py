@@ -10,6 +10,7 @@ import io
 import requests
 from .models import AIWasteClassification, AIChatConversation, AIChatMessage, AIModelPerformance
 from items.models import Item, Category
+from items.prices import price_index
 
 class WasteClassificationService:
     """خدمة تصنيف المخلفات بالذكاء الاصطناعي"""
@@ -58,7 +59,7 @@ class WasteClassificationService:
         except Exception as e:
             raise Exception(f"خطأ في تحويل الصورة: {str(e)}")
     
-    def classify_waste_image(self, image_path: str, item_description: str = "") -> Dict:
+    def classify_waste_image(self, image_path: str, item_description: str = "", item: Optional[Item] = None) -> Dict:
         """تصنيف صورة المخلفات"""
         start_time = time.time()
         
@@ -126,7 +127,7 @@ class WasteClassificationService:
             processing_time = time.time() - start_time
             
             # تنسيق النتيجة
-            formatted_result = self._format_classification_result(result, processing_time)
+            formatted_result = self._format_classification_result(result, processing_time, item)
             
             return formatted_result
             
@@ -146,7 +147,6 @@ class WasteClassificationService:
             'material_composition': {},
             'recyclability_score': 0.5,
             'environmental_impact': 'medium',
-            'price_range': {'min': 0, 'max': 100},
             'recycling_tips': 'يرجى مراجعة خبير إعادة التدوير',
             'safety_warnings': ''
         }
@@ -159,7 +159,17 @@ class WasteClassificationService:
         
         return result
     
-    def _format_classification_result(self, result: Dict, processing_time: float) -> Dict:
+    def suggest_price_range(self, category: str, item: Optional[Item] = None) -> Optional[Dict]:
+        """نطاق السعر من أسعار المنتجات المشابهة في المنصة (فئة، حالة، وحدة)"""
+        if item is None:
+            return None
+        category_id = Category.objects.filter(name=category).values_list('id', flat=True).cached(3600).first()
+        if category_id is None:
+            category_id = item.category_id
+        suggestion = price_index.suggest(category_id, item.condition, item.unit, item.quantity)
+        return suggestion['price_range'] if suggestion else None
+
+    def _format_classification_result(self, result: Dict, processing_time: float, item: Optional[Item] = None) -> Dict:
         """تنسيق نتيجة التصنيف"""
         category = result.get('category', 'other')
         confidence = float(result.get('confidence', 0.5))
@@ -185,7 +195,12 @@ class WasteClassificationService:
             'material_composition': result.get('material_composition', {}),
             'recyclability_score': float(result.get('recyclability_score', 0.5)),
             'environmental_impact': result.get('environmental_impact', 'medium'),
-            'suggested_price_range': result.get('price_range', {'min': 0, 'max': 100}),
+            # أسعار المنصة عند غياب تقدير النموذج
+            'suggested_price_range': (
+                result.get('price_range')
+                or self.suggest_price_range(category, item)
+                or {'min': 0, 'max': 100}
+            ),
             'recycling_tips': result.get('recycling_tips', self.recycling_tips.get(category, '')),
             'safety_warnings': result.get('safety_warnings', ''),
             'processing_time': processing_time
@@ -478,6 +493,7 @@ class AIRecommendationService:
     def _find_matching_items(self, preferences: Dict, limit: int) -> List[Dict]:
         """البحث عن منتجات مناسبة"""
         from items.models import Item
+        from items import geo
         
         # بناء استعلام قاعدة البيانات بناءً على التفضيلات
         queryset = Item.objects.filter(status='active')
@@ -490,12 +506,16 @@ class AIRecommendationService:
         if preferences.get('condition_preference'):
             queryset = queryset.filter(condition__in=preferences['condition_preference'])
         
-        # تصفية حسب الموقع
+        # تصفية حسب الموقع: الأقرب أولاً إذا أمكن تحديد المكان
         if preferences.get('location_preference'):
-            queryset = queryset.filter(location__icontains=preferences['location_preference'])
+            queryset = geo.filter_by_location(queryset, str(preferences['location_preference']))
         
         # ترتيب وتحديد العدد
-        items = queryset.order_by('-created_at')[:limit]
+        if 'distance' in queryset.query.annotations:
+            queryset = queryset.order_by('distance', '-created_at')
+        else:
+            queryset = queryset.order_by('-created_at')
+        items = queryset.select_related('category')[:limit]
         
         return [
             {
@@ -104,7 +104,7 @@ def classify_item_image(request, item_id):
         # تصنيف الصورة
         classification_service = WasteClassificationService()
         image_url = request.build_absolute_uri(primary_image.image.url)
-        result = classification_service.classify_waste_image(image_url, item.description)
+        result = classification_service.classify_waste_image(image_url, item.description, item=item)
         
         if result.get('success'):
             # حفظ النتيجة
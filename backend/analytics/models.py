@@ -2,6 +2,7 @@ from django.db import models
 from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
+from performance.cache import CachingQuerySet
 import uuid
 
 User = get_user_model()
@@ -108,6 +109,8 @@ class ABTest(models.Model):
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    objects = CachingQuerySet.as_manager()
     
     class Meta:
         db_table = 'ab_tests'
@@ -205,7 +205,7 @@ class ABTestingService:
     def assign_variant(test_name, user=None, session_id=None):
         """تعيين متغير للمستخدم في اختبار A/B"""
         try:
-            test = ABTest.objects.get(name=test_name, is_active=True)
+            test = ABTest.objects.cached(300).get(name=test_name, is_active=True)
             
             # التحقق من وجود تعيين سابق
             participant = ABTestParticipant.objects.filter(
@@ -256,7 +256,7 @@ class ABTestingService:
     def track_conversion(test_name, user=None, session_id=None, value=None):
         """تتبع التحويل في اختبار A/B"""
         try:
-            test = ABTest.objects.get(name=test_name, is_active=True)
+            test = ABTest.objects.cached(300).get(name=test_name, is_active=True)
             
             participant = ABTestParticipant.objects.filter(
                 test=test,
@@ -97,6 +97,13 @@ class ABTestViewSet(viewsets.ModelViewSet):
     queryset = ABTest.objects.all()
     serializer_class = ABTestSerializer
     permission_classes = [IsAdminUser]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        # القائمة فقط من الكاش: التعديل والحذف يقرآن الصف الحالي من قاعدة البيانات
+        if self.action == 'list':
+            return queryset.cached(300)
+        return queryset
     
     @action(detail=True, methods=['post'])
     def assign_variant(self, request, pk=None):
@@ -16,6 +16,9 @@ python manage.py migrate
 echo "إنشاء البيانات التجريبية..."
 python scripts/seed_data.py
 
+# تفريغ مقاييس العمليات السابقة (كل عامل يكتب ملفه)
+rm -rf "${METRICS_DIR:-/tmp/greenswap-metrics}"
+
 # تشغيل الخادم
 echo "تشغيل الخادم..."
 if [ "$DEBUG" = "True" ]; then
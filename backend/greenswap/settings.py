@@ -26,10 +26,13 @@ INSTALLED_APPS = [
     # Local apps
     'accounts',
     'items',
+    'performance',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'performance.middleware.PerformanceMiddleware',
+    'performance.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -118,6 +121,67 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
 }
 
+# Redis & Cache
+REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'performance.backends.TimedRedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+
+# طبقة الكاش داخل كل عملية أمام Redis
+CACHE_LOCAL_TIMEOUT = int(os.getenv('CACHE_LOCAL_TIMEOUT', 5))
+CACHE_LOCAL_MAX_BYTES = int(os.getenv('CACHE_LOCAL_MAX_BYTES', 16 * 1024 * 1024))
+# كتابة عدادات إصابات الكاش المجمعة في CacheStats كل دقيقة
+CACHE_STATS_FLUSH_INTERVAL = int(os.getenv('CACHE_STATS_FLUSH_INTERVAL', 60))
+
+# ضغط الاستجابات: أقل حجم يضغط، والنسخ المضغوطة المحفوظة في ذاكرة كل عملية
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))
+COMPRESSION_CACHE_TIMEOUT = int(os.getenv('COMPRESSION_CACHE_TIMEOUT', 300))
+COMPRESSION_CACHE_MAX_BYTES = int(os.getenv('COMPRESSION_CACHE_MAX_BYTES', 8 * 1024 * 1024))
+
+# قياس كل استعلامات SQL ببصماتها وكتابة المجاميع في QueryPerformance كل دقيقة
+SQL_MONITOR_ENABLED = os.getenv('SQL_MONITOR_ENABLED', 'True') == 'True'
+SQL_MONITOR_FLUSH_INTERVAL = int(os.getenv('SQL_MONITOR_FLUSH_INTERVAL', 60))
+SQL_SLOW_QUERY_THRESHOLD = float(os.getenv('SQL_SLOW_QUERY_THRESHOLD', 0.1))
+
+# مقاييس /metrics: ملف لكل عامل في METRICS_DIR يكتب كل METRICS_FLUSH_INTERVAL ثوانٍ
+METRICS_DIR = os.getenv('METRICS_DIR', '')
+METRICS_FLUSH_INTERVAL = int(os.getenv('METRICS_FLUSH_INTERVAL', 5))
+METRICS_ALLOWED_IPS = os.getenv('METRICS_ALLOWED_IPS', '127.0.0.1').split(',')
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Celery
+CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', REDIS_URL)
+CELERY_TASK_ROUTES = {
+    # معالجة الصور تعمل على عامل prefork مستقل (طابور images)
+    'items.tasks.generate_image_variants': {'queue': 'images'},
+}
+CELERY_BEAT_SCHEDULE = {
+    'flush-item-counters': {
+        'task': 'items.tasks.flush_item_counters',
+        'schedule': 30.0,
+    },
+    'expire-items': {
+        'task': 'items.tasks.expire_items',
+        'schedule': 300.0,
+    },
+    'reconcile-platform-stats': {
+        'task': 'items.tasks.reconcile_platform_stats',
+        'schedule': 3600.0,
+    },
+    'compact-autocomplete': {
+        'task': 'items.tasks.compact_autocomplete',
+        'schedule': 120.0,
+    },
+    'refresh-cache-keys': {
+        'task': 'items.tasks.refresh_cache_keys',
+        'schedule': 15.0,
+    },
+}
+
 # CORS
 CORS_ALLOW_ALL_ORIGINS = DEBUG
 CORS_ALLOW_CREDENTIALS = True
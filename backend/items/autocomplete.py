@@ -0,0 +1,438 @@
+import heapq
+import json
+import re
+import threading
+import time
+import uuid
+import zlib
+from bisect import bisect_left
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
+from django.core.cache import cache
+from performance.cache import advanced_cache
+from .search import normalize_text
+import redis
+import logging
+
+logger = logging.getLogger('items')
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+KIND_CATEGORY = 'category'
+KIND_ITEM = 'item'
+KIND_QUERY = 'query'
+# عند تطابق النص نفسه يعرض بنوع الأعلى أولوية
+KIND_PRIORITY = {KIND_CATEGORY: 0, KIND_ITEM: 1, KIND_QUERY: 2}
+
+MAX_KEY_LENGTH = 100
+# عدد الكلمات التي تبدأ منها مطابقة البادئة داخل النص
+MAX_WORD_STARTS = 5
+# الفئات تتقدم على العناوين المفردة
+CATEGORY_BOOST = 50
+# عمليات البحث تقترح بعد تكرارها
+MIN_QUERY_COUNT = 3
+MAX_QUERIES = 5000
+# عمليات البحث التي تحفظ عدادها في اللقطة حتى تصل للحد الأدنى
+MAX_TRACKED_QUERIES = 20000
+# البادئات القصيرة تحسب أفضل نتائجها مسبقاً لأن نطاقها في المصفوفة كبير
+PRECOMPUTED_DEPTH = 2
+PRECOMPUTED_SIZE = 50
+# أقصى عدد فروق تقرأ لكل بادئة في كل اتجاه (الأعلى زيادة والأعلى نقصاً)
+MAX_PREFIX_DELTAS = 500
+
+
+def normalize_key(text: str) -> str:
+    """النص الموحد للمطابقة: بدون تشكيل وبحروف موحدة وكلمات مفصولة بمسافة"""
+    return ' '.join(_WORD_RE.findall(normalize_text(text or '')))[:MAX_KEY_LENGTH]
+
+
+def key_prefixes(key: str) -> Set[str]:
+    """بادئات الطول 1 و2 لبدايات كلمات المفتاح (فهرس الفروق في Redis)"""
+    words = key.split(' ')
+    prefixes = set()
+    for start in range(min(len(words), MAX_WORD_STARTS)):
+        suffix = ' '.join(words[start:])
+        prefixes.update(suffix[:length] for length in range(1, min(len(suffix), PRECOMPUTED_DEPTH) + 1))
+    return prefixes
+
+
+class Snapshot:
+    """مصفوفة مرتبة من المفاتيح (وبدايات كلماتها) مع أوزان الاقتراحات
+
+    البادئة تقابل نطاقاً متصلاً في المصفوفة يوجد بالبحث الثنائي. تخزن فقط
+    الاقتراحات [النص، النوع، الوزن، المرجع] مع أوزان العناوين وعدادات البحث
+    التي بنيت منها، ويعاد بناء المصفوفة عند التحميل.
+    """
+
+    def __init__(self, entries: Dict[str, list], items: Optional[Dict[str, list]] = None,
+                 queries: Optional[Dict[str, int]] = None):
+        self.entries = entries
+        self.items = items or {}
+        self.queries = queries or {}
+        suggestions = list(entries.values())
+        rows = []
+        for index, (key, entry) in enumerate(zip(entries, suggestions)):
+            words = key.split(' ')
+            for start in range(min(len(words), MAX_WORD_STARTS)):
+                rows.append((' '.join(words[start:]), index))
+        rows.sort()
+        self.keys = [key for key, _ in rows]
+        self.rows = [index for _, index in rows]
+        self.suggestions = suggestions
+
+        self.top = {}
+        for key, index in rows:
+            for length in range(1, min(len(key), PRECOMPUTED_DEPTH) + 1):
+                self.top.setdefault(key[:length], set()).add(index)
+        for prefix, indexes in self.top.items():
+            self.top[prefix] = self._best(indexes, PRECOMPUTED_SIZE)
+
+    def _best(self, indexes, limit: int) -> List[int]:
+        return heapq.nlargest(limit, indexes, key=lambda index: (self.suggestions[index][2], -index))
+
+    def search(self, prefix: str, limit: int) -> List[list]:
+        """أفضل الاقتراحات وزناً التي تبدأ إحدى كلماتها بالبادئة"""
+        if len(prefix) <= PRECOMPUTED_DEPTH and limit <= PRECOMPUTED_SIZE:
+            indexes = self.top.get(prefix, [])[:limit]
+        else:
+            start = bisect_left(self.keys, prefix)
+            end = bisect_left(self.keys, prefix + '\uffff', start)
+            indexes = self._best(set(self.rows[start:end]), limit)
+        return [self.suggestions[index] for index in indexes]
+
+    def dumps(self) -> bytes:
+        payload = {'entries': self.entries, 'items': self.items, 'queries': self.queries}
+        return zlib.compress(json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode())
+
+    @classmethod
+    def loads(cls, data: bytes) -> 'Snapshot':
+        payload = json.loads(zlib.decompress(data))
+        return cls(payload['entries'], payload['items'], payload['queries'])
+
+
+class AutocompleteIndex:
+    """اقتراحات الإكمال التلقائي من عناوين المنتجات والفئات وعمليات البحث الشائعة
+
+    اللقطة المضغوطة تحفظ في الكاش المشترك وتحمل في ذاكرة كل عملية عند تغير
+    إصدارها، وتبنى فقط في مهمة compact_autocomplete (حتى ذلك تقترح الفئات).
+    تغييرات المنتجات والبحث تتجمع كفروق في Redis (HINCRBY) مع فهرس لكل بادئة
+    من حرف أو حرفين (ZINCRBY) فيقرأ الاستعلام فروق بادئته فقط وتدمج مع نتائج
+    اللقطة، ثم تضغط دورياً في لقطة جديدة.
+    """
+
+    key_prefix = 'autocomplete'
+    version_namespace = 'autocomplete'
+    # أقصى مدة لاستخدام نسخة الفروق أو إصدار اللقطة المحليين
+    refresh_interval = 1.0
+    lock_timeout = 300
+
+    def __init__(self, client=None):
+        self._client = client
+        self._local_deltas = Counter()
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._snapshot_version = None
+        self._version_checked = 0.0
+        # {بادئة: (وقت القراءة، الفروق)}
+        self._deltas = {}
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = advanced_cache.redis_client
+        return self._client
+
+    @property
+    def snapshot_key(self) -> str:
+        return f"{self.key_prefix}:snapshot"
+
+    @property
+    def deltas_key(self) -> str:
+        return f"{self.key_prefix}:deltas"
+
+    @property
+    def compacting_key(self) -> str:
+        return f"{self.key_prefix}:deltas:compacting"
+
+    def prefix_key(self, prefix: str) -> str:
+        return f"{self.key_prefix}:deltas:prefix:{prefix}"
+
+    def clear_local(self):
+        """مسح ذاكرة العملية (اللقطة والفروق المحلية)"""
+        with self._lock:
+            self._local_deltas.clear()
+        self._snapshot = self._snapshot_version = None
+        self._deltas = {}
+
+    # الفروق
+
+    def add(self, deltas: Counter):
+        """تسجيل فروق أوزان {(النوع، النص): فرق}"""
+        deltas = {f"{kind}\t{text}": delta for (kind, text), delta in deltas.items() if delta and normalize_key(text)}
+        if not deltas:
+            return
+        try:
+            pipe = self.client.pipeline(transaction=True)
+            for field, delta in deltas.items():
+                pipe.hincrby(self.deltas_key, field, delta)
+                for prefix in key_prefixes(normalize_key(field.split('\t', 1)[1])):
+                    pipe.zincrby(self.prefix_key(prefix), delta, field)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Autocomplete delta fell back to local buffer: {e}")
+            with self._lock:
+                self._local_deltas.update(deltas)
+        self._deltas = {}
+
+    def unindex(self, deltas: Dict[str, int]):
+        """طرح فروق ضغطت في اللقطة من فهرس البادئات"""
+        if not deltas:
+            return
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            keys = set()
+            for field, delta in deltas.items():
+                for prefix in key_prefixes(normalize_key(field.split('\t', 1)[1])):
+                    keys.add(self.prefix_key(prefix))
+                    pipe.zincrby(self.prefix_key(prefix), -delta, field)
+            for key in keys:
+                pipe.zremrangebyscore(key, 0, 0)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Autocomplete prefix index cleanup failed: {e}")
+
+    def contribution(self, state: Optional[Dict]) -> Counter:
+        """وزن عنوان المنتج في الاقتراحات (المنتجات النشطة فقط)"""
+        if not state or state.get('status') != 'active' or not state.get('title'):
+            return Counter()
+        return Counter({(KIND_ITEM, state['title']): 1})
+
+    def apply_transition(self, previous: Optional[Dict], current: Optional[Dict]):
+        """تطبيق فرق عنوان المنتج بين حالتين"""
+        deltas = self.contribution(current)
+        deltas.subtract(self.contribution(previous))
+        self.add(deltas)
+
+    def record_query(self, query: str):
+        self.add(Counter({(KIND_QUERY, query.strip()): 1}))
+
+    def pending_deltas(self, prefix: str) -> Dict[str, int]:
+        """الفروق التي لم تضغط بعد لنصوص تبدأ إحدى كلماتها ببادئة الطلب (تقرأ من Redis مرة كل فترة)"""
+        indexed = prefix[:PRECOMPUTED_DEPTH]
+        now = time.monotonic()
+        loaded, deltas = self._deltas.get(indexed, (0.0, None))
+        if deltas is None or now - loaded >= self.refresh_interval:
+            deltas = {}
+            key = self.prefix_key(indexed)
+            try:
+                pipe = self.client.pipeline(transaction=False)
+                pipe.zrevrangebyscore(key, '+inf', '(0', start=0, num=MAX_PREFIX_DELTAS, withscores=True)
+                pipe.zrangebyscore(key, '-inf', '(0', start=0, num=MAX_PREFIX_DELTAS, withscores=True)
+                for values in pipe.execute():
+                    deltas.update({field.decode(): int(delta) for field, delta in values})
+            except redis.RedisError as e:
+                logger.warning(f"Autocomplete delta read failed: {e}")
+            if len(self._deltas) >= 1000:
+                self._deltas = {}
+            self._deltas[indexed] = (now, deltas)
+        with self._lock:
+            local = {
+                field: delta for field, delta in self._local_deltas.items()
+                if indexed in key_prefixes(normalize_key(field.split('\t', 1)[1]))
+            }
+        if not local:
+            return deltas
+        deltas = Counter(deltas)
+        deltas.update(local)
+        return deltas
+
+    # اللقطة
+
+    def snapshot(self) -> Snapshot:
+        """اللقطة الحالية من ذاكرة العملية أو من الكاش المشترك"""
+        now = time.monotonic()
+        if self._snapshot is None or now - self._version_checked >= self.refresh_interval:
+            version = advanced_cache.get_version(self.version_namespace)
+            self._version_checked = now
+            if version != self._snapshot_version or self._snapshot is None:
+                data = cache.get(self.snapshot_key)
+                if data is None:
+                    # اللقطة تبنى في مهمة compact_autocomplete وليس داخل الطلب
+                    if self._snapshot is None:
+                        self._snapshot = Snapshot(self.build({}, {}))
+                    return self._snapshot
+                self._snapshot = Snapshot.loads(data)
+                self._snapshot_version = advanced_cache.get_version(self.version_namespace)
+        return self._snapshot
+
+    def store(self, items: Dict[str, list], queries: Dict[str, int]) -> bytes:
+        items = {key: entry for key, entry in items.items() if entry[1] > 0}
+        queries = dict(heapq.nlargest(
+            MAX_TRACKED_QUERIES, ((text, count) for text, count in queries.items() if count > 0),
+            key=lambda pair: pair[1]
+        ))
+        data = Snapshot(self.build(items, queries), items, queries).dumps()
+        cache.set(self.snapshot_key, data, None)
+        advanced_cache.incr_version(self.version_namespace)
+        self._version_checked = 0.0
+        return data
+
+    @staticmethod
+    def merge_entry(entries: Dict[str, list], kind: str, text: str, weight: int, ref=None):
+        """إضافة وزن لاقتراح (النص الموحد نفسه من أنواع مختلفة اقتراح واحد)"""
+        key = normalize_key(text)
+        if not key:
+            return
+        entry = entries.get(key)
+        if entry is None:
+            entries[key] = [text, kind, weight, ref]
+            return
+        entry[2] += weight
+        if KIND_PRIORITY[kind] < KIND_PRIORITY[entry[1]]:
+            entry[0], entry[1], entry[3] = text, kind, ref
+
+    def category_entries(self, entries: Dict[str, list]):
+        from .models import Category
+        from .facets import item_facets
+
+        counts = item_facets.stored_counts().get('category', {})
+        for category in Category.objects.filter(is_active=True).only('pk', 'name', 'name_ar'):
+            weight = counts.get(str(category.pk), 0) + CATEGORY_BOOST
+            self.merge_entry(entries, KIND_CATEGORY, category.name_ar, weight, category.pk)
+            self.merge_entry(entries, KIND_CATEGORY, category.name, weight, category.pk)
+
+    def build(self, items: Dict[str, list], queries: Dict[str, int]) -> Dict[str, list]:
+        """اقتراحات من أوزان العناوين {مفتاح: [نص، وزن]} وعمليات البحث {نص: عدد}"""
+        entries = {}
+        self.category_entries(entries)
+        for text, weight in items.values():
+            if weight > 0:
+                self.merge_entry(entries, KIND_ITEM, text, weight)
+        popular = heapq.nlargest(MAX_QUERIES, queries.items(), key=lambda pair: pair[1])
+        for text, count in popular:
+            if count >= MIN_QUERY_COUNT:
+                self.merge_entry(entries, KIND_QUERY, text, count)
+        return entries
+
+    def active_titles(self) -> Dict[str, list]:
+        """أوزان العناوين من المنتجات النشطة {مفتاح: [نص، عدد]}"""
+        from django.db.models import Count
+        from .models import Item
+
+        items = {}
+        titles = Item.objects.filter(status='active').order_by().values_list('title').annotate(n=Count('id'))
+        for title, count in titles:
+            key = normalize_key(title)
+            if key in items:
+                items[key][1] += count
+            elif key:
+                items[key] = [title, count]
+        return items
+
+    def compact(self, full: bool = False) -> Optional[bytes]:
+        """دمج الفروق المتراكمة في لقطة جديدة بدون إعادة قراءة المنتجات
+
+        full يعيد حساب العناوين من المنتجات (مع الإبقاء على عمليات البحث).
+        """
+        with self._lock:
+            local, self._local_deltas = self._local_deltas, Counter()
+        deltas = Counter(local)
+        remote = {}
+
+        lock_key = f"{self.key_prefix}:compact_lock"
+        token = uuid.uuid4().hex
+        locked = False
+        try:
+            # عامل واحد فقط يضغط في كل مرة
+            locked = bool(self.client.set(lock_key, token, nx=True, ex=self.lock_timeout))
+            if not locked:
+                with self._lock:
+                    self._local_deltas.update(local)
+                return None
+            # لقطة فروق سابقة لم تكتمل (تعطل العامل) تضغط أولاً
+            if not self.client.exists(self.compacting_key):
+                try:
+                    self.client.rename(self.deltas_key, self.compacting_key)
+                except redis.ResponseError:
+                    pass
+            remote = {
+                field.decode(): int(delta)
+                for field, delta in self.client.hgetall(self.compacting_key).items()
+            }
+            deltas.update(remote)
+        except redis.RedisError as e:
+            logger.warning(f"Autocomplete compaction without Redis deltas: {e}")
+
+        try:
+            data = cache.get(self.snapshot_key)
+            stored = Snapshot.loads(data) if data else Snapshot({})
+            items, queries = stored.items, Counter(stored.queries)
+            if full or data is None:
+                items = self.active_titles()
+            for field, delta in deltas.items():
+                kind, text = field.split('\t', 1)
+                if kind == KIND_QUERY:
+                    queries[text] += delta
+                elif not full and data is not None:
+                    # العناوين المعاد حسابها من المنتجات تشمل فروقها بالفعل
+                    items.setdefault(normalize_key(text), [text, 0])[1] += delta
+            data = self.store(items, queries)
+            if locked:
+                self.client.delete(self.compacting_key)
+                self.unindex(remote)
+        finally:
+            if locked:
+                try:
+                    if self.client.get(lock_key) == token.encode():
+                        self.client.delete(lock_key)
+                except redis.RedisError:
+                    pass
+        self._deltas = {}
+        return data
+
+    # الاستعلام
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[Dict]:
+        """أفضل الاقتراحات للبادئة مع الفروق التي لم تضغط بعد"""
+        prefix = normalize_key(prefix)
+        if not prefix:
+            return []
+        snapshot = self.snapshot()
+        # الفروق المطابقة للبادئة قد ترفع أو تخفض اقتراحات من اللقطة
+        matching = {}
+        for field, delta in self.pending_deltas(prefix).items():
+            kind, text = field.split('\t', 1)
+            key = normalize_key(text)
+            words = key.split(' ')
+            if any(' '.join(words[start:]).startswith(prefix) for start in range(min(len(words), MAX_WORD_STARTS))):
+                matching.setdefault(key, [text, kind, 0, None])[2] += delta
+
+        results = {}
+        for text, kind, weight, ref in snapshot.search(prefix, limit + len(matching)):
+            results[normalize_key(text)] = [text, kind, weight, ref]
+        for key, (text, kind, delta, ref) in matching.items():
+            entry = results.get(key) or snapshot.entries.get(key)
+            if entry is not None:
+                entry = results[key] = list(entry)
+                entry[2] += delta
+            else:
+                # عداد البحث المحفوظ قبل وصوله للحد الأدنى
+                base = snapshot.queries.get(text, 0) if kind == KIND_QUERY else 0
+                results[key] = [text, kind, base + delta, ref]
+
+        ranked = sorted(
+            (entry for entry in results.values()
+             if entry[2] > 0 and (entry[1] != KIND_QUERY or entry[2] >= MIN_QUERY_COUNT)),
+            key=lambda entry: (-entry[2], KIND_PRIORITY[entry[1]], entry[0])
+        )
+        suggestions = []
+        for text, kind, weight, ref in ranked[:limit]:
+            suggestion = {'text': text, 'type': kind}
+            if ref is not None:
+                suggestion['id'] = ref
+            suggestions.append(suggestion)
+        return suggestions
+
+
+# إنشاء instance عام
+autocomplete_index = AutocompleteIndex()
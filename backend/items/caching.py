@@ -0,0 +1,89 @@
+from typing import Dict, Iterable, List
+from django.core.cache import cache
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+from performance.cache import ReadThroughCache, advanced_cache
+import logging
+
+logger = logging.getLogger('items')
+
+# الفئات نادراً ما تتغير
+category_cache = ReadThroughCache('categories', timeout=3600)
+# مدة أقصر لأن عدادات المشاهدات تكتب بدون إشارات
+featured_cache = ReadThroughCache('featured_items', timeout=300)
+
+
+def render_json(data) -> bytes:
+    """تسلسل البيانات بنفس مخرجات JSONRenderer في DRF"""
+    return JSONRenderer().render(data)
+
+
+def json_response(body: bytes) -> HttpResponse:
+    """استجابة من bytes جاهزة بدون المرور على مسلسلات DRF"""
+    return HttpResponse(body, content_type='application/json')
+
+
+def build_categories() -> bytes:
+    """قائمة الفئات النشطة كما تعرضها نقطة categories"""
+    from performance.serialization import ValuesSerializer, dumps
+    from .models import Category
+    from .serializers import CategorySerializer
+
+    serializer = ValuesSerializer(CategorySerializer)
+    return dumps(serializer.many(Category.objects.filter(is_active=True).values(*serializer.value_fields())))
+
+
+
+class ItemRowCache:
+    """صفوف values() لمنتجات القوائم النشطة مع صورتها الأساسية، مفتاح لكل منتج
+
+    تغيير المنتج أو صوره أو عداداته يحذف صفه فقط. بيانات البائع والفئة داخل
+    الصف تتغير نادراً فيبطلها رقم إصدار المجموعة.
+    """
+
+    key_prefix = 'item_row'
+    version_namespace = 'item_rows'
+    timeout = 600
+
+    def keys(self, item_ids: Iterable[int]) -> Dict[str, int]:
+        version = advanced_cache.get_version(self.version_namespace)
+        return {f"{self.key_prefix}:{version}:{item_id}": item_id for item_id in item_ids}
+
+    def get_many(self, item_ids: List[int], serializer) -> Dict[int, Dict]:
+        """{معرف: صف} للمنتجات النشطة، وتحميل الناقص منها بـ serializer.load"""
+        keys = self.keys(item_ids)
+        try:
+            cached = cache.get_many(list(keys))
+        except Exception as e:
+            logger.error(f"Item row cache get error: {e}")
+            cached = {}
+        rows = {keys[key]: row for key, row in cached.items()}
+
+        missing = [item_id for item_id in item_ids if item_id not in rows]
+        if missing:
+            loaded = serializer.load(missing)
+            try:
+                cache.set_many({
+                    key: loaded[item_id] for key, item_id in self.keys(loaded).items()
+                }, self.timeout)
+            except Exception as e:
+                logger.error(f"Item row cache set error: {e}")
+            rows.update(loaded)
+        return rows
+
+    def invalidate(self, item_ids: Iterable[int]):
+        """حذف صفوف منتجات تغيرت"""
+        keys = list(self.keys(item_ids))
+        if not keys:
+            return
+        try:
+            cache.delete_many(keys)
+        except Exception as e:
+            logger.error(f"Item row cache delete error: {e}")
+
+    def invalidate_all(self):
+        advanced_cache.incr_version(self.version_namespace)
+
+
+# إنشاء instance عام
+item_row_cache = ItemRowCache()
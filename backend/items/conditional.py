@@ -0,0 +1,75 @@
+import hashlib
+from typing import Optional, Tuple
+from django.db import transaction
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from performance.cache import advanced_cache
+from .caching import item_row_cache
+
+# مجموعة إصدار تزاد مع كل تغيير في المنتجات
+ITEMS_VERSION = 'items'
+
+
+def make_etag(*parts) -> str:
+    """ETag ضعيف: المحتوى مكافئ دلالياً (العدادات قد تتغير بدون تغيير الإصدار)"""
+    digest = hashlib.md5(':'.join(str(part) for part in parts).encode()).hexdigest()
+    return f'W/"{digest}"'
+
+
+def bump_items_version():
+    advanced_cache.incr_version(ITEMS_VERSION)
+
+
+def touch_item(item_id: int):
+    """تغيير updated_at لمنتج تغيرت بياناته المرتبطة (الصور) دون حفظه"""
+    from .models import Item
+
+    Item.objects.filter(pk=item_id).update(updated_at=timezone.now())
+    transaction.on_commit(bump_items_version)
+    transaction.on_commit(lambda: item_row_cache.invalidate([item_id]))
+
+
+class ConditionalGetMixin:
+    """ETag/Last-Modified والرد بـ 304 قبل تحميل البيانات أو تسلسلها
+
+    الـ View تعرف get_validators وترجع (etag, last_modified) من قراءة رخيصة
+    تنفذ قبل الاستعلام. إذا لم يرسل العميل شروطاً يمكن للـ View حساب المدققات
+    من البيانات المحملة (validators_from_loaded) بدون قراءة إضافية.
+    """
+
+    validators_from_loaded = False
+
+    def get_validators(self, request, *args, **kwargs) -> Tuple[Optional[str], Optional[int]]:
+        raise NotImplementedError
+
+    def not_modified(self, request, *args, **kwargs):
+        """آثار الطلب التي يجب أن تحدث حتى مع رد 304 (مثل عد المشاهدات)"""
+
+    def get(self, request, *args, **kwargs):
+        self.validators = (None, None)
+        conditional = 'HTTP_IF_NONE_MATCH' in request.META or 'HTTP_IF_MODIFIED_SINCE' in request.META
+        if conditional or not self.validators_from_loaded:
+            self.validators = self.get_validators(request, *args, **kwargs)
+            etag, last_modified = self.validators
+            if etag or last_modified:
+                response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+                if response is not None:
+                    self.not_modified(request, *args, **kwargs)
+                    return set_validators(response, etag, last_modified)
+
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            set_validators(response, *self.validators)
+        return response
+
+
+def set_validators(response, etag: Optional[str], last_modified: Optional[int]):
+    if etag:
+        response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+    if etag or last_modified:
+        # إعادة التحقق في كل طلب (الرد 304 رخيص)
+        response['Cache-Control'] = 'no-cache'
+    return response
@@ -0,0 +1,242 @@
+import atexit
+import threading
+import uuid
+from collections import Counter, defaultdict
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+import redis
+import logging
+
+logger = logging.getLogger('items')
+
+
+class ItemCounterService:
+    """عدادات المشاهدات والاهتمام بكتابة مؤجلة (write-behind)
+
+    الزيادات تتجمع في Redis عبر HINCRBY الذري، وتنقل دورياً إلى جدول
+    المنتجات بتحديثات F() مجمعة. إذا تعذر الوصول إلى Redis تحفظ الزيادات
+    في ذاكرة العملية وتفرغ عند الإغلاق.
+
+    كل لقطة تنقل تحمل معرفاً يسجل في CounterFlush داخل نفس معاملة التحديث،
+    فلقطة طبقت ولم تحذف من Redis (تعطل العامل أو انتهاء القفل) لا تطبق مرة ثانية.
+    """
+
+    FIELDS = ('views', 'interested_count')
+    key_prefix = 'item_counters'
+    # عدد المعرفات في كل تحديث
+    batch_size = 500
+    lock_timeout = 300
+    # حقل معرف اللقطة داخل hash النقل
+    flush_id_field = 'flush_id'
+    # مدة الاحتفاظ بمعرفات اللقطات المطبقة
+    flush_retention = timedelta(days=1)
+    # تمديد القفل فقط إن كان ما زال لهذا العامل
+    RENEW_LOCK_SCRIPT = """
+    if redis.call('GET', KEYS[1]) == ARGV[1] then
+        return redis.call('EXPIRE', KEYS[1], ARGV[2])
+    end
+    return 0
+    """
+
+    def __init__(self, client=None):
+        self._client = client
+        self._local = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            from performance.cache import advanced_cache
+            self._client = advanced_cache.redis_client
+        return self._client
+
+    def _pending_key(self, field: str) -> str:
+        return f"{self.key_prefix}:{field}"
+
+    def _flushing_key(self, field: str) -> str:
+        return f"{self.key_prefix}:{field}:flushing"
+
+    def incr(self, item_id: int, field: str, amount: int = 1):
+        """تسجيل زيادة معلقة لعداد منتج"""
+        if field not in self.FIELDS:
+            raise ValueError(f"Unknown counter field: {field}")
+        try:
+            self.client.hincrby(self._pending_key(field), item_id, amount)
+        except redis.RedisError as e:
+            logger.warning(f"Counter incr fell back to local buffer: {e}")
+            with self._lock:
+                self._local[(field, item_id)] += amount
+
+    def pending(self, item_ids: Iterable[int]) -> Dict[str, Dict[int, int]]:
+        """الزيادات التي لم تكتب بعد في قاعدة البيانات لكل حقل"""
+        item_ids = list(item_ids)
+        result = {field: defaultdict(int) for field in self.FIELDS}
+        if not item_ids:
+            return result
+
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for field in self.FIELDS:
+                pipe.hmget(self._pending_key(field), item_ids)
+                pipe.hmget(self._flushing_key(field), [self.flush_id_field] + item_ids)
+            values = pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Counter pending read failed: {e}")
+            values = [[None] * len(item_ids), [None] * (len(item_ids) + 1)] * len(self.FIELDS)
+
+        # لقطة طبقت ولم يحذف hash النقل بعد محسوبة في قاعدة البيانات
+        flushing = {field: values[2 * index + 1] for index, field in enumerate(self.FIELDS)}
+        applied = self._applied_flushes(
+            deltas[0].decode() for deltas in flushing.values() if deltas[0] and any(deltas[1:])
+        )
+        for index, field in enumerate(self.FIELDS):
+            sources = [values[2 * index]]
+            flush_id = flushing[field][0]
+            if not flush_id or flush_id.decode() not in applied:
+                sources.append(flushing[field][1:])
+            for deltas in sources:
+                for item_id, delta in zip(item_ids, deltas):
+                    if delta:
+                        result[field][item_id] += int(delta)
+
+        wanted = set(item_ids)
+        with self._lock:
+            for (field, item_id), delta in self._local.items():
+                if item_id in wanted:
+                    result[field][item_id] += delta
+        return result
+
+    def _applied_flushes(self, flush_ids: Iterable[str]) -> set:
+        """معرفات اللقطات المسجلة في CounterFlush"""
+        from .models import CounterFlush
+
+        flush_ids = list(flush_ids)
+        if not flush_ids:
+            return set()
+        return set(CounterFlush.objects.filter(flush_id__in=flush_ids).values_list('flush_id', flat=True))
+
+    def merge_pending(self, items: List) -> List:
+        """إضافة الزيادات المعلقة إلى كائنات المنتجات (أو صفوف values()) لعرض قيم حديثة"""
+        items = [item for item in items if item is not None]
+        if not items:
+            return items
+        rows = isinstance(items[0], dict)
+        pending = self.pending(item['id'] if rows else item.pk for item in items)
+        for item in items:
+            for field in self.FIELDS:
+                delta = pending[field].get(item['id'] if rows else item.pk)
+                if not delta:
+                    continue
+                if rows:
+                    item[field] += delta
+                else:
+                    setattr(item, field, getattr(item, field) + delta)
+        return items
+
+    def _apply(self, field: str, deltas: Dict[int, int], flush_id: Optional[str] = None) -> int:
+        """كتابة الزيادات في قاعدة البيانات بتحديثات F() مجمعة حسب قيمة الزيادة"""
+        from .caching import item_row_cache
+        from .models import CounterFlush, Item
+
+        ids_by_delta = defaultdict(list)
+        for item_id, delta in deltas.items():
+            if delta:
+                ids_by_delta[delta].append(item_id)
+
+        updated = 0
+        with transaction.atomic():
+            if flush_id is not None:
+                try:
+                    with transaction.atomic():
+                        CounterFlush.objects.create(flush_id=flush_id)
+                except IntegrityError:
+                    logger.warning(f"Counter snapshot {flush_id} already applied")
+                    return 0
+            for delta, item_ids in ids_by_delta.items():
+                for start in range(0, len(item_ids), self.batch_size):
+                    updated += Item.objects.filter(
+                        id__in=item_ids[start:start + self.batch_size]
+                    ).update(**{field: F(field) + delta})
+            transaction.on_commit(lambda: item_row_cache.invalidate(list(deltas)))
+        return updated
+
+    def _take_local(self) -> Dict[str, Dict[int, int]]:
+        with self._lock:
+            local, self._local = self._local, Counter()
+        deltas = {field: defaultdict(int) for field in self.FIELDS}
+        for (field, item_id), delta in local.items():
+            deltas[field][item_id] += delta
+        return deltas
+
+    def drain(self) -> int:
+        """تفريغ المخزن المحلي إلى Redis أو مباشرة إلى قاعدة البيانات"""
+        updated = 0
+        for field, deltas in self._take_local().items():
+            if not deltas:
+                continue
+            try:
+                pipe = self.client.pipeline(transaction=True)
+                for item_id, delta in deltas.items():
+                    pipe.hincrby(self._pending_key(field), item_id, delta)
+                pipe.execute()
+            except redis.RedisError:
+                updated += self._apply(field, deltas)
+        return updated
+
+    def flush(self) -> int:
+        """نقل الزيادات المتراكمة إلى جدول المنتجات"""
+        updated = self.drain()
+        lock_key = f"{self.key_prefix}:flush_lock"
+        token = uuid.uuid4().hex
+        try:
+            # عامل واحد فقط ينقل الزيادات في كل مرة
+            if not self.client.set(lock_key, token, nx=True, ex=self.lock_timeout):
+                return updated
+        except redis.RedisError as e:
+            logger.error(f"Counter flush could not reach Redis: {e}")
+            return updated
+
+        try:
+            for field in self.FIELDS:
+                flushing_key = self._flushing_key(field)
+                # لقطة سابقة لم تكتمل (تعطل العامل) تعالج أولاً
+                if not self.client.exists(flushing_key):
+                    try:
+                        self.client.rename(self._pending_key(field), flushing_key)
+                    except redis.ResponseError:
+                        continue
+                # المعرف يثبت مع اللقطة فإعادة المحاولة تستخدم نفسه
+                self.client.hsetnx(flushing_key, self.flush_id_field, uuid.uuid4().hex)
+                snapshot = self.client.hgetall(flushing_key)
+                flush_id = snapshot.pop(self.flush_id_field.encode()).decode()
+                deltas = {int(item_id): int(delta) for item_id, delta in snapshot.items()}
+                # القفل قد ينتهي أثناء تطبيق طويل فيأخذه عامل آخر
+                if not self.client.eval(self.RENEW_LOCK_SCRIPT, 1, lock_key, token, self.lock_timeout):
+                    logger.warning("Counter flush lock lost, stopping")
+                    break
+                updated += self._apply(field, deltas, flush_id)
+                self.client.delete(flushing_key)
+            self._prune_flushes()
+        finally:
+            try:
+                if self.client.get(lock_key) == token.encode():
+                    self.client.delete(lock_key)
+            except redis.RedisError:
+                pass
+        return updated
+
+    def _prune_flushes(self):
+        """حذف معرفات اللقطات القديمة"""
+        from .models import CounterFlush
+
+        CounterFlush.objects.filter(created_at__lt=timezone.now() - self.flush_retention).delete()
+
+
+# إنشاء instance عام
+item_counters = ItemCounterService()
+
+# تفريغ الزيادات المحلية عند إغلاق العملية
+atexit.register(item_counters.drain)
@@ -0,0 +1,201 @@
+import hashlib
+import random
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+from django.db import transaction
+from .search import analyze
+import logging
+
+logger = logging.getLogger('items')
+
+# 16 شريحة × 4 صفوف: احتمال الترشيح 50% عند تشابه 0.5 وأكثر من 99.9% عند 0.8
+NUM_PERMUTATIONS = 64
+BANDS = 16
+ROWS = NUM_PERMUTATIONS // BANDS
+
+# أدنى تشابه (Jaccard تقديري) لاعتبار المنتج إعادة نشر، ولعرضه كمنتج مشابه
+DUPLICATE_THRESHOLD = 0.8
+SIMILAR_THRESHOLD = 0.5
+
+# الحقول التي يحسب منها التوقيع
+SIGNATURE_FIELDS = {'title', 'description'}
+
+# الحالات التي يمكن أن يكون فيها المنتج أصلاً لإعادة نشر
+ORIGINAL_STATUSES = ('pending', 'active')
+
+_PRIME = (1 << 61) - 1
+_SEED = 20240601
+# معاملات دوال التبديل ثابتة حتى تبقى التواقيع المخزنة صالحة
+_rng = random.Random(_SEED)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME))
+    for _ in range(NUM_PERMUTATIONS)
+]
+
+
+def _hash64(data: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'big')
+
+
+def shingles(title: str, description: str) -> set:
+    """أزواج كلمات متتالية من النص الموحد (كلمة واحدة إذا كان النص قصيراً)"""
+    terms = analyze(f"{title} {description}")
+    if len(terms) < 2:
+        return set(terms)
+    return {f"{a} {b}" for a, b in zip(terms, terms[1:])}
+
+
+def minhash(title: str, description: str) -> Optional[List[int]]:
+    """توقيع MinHash للنص، أو None إذا لم يكن فيه كلمات"""
+    values = [_hash64(shingle.encode()) for shingle in shingles(title, description)]
+    if not values:
+        return None
+    return [min((a * value + b) % _PRIME for value in values) for a, b in _PERMUTATIONS]
+
+
+def band_buckets(signature: List[int]) -> List[int]:
+    """خانة كل شريحة (رقم الشريحة جزء من البصمة فلا تتداخل الشرائح)"""
+    buckets = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS:(band + 1) * ROWS]
+        data = f"{band}:{','.join(map(str, rows))}".encode()
+        # BigIntegerField بإشارة
+        buckets.append(_hash64(data) - (1 << 63))
+    return buckets
+
+
+def similarity(a: List[int], b: List[int]) -> float:
+    """تقدير Jaccard من نسبة المواقع المتساوية في التوقيعين"""
+    if not a or not b:
+        return 0.0
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERMUTATIONS
+
+
+class DuplicateDetector:
+    """كشف المنتجات شبه المطابقة بتواقيع MinHash وشرائح LSH
+
+    كل منتج يخزن توقيعه في ItemSignature وخانات شرائحه في ItemBand. المرشحون
+    هم المنتجات التي تشاركه خانة واحدة على الأقل (استعلام مفهرس واحد) ثم
+    يحسب التشابه من التواقيع بدلاً من المقارنة مع كل المنتجات.
+    """
+
+    # أقصى عدد مرشحين يقارن توقيعهم
+    max_candidates = 200
+
+    def index_item(self, item):
+        """تحديث توقيع منتج واحد إذا تغير نصه"""
+        self.index_items([item])
+
+    def index_items(self, items: Iterable, force: bool = False):
+        """حساب تواقيع المنتجات وخاناتها وتحديد إعادات النشر"""
+        from .models import ItemBand, ItemSignature
+
+        items = sorted(items, key=lambda item: item.pk)
+        if not items:
+            return
+        stored = {} if force else dict(
+            ItemSignature.objects.filter(item_id__in=[item.pk for item in items])
+            .values_list('item_id', 'minhash')
+        )
+        changed = {}
+        for item in items:
+            signature = minhash(item.title, item.description) or []
+            if force or stored.get(item.pk) != signature:
+                changed[item.pk] = signature
+        if not changed:
+            return
+
+        with transaction.atomic():
+            ItemSignature.objects.filter(item_id__in=list(changed)).delete()
+            ItemBand.objects.filter(item_id__in=list(changed)).delete()
+            ItemSignature.objects.bulk_create([
+                ItemSignature(item_id=item_id, minhash=signature)
+                for item_id, signature in changed.items()
+            ], batch_size=1000)
+            ItemBand.objects.bulk_create([
+                ItemBand(item_id=item_id, bucket=bucket)
+                for item_id, signature in changed.items() if signature
+                for bucket in band_buckets(signature)
+            ], batch_size=1000)
+            for item in items:
+                if item.pk in changed:
+                    self.mark_duplicate(item, changed[item.pk])
+
+    def candidates(self, item_id: int, signature: List[int], **filters) -> Dict[int, List[int]]:
+        """{معرف: توقيع} للمنتجات التي تشارك المنتج خانة واحدة على الأقل"""
+        from .models import ItemBand, ItemSignature
+
+        if not signature:
+            return {}
+        shared = Counter(
+            ItemBand.objects.filter(bucket__in=band_buckets(signature), **filters)
+            .exclude(item_id=item_id)
+            .values_list('item_id', flat=True)
+        )
+        # الأكثر اشتراكاً في الخانات أولاً
+        ids = [candidate for candidate, _ in shared.most_common(self.max_candidates)]
+        return dict(ItemSignature.objects.filter(item_id__in=ids).values_list('item_id', 'minhash'))
+
+    def find_original(self, item, signature: List[int]) -> Optional[int]:
+        """أقدم منتج لنفس البائع يكون هذا المنتج إعادة نشر له"""
+        from .models import Item
+
+        candidates = self.candidates(
+            item.pk, signature,
+            item__user_id=item.user_id, item__status__in=ORIGINAL_STATUSES, item_id__lt=item.pk,
+        )
+        matches = [
+            candidate for candidate, other in candidates.items()
+            if similarity(signature, other) >= DUPLICATE_THRESHOLD
+        ]
+        if not matches:
+            return None
+        # الإشارة إلى الأصل الأول وليس إلى إعادة نشر أخرى
+        roots = Item.objects.filter(pk__in=matches).values_list('pk', 'duplicate_of_id')
+        return min(original or pk for pk, original in roots)
+
+    def mark_duplicate(self, item, signature: List[int]):
+        from .models import Item
+
+        original = self.find_original(item, signature)
+        if original != item.duplicate_of_id:
+            # update() لتجنب إعادة تشغيل إشارة post_save
+            Item.objects.filter(pk=item.pk).update(duplicate_of=original)
+            item.duplicate_of_id = original
+
+    def similar(self, item_id: int, limit: int = 10) -> List[Tuple[int, float]]:
+        """(معرف، تشابه) للمنتجات النشطة المشابهة مرتبة تنازلياً"""
+        from .models import ItemSignature
+
+        signature = ItemSignature.objects.filter(item_id=item_id).values_list('minhash', flat=True).first()
+        candidates = self.candidates(item_id, signature, item__status='active')
+        scores = [
+            (candidate, similarity(signature, other))
+            for candidate, other in candidates.items()
+        ]
+        scores = [pair for pair in scores if pair[1] >= SIMILAR_THRESHOLD]
+        scores.sort(key=lambda pair: (pair[1], -pair[0]), reverse=True)
+        return scores[:limit]
+
+    def rebuild(self, batch_size: int = 500) -> int:
+        """إعادة حساب التواقيع لكل المنتجات بترتيب الإنشاء"""
+        from .models import Item, ItemBand, ItemSignature
+
+        ItemBand.objects.all().delete()
+        ItemSignature.objects.all().delete()
+        Item.objects.exclude(duplicate_of=None).update(duplicate_of=None)
+        queryset = Item.objects.only('pk', 'user', 'title', 'description', 'duplicate_of').order_by('pk')
+        indexed = 0
+        last_pk = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            self.index_items(batch, force=True)
+            indexed += len(batch)
+            last_pk = batch[-1].pk
+        return indexed
+
+
+# إنشاء instance عام
+duplicate_detector = DuplicateDetector()
@@ -0,0 +1,75 @@
+from typing import Optional
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+import logging
+
+logger = logging.getLogger('items')
+
+
+def expire_due_items(batch_size: int = 500, now=None, max_batches: Optional[int] = None) -> int:
+    """نقل المنتجات النشطة التي انتهت صلاحيتها إلى expired بدفعات محدودة
+
+    كل دفعة معاملة مستقلة: قراءة بالمؤشر (expires_at, id) مع قفل الصفوف
+    وتخطي المقفلة من عامل آخر (SKIP LOCKED)، ثم update() واحد مشروط بالحالة،
+    ثم إشارة items_bulk_status_changed لتحديث الفلاتر والإحصائيات والفهرس والكاش.
+    """
+    from .models import Item
+    from .signals import TRACKED_FIELDS, items_bulk_status_changed
+
+    now = now or timezone.now()
+    fields = ('id', 'expires_at') + TRACKED_FIELDS[Item]
+    # الصفوف المقفلة تتخطى حيث تدعم قاعدة البيانات ذلك
+    lock = {'skip_locked': True} if connection.features.has_select_for_update_skip_locked else {}
+    expired = 0
+    batches = 0
+    last = None
+
+    while max_batches is None or batches < max_batches:
+        with transaction.atomic():
+            queryset = Item.objects.filter(status='active', expires_at__lte=now)
+            if last:
+                queryset = queryset.filter(
+                    Q(expires_at__gt=last[0]) | Q(expires_at=last[0], id__gt=last[1])
+                )
+            states = list(
+                queryset.select_for_update(**lock)
+                .order_by('expires_at', 'id')
+                .values(*fields)[:batch_size]
+            )
+            if not states:
+                break
+            last = (states[-1]['expires_at'], states[-1]['id'])
+
+            updated = Item.objects.filter(
+                id__in=[state['id'] for state in states], status='active'
+            ).update(status='expired', updated_at=now)
+
+            if updated != len(states):
+                # عامل آخر غير بعض الصفوف (قاعدة بدون أقفال صفوف): الإشارة للصفوف التي غيرناها فقط
+                logger.warning(f"Expiry batch raced: {updated}/{len(states)} rows updated")
+                changed = set(Item.objects.filter(
+                    id__in=[state['id'] for state in states], status='expired', updated_at=now
+                ).values_list('id', flat=True))
+                states = [state for state in states if state['id'] in changed]
+                # الحالات المقروءة قبل التحديث قد تكون تغيرت فتعاد الأعداد
+                transaction.on_commit(reconcile_after_race)
+            if states:
+                items_bulk_status_changed.send(sender=Item, states=states, new_status='expired')
+        expired += updated
+        batches += 1
+
+    if expired:
+        logger.info(f"Expired {expired} items")
+    return expired
+
+
+def reconcile_after_race():
+    """إعادة حساب الأعداد المعتمدة على المنتجات النشطة بعد تعارض"""
+    from .caching import featured_cache
+    from .facets import item_facets
+    from .stats import platform_stats
+
+    item_facets.rebuild()
+    platform_stats.reconcile()
+    featured_cache.invalidate()
@@ -0,0 +1,133 @@
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+from django.db import IntegrityError, transaction
+from django.db.models import CharField, Count, F, Value
+from django.db.models.functions import Cast
+import logging
+
+logger = logging.getLogger('items')
+
+# الفلتر -> الحقل في جدول المنتجات
+FACET_FIELDS = {
+    'category': 'category_id',
+    'condition': 'condition',
+    'price_type': 'price_type',
+    'location': 'location',
+}
+# أقصى عدد قيم تعرض لكل فلتر
+MAX_VALUES = 20
+
+
+class FacetIndex:
+    """أعداد الفلاتر للمنتجات النشطة
+
+    بدون فلاتر تقرأ من جدول FacetCount المحدث تدريجياً عند تغير حالة المنتج،
+    ومع فلاتر تحسب بتجميع لكل فلتر على المنتجات المطابقة في استعلام واحد (UNION ALL).
+    """
+
+    def contribution(self, state: Optional[Dict]) -> Counter:
+        """مساهمة منتج في الأعداد حسب حالته (فقط النشط يحسب)"""
+        if not state or state.get('status') != 'active':
+            return Counter()
+        return Counter({
+            (facet, str(state[field])): 1
+            for facet, field in FACET_FIELDS.items()
+            if state.get(field) not in (None, '')
+        })
+
+    def apply_transition(self, old_state: Optional[Dict], new_state: Optional[Dict]):
+        """تطبيق الفرق بين حالة المنتج السابقة والجديدة"""
+        deltas = self.contribution(new_state)
+        deltas.subtract(self.contribution(old_state))
+        self.apply(deltas)
+
+    def apply(self, deltas: Counter):
+        """إضافة الفروق إلى الجدول بتحديثات F() ذرية"""
+        from .models import FacetCount
+
+        for (facet, value), delta in deltas.items():
+            if not delta:
+                continue
+            value = value[:200]
+            updated = FacetCount.objects.filter(facet=facet, value=value).update(count=F('count') + delta)
+            if updated:
+                continue
+            try:
+                with transaction.atomic():
+                    FacetCount.objects.create(facet=facet, value=value, count=delta)
+            except IntegrityError:
+                # أنشئ الصف من عملية أخرى في نفس اللحظة
+                FacetCount.objects.filter(facet=facet, value=value).update(count=F('count') + delta)
+
+    def stored_counts(self) -> Dict[str, Dict[str, int]]:
+        """الأعداد المخزنة للمنتجات النشطة بدون فلاتر"""
+        from .models import FacetCount
+
+        counts = defaultdict(dict)
+        for facet, value, count in FacetCount.objects.filter(count__gt=0).values_list('facet', 'value', 'count'):
+            counts[facet][value] = count
+        return counts
+
+    def compute_counts(self, queryset) -> Dict[str, Dict[str, int]]:
+        """جميع أعداد الفلاتر لمجموعة منتجات (صف لكل قيمة فلتر وليس لكل تركيبة قيم)"""
+        grouped = [
+            queryset.order_by()
+            .annotate(facet=Value(facet, output_field=CharField()), value=Cast(field, CharField()))
+            .values('facet', 'value')
+            .annotate(total=Count('id'))
+            for facet, field in FACET_FIELDS.items()
+        ]
+        counts = defaultdict(Counter)
+        for row in grouped[0].union(*grouped[1:], all=True):
+            if row['value'] not in (None, ''):
+                counts[row['facet']][row['value']] += row['total']
+        return counts
+
+    def format(self, counts: Dict[str, Dict[str, int]], limit: int = MAX_VALUES) -> Dict[str, List[Dict]]:
+        """تحويل الأعداد إلى قوائم مرتبة مع الأسماء المعروضة"""
+        from .models import Category, Item
+
+        labels = {
+            'condition': dict(Item.CONDITION_CHOICES),
+            'price_type': dict(Item.PRICE_TYPE_CHOICES),
+        }
+        category_ids = [int(value) for value in counts.get('category', {})]
+        if category_ids:
+            labels['category'] = {
+                str(pk): name for pk, name in
+                Category.objects.filter(id__in=category_ids).values_list('id', 'name_ar').cached(3600)
+            }
+
+        result = {}
+        for facet in FACET_FIELDS:
+            values = sorted(counts.get(facet, {}).items(), key=lambda pair: (-pair[1], pair[0]))[:limit]
+            facet_labels = labels.get(facet, {})
+            result[facet] = [
+                {
+                    'value': int(value) if facet == 'category' else value,
+                    'label': facet_labels.get(value, value),
+                    'count': count,
+                }
+                for value, count in values
+            ]
+        return result
+
+    def rebuild(self) -> int:
+        """إعادة حساب الجدول بالكامل من المنتجات النشطة"""
+        from .models import FacetCount, Item
+
+        counts = self.compute_counts(Item.objects.filter(status='active'))
+        rows = [
+            FacetCount(facet=facet, value=value[:200], count=count)
+            for facet, values in counts.items()
+            for value, count in values.items()
+        ]
+        with transaction.atomic():
+            FacetCount.objects.all().delete()
+            FacetCount.objects.bulk_create(rows, batch_size=500)
+        logger.info(f"Facet counts rebuilt: {len(rows)} values")
+        return len(rows)
+
+
+# إنشاء instance عام
+item_facets = FacetIndex()
@@ -1,9 +1,15 @@
 import django_filters
+from rest_framework import filters
 from .models import Item, Category
+from .search import analyze, search_index
+from . import geo
 
 class ItemFilter(django_filters.FilterSet):
-    category = django_filters.ModelChoiceFilter(queryset=Category.objects.all())
-    location = django_filters.CharFilter(lookup_expr='icontains')
+    category = django_filters.ModelChoiceFilter(queryset=Category.objects.cached(3600))
+    location = django_filters.CharFilter(method='filter_location')
+    # near=lat,lon مع radius بالكيلومتر
+    near = django_filters.CharFilter(method='filter_near')
+    radius = django_filters.NumberFilter(method='filter_radius')
     price_min = django_filters.NumberFilter(field_name='price', lookup_expr='gte')
     price_max = django_filters.NumberFilter(field_name='price', lookup_expr='lte')
     condition = django_filters.ChoiceFilter(choices=Item.CONDITION_CHOICES)
@@ -12,3 +18,37 @@ class ItemFilter(django_filters.FilterSet):
     class Meta:
         model = Item
         fields = ['category', 'location', 'condition', 'price_type']
+
+    def _radius(self):
+        return geo.parse_radius(self.data.get('radius'))
+
+    def filter_location(self, queryset, name, value):
+        # near له الأولوية على اسم المكان
+        if self.data.get('near'):
+            return queryset
+        return geo.filter_by_location(queryset, value, self._radius())
+
+    def filter_near(self, queryset, name, value):
+        point = geo.parse_point(value)
+        if point is None:
+            return queryset.none()
+        return geo.nearby(queryset, point[0], point[1], self._radius())
+
+    def filter_radius(self, queryset, name, value):
+        # يستخدم داخل filter_near و filter_location
+        return queryset
+
+class IndexedSearchFilter(filters.SearchFilter):
+    """بحث عبر الفهرس المعكوس بدلاً من icontains على الجدول كاملاً
+
+    النتائج تحمل relevance وترتبها ItemKeysetPagination بالصلة افتراضياً.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '')
+        if not query.strip():
+            return queryset
+        if not analyze(query):
+            # كلمات توقف فقط: مطابقة icontains على search_fields كما في SearchFilter
+            return super().filter_queryset(request, queryset, view)
+        return search_index.rank_queryset(queryset, query)
@@ -0,0 +1,267 @@
+import math
+from typing import Iterable, List, Optional, Tuple
+from django.db.models import F, FloatField, Q, ExpressionWrapper
+from django.db.models.functions import ASin, Cos, Power, Radians, Sin, Sqrt
+from .search import normalize_text, tokenize
+
+EARTH_RADIUS_KM = 6371.0088
+# نصف القطر الافتراضي عند تحويل اسم مكان إلى بحث بالقرب
+DEFAULT_RADIUS_KM = 15.0
+MAX_RADIUS_KM = 500.0
+GEOHASH_PRECISION = 7
+_GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+# الحد الأقصى لعدد خلايا geohash في الفلتر المبدئي
+_MAX_COVER_CELLS = 16
+
+# (الأسماء، خط العرض، خط الطول) - الأحياء قبل المدن عند تساوي التحديد
+GAZETTEER = [
+    # أحياء القاهرة والجيزة
+    (('مدينة نصر', 'Nasr City'), 30.0561, 31.3301),
+    (('مصر الجديدة', 'Heliopolis'), 30.0911, 31.3225),
+    (('المعادي', 'Maadi'), 29.9602, 31.2569),
+    (('الزمالك', 'Zamalek'), 30.0609, 31.2197),
+    (('شبرا', 'Shubra'), 30.0840, 31.2450),
+    (('الدقي', 'Dokki'), 30.0383, 31.2127),
+    (('المهندسين', 'Mohandessin'), 30.0553, 31.2003),
+    (('الهرم', 'Haram'), 29.9920, 31.1500),
+    (('فيصل', 'Faisal'), 30.0050, 31.1700),
+    (('إمبابة', 'Imbaba'), 30.0763, 31.2070),
+    (('حلوان', 'Helwan'), 29.8500, 31.3342),
+    (('عين شمس', 'Ain Shams'), 30.1310, 31.3290),
+    (('المطرية', 'Matariya'), 30.1214, 31.3137),
+    (('السيدة زينب', 'Sayeda Zeinab'), 30.0292, 31.2357),
+    (('المقطم', 'Mokattam'), 30.0194, 31.3033),
+    (('العباسية', 'Abbassia'), 30.0720, 31.2830),
+    (('التجمع الخامس', 'Fifth Settlement'), 30.0084, 31.4285),
+    (('القاهرة الجديدة', 'New Cairo'), 30.0074, 31.4913),
+    (('الشيخ زايد', 'Sheikh Zayed'), 30.0440, 30.9760),
+    (('السادس من أكتوبر', '6 أكتوبر', 'October', '6th of October'), 29.9285, 30.9188),
+    (('العاشر من رمضان', '10th of Ramadan'), 30.2925, 31.7418),
+    (('العبور', 'Obour'), 30.2283, 31.4778),
+    (('شبرا الخيمة', 'Shubra El Kheima'), 30.1286, 31.2422),
+    # أحياء الإسكندرية
+    (('سموحة', 'Smouha'), 31.2156, 29.9553),
+    (('سيدي جابر', 'Sidi Gaber'), 31.2186, 29.9423),
+    (('المنتزه', 'Montaza'), 31.2836, 30.0125),
+    (('العجمي', 'Agami'), 31.1000, 29.7700),
+    # المدن وعواصم المحافظات
+    (('القاهرة', 'Cairo'), 30.0444, 31.2357),
+    (('الجيزة', 'Giza'), 30.0131, 31.2089),
+    (('الإسكندرية', 'Alexandria', 'Alex'), 31.2001, 29.9187),
+    (('بورسعيد', 'بور سعيد', 'Port Said'), 31.2653, 32.3019),
+    (('السويس', 'Suez'), 29.9668, 32.5498),
+    (('الأقصر', 'Luxor'), 25.6872, 32.6396),
+    (('أسوان', 'Aswan'), 24.0889, 32.8998),
+    (('أسيوط', 'Asyut', 'Assiut'), 27.1783, 31.1859),
+    (('الإسماعيلية', 'Ismailia'), 30.5965, 32.2715),
+    (('الفيوم', 'Faiyum', 'Fayoum'), 29.3084, 30.8428),
+    (('الزقازيق', 'Zagazig'), 30.5877, 31.5020),
+    (('دمياط', 'Damietta'), 31.4175, 31.8144),
+    (('المنصورة', 'Mansoura'), 31.0409, 31.3785),
+    (('طنطا', 'Tanta'), 30.7865, 31.0004),
+    (('المنيا', 'Minya'), 28.1099, 30.7503),
+    (('بني سويف', 'Beni Suef'), 29.0661, 31.0994),
+    (('سوهاج', 'Sohag'), 26.5591, 31.6957),
+    (('قنا', 'Qena'), 26.1551, 32.7160),
+    (('الغردقة', 'Hurghada'), 27.2579, 33.8116),
+    (('بنها', 'Banha', 'Benha'), 30.4660, 31.1848),
+    (('شبين الكوم', 'Shibin El Kom'), 30.5526, 31.0090),
+    (('كفر الشيخ', 'Kafr El Sheikh'), 31.1107, 30.9388),
+    (('دمنهور', 'Damanhur'), 31.0341, 30.4682),
+    (('مرسى مطروح', 'مطروح', 'Marsa Matruh'), 31.3543, 27.2373),
+    (('شرم الشيخ', 'Sharm El Sheikh'), 27.9158, 34.3299),
+    (('العريش', 'Arish'), 31.1313, 33.7984),
+    (('الطور', 'El Tor'), 28.2364, 33.6254),
+    (('الخارجة', 'Kharga'), 25.4390, 30.5586),
+]
+
+
+def _place_key(name: str) -> Tuple[str, ...]:
+    return tuple(tokenize(name))
+
+
+# فهرس الأسماء الموحدة -> (ترتيب الأولوية، الإحداثيات)
+_PLACES = {}
+for _rank, (_names, _lat, _lon) in enumerate(GAZETTEER):
+    for _name in _names:
+        _PLACES.setdefault(_place_key(_name), (_rank, (_lat, _lon)))
+_MAX_PLACE_TOKENS = max(len(key) for key in _PLACES)
+
+
+def geocode(text: str) -> Optional[Tuple[float, float]]:
+    """تحويل اسم مكان مصري إلى (خط العرض، خط الطول) محلياً بدون خدمة خارجية
+
+    يختار أطول تطابق (الأكثر تحديداً) ثم الأسبق في القائمة (الأحياء قبل المدن).
+    """
+    tokens = tokenize(text)
+    best = None
+    for size in range(min(_MAX_PLACE_TOKENS, len(tokens)), 0, -1):
+        for start in range(len(tokens) - size + 1):
+            match = _PLACES.get(tuple(tokens[start:start + size]))
+            if match and (best is None or match[0] < best[0]):
+                best = match
+        if best:
+            return best[1]
+    return None
+
+
+def parse_point(value: str) -> Optional[Tuple[float, float]]:
+    """تحليل 'lat,lon'"""
+    try:
+        lat, lon = (float(part) for part in value.split(','))
+    except (AttributeError, ValueError):
+        return None
+    if -90 <= lat <= 90 and -180 <= lon <= 180:
+        return lat, lon
+    return None
+
+
+def parse_radius(value) -> float:
+    """نصف القطر بالكيلومتر محصوراً في حدود معقولة"""
+    try:
+        radius = float(value) if value not in (None, '') else DEFAULT_RADIUS_KM
+    except (TypeError, ValueError):
+        return DEFAULT_RADIUS_KM
+    if math.isnan(radius):
+        return DEFAULT_RADIUS_KM
+    return min(max(radius, 0.1), MAX_RADIUS_KM)
+
+
+def haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """المسافة بالكيلومتر بين نقطتين"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(1.0, a)))
+
+
+def bounding_box(lat: float, lon: float, radius_km: float) -> Tuple[float, float, float, float]:
+    """(أدنى عرض، أقصى عرض، أدنى طول، أقصى طول) لمربع يحيط بالدائرة"""
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+    dlon = min(180.0, math.degrees(radius_km / (EARTH_RADIUS_KM * cos_lat)))
+    return max(-90.0, lat - dlat), min(90.0, lat + dlat), lon - dlon, lon + dlon
+
+
+def geohash_encode(lat: float, lon: float, precision: int = GEOHASH_PRECISION) -> str:
+    """ترميز geohash"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        rng, value = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        bits <<= 1
+        if value >= mid:
+            bits |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_GEOHASH_ALPHABET[bits])
+            bits = bit_count = 0
+    return ''.join(chars)
+
+
+def _cell_size(precision: int) -> Tuple[float, float]:
+    """أبعاد خلية geohash (عرض، طول) بالدرجات"""
+    total_bits = 5 * precision
+    lon_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def covering_cells(min_lat, max_lat, min_lon, max_lon) -> List[str]:
+    """خلايا geohash بأدق مستوى يغطي المربع بعدد محدود من الخلايا"""
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        cell_lat, cell_lon = _cell_size(precision)
+        rows = math.floor(max_lat / cell_lat) - math.floor(min_lat / cell_lat) + 1
+        cols = math.floor(max_lon / cell_lon) - math.floor(min_lon / cell_lon) + 1
+        if rows * cols > _MAX_COVER_CELLS:
+            continue
+        cells = set()
+        for row in range(rows):
+            lat = min(max_lat, min_lat + row * cell_lat)
+            for col in range(cols):
+                lon = min(max_lon, min_lon + col * cell_lon)
+                cells.add(geohash_encode(lat, ((lon + 180) % 360) - 180, precision))
+            cells.add(geohash_encode(lat, ((max_lon + 180) % 360) - 180, precision))
+        for col in range(cols):
+            lon = min(max_lon, min_lon + col * cell_lon)
+            cells.add(geohash_encode(max_lat, ((lon + 180) % 360) - 180, precision))
+        cells.add(geohash_encode(max_lat, ((max_lon + 180) % 360) - 180, precision))
+        return sorted(cells)
+    return []
+
+
+def distance_expression(lat: float, lon: float):
+    """تعبير haversine يعمل على SQLite و PostgreSQL بدون PostGIS"""
+    phi = math.radians(lat)
+    dphi = Radians(F('latitude')) - phi
+    dlambda = Radians(F('longitude')) - math.radians(lon)
+    a = Power(Sin(dphi / 2), 2) + math.cos(phi) * Cos(Radians(F('latitude'))) * Power(Sin(dlambda / 2), 2)
+    return ExpressionWrapper(2 * EARTH_RADIUS_KM * ASin(Sqrt(a)), output_field=FloatField())
+
+
+def nearby(queryset, lat: float, lon: float, radius_km: float):
+    """المنتجات داخل نصف القطر مرتبة بالمسافة مع حقل distance
+
+    فلترة مبدئية بخلايا geohash ومربع الإحاطة (فهارس) ثم المسافة الدقيقة.
+    """
+    min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_km)
+    cells = Q()
+    for cell in covering_cells(min_lat, max_lat, min_lon, max_lon):
+        cells |= Q(geohash__startswith=cell)
+
+    if min_lon < -180 or max_lon > 180:
+        # مربع يعبر خط الطول 180 (غير وارد داخل مصر)
+        box = Q(latitude__range=(min_lat, max_lat))
+    else:
+        box = Q(latitude__range=(min_lat, max_lat), longitude__range=(min_lon, max_lon))
+
+    return (
+        queryset.filter(box, cells)
+        .annotate(distance=distance_expression(lat, lon))
+        .filter(distance__lte=radius_km)
+        .order_by('distance', 'pk')
+    )
+
+
+def filter_by_location(queryset, text: str, radius_km: float = DEFAULT_RADIUS_KM):
+    """فلترة الموقع: بالقرب من المكان إذا أمكن تحديده، وإلا بمطابقة النص"""
+    point = geocode(text)
+    if point:
+        return nearby(queryset, point[0], point[1], radius_km)
+    return queryset.filter(location__icontains=text)
+
+
+def filter_ranked(ranked: List[Tuple[int, float]], lat: float, lon: float, radius_km: float,
+                  chunk_size: int = 500) -> List[Tuple[int, float]]:
+    """تقليص نتائج بحث مرتبة إلى المنتجات داخل نصف القطر مع الحفاظ على الترتيب"""
+    from .models import Item
+
+    ids = [item_id for item_id, _ in ranked]
+    inside = set()
+    for start in range(0, len(ids), chunk_size):
+        inside.update(
+            nearby(Item.objects.filter(id__in=ids[start:start + chunk_size]), lat, lon, radius_km)
+            .values_list('id', flat=True)
+        )
+    return [pair for pair in ranked if pair[0] in inside]
+
+
+def locate(instance, fields: Iterable[str] = ('latitude', 'longitude')):
+    """تعيين الإحداثيات (و geohash إن وجد) من حقل location"""
+    point = geocode(getattr(instance, 'location', '') or '')
+    lat_field, lon_field = fields
+    if point:
+        setattr(instance, lat_field, point[0])
+        setattr(instance, lon_field, point[1])
+    else:
+        setattr(instance, lat_field, None)
+        setattr(instance, lon_field, None)
+    if hasattr(instance, 'geohash'):
+        instance.geohash = geohash_encode(*point) if point else ''
+    return point
@@ -0,0 +1,69 @@
+from typing import Dict, Optional
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from performance.utils import ImageOptimizer
+from .conditional import touch_item
+import logging
+
+logger = logging.getLogger('items')
+
+VARIANT_EXTENSIONS = {'webp': 'webp'}
+
+
+def variant_path(image_id: int, name: str) -> str:
+    """مسار تخزين نسخة من الصورة"""
+    extension = VARIANT_EXTENSIONS.get(name, 'jpg')
+    return f"items/variants/{image_id}/{name}.{extension}"
+
+
+def read_image(image) -> bytes:
+    """قراءة بيانات الصورة الأصلية من التخزين"""
+    with image.image.open('rb') as image_file:
+        return image_file.read()
+
+
+def save_variants(image, rendered: Dict[str, bytes]) -> Dict[str, str]:
+    """حفظ النسخ في التخزين وتسجيل مساراتها على ItemImage"""
+    from .models import ItemImage
+
+    variants = {}
+    for name, data in rendered.items():
+        path = variant_path(image.pk, name)
+        if default_storage.exists(path):
+            default_storage.delete(path)
+        variants[name] = default_storage.save(path, ContentFile(data))
+
+    # update() لتجنب إعادة تشغيل إشارة post_save
+    ItemImage.objects.filter(pk=image.pk).update(variants=variants)
+    image.variants = variants
+    touch_item(image.item_id)
+    return variants
+
+
+def generate_variants(image_id: int) -> Optional[Dict[str, str]]:
+    """إنتاج جميع نسخ صورة منتج (تستدعى من مهمة Celery)"""
+    from .models import ItemImage
+
+    image = ItemImage.objects.filter(pk=image_id).first()
+    if image is None:
+        return None
+    try:
+        rendered = ImageOptimizer.render_variants(read_image(image))
+    except OSError as e:
+        logger.error(f"Image variant generation failed for {image_id}: {e}")
+        return None
+    return save_variants(image, rendered)
+
+
+def variant_urls(image, request=None) -> Dict[str, str]:
+    """روابط النسخ المتاحة للصورة"""
+    return variant_urls_from(image.variants, request)
+
+
+def variant_urls_from(variants: Optional[Dict[str, str]], request=None) -> Dict[str, str]:
+    """روابط النسخ من قاموس المسارات المخزن"""
+    urls = {}
+    for name, path in (variants or {}).items():
+        url = default_storage.url(path)
+        urls[name] = request.build_absolute_uri(url) if request else url
+    return urls
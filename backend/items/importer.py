@@ -0,0 +1,152 @@
+import codecs
+import csv
+import json
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from django.db import transaction
+import logging
+
+logger = logging.getLogger('items')
+
+FORMATS = ('csv', 'jsonl')
+CONTENT_TYPES = {
+    'text/csv': 'csv',
+    'application/csv': 'csv',
+    'application/x-ndjson': 'jsonl',
+    'application/jsonl': 'jsonl',
+    'application/x-jsonlines': 'jsonl',
+}
+
+
+def detect_format(content_type: str = '', filename: str = '') -> Optional[str]:
+    """تحديد الصيغة من نوع المحتوى أو امتداد الملف"""
+    fmt = CONTENT_TYPES.get((content_type or '').split(';')[0].strip().lower())
+    if fmt:
+        return fmt
+    extension = (filename or '').rsplit('.', 1)[-1].lower()
+    if extension in ('csv', 'jsonl', 'ndjson'):
+        return 'jsonl' if extension == 'ndjson' else extension
+    return None
+
+
+def _text_lines(stream) -> Iterator[str]:
+    """سطور نصية من ملف أو تدفق bytes بدون قراءته كاملاً في الذاكرة"""
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    pending = ''
+    while True:
+        chunk = stream.read(64 * 1024)
+        if not chunk:
+            break
+        pending += decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+        lines = pending.split('\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line + '\n'
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending
+
+
+def iter_rows(stream, fmt: str) -> Iterator[Tuple[int, Optional[Dict], Optional[str]]]:
+    """(رقم السطر، الصف، خطأ التحليل) لكل سجل في التدفق"""
+    lines = _text_lines(stream)
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        for row in reader:
+            # القيم الفارغة تعامل كحقول غير مرسلة
+            yield reader.line_num, {key: value for key, value in row.items() if key and value not in ('', None)}, None
+    else:
+        for line_number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                yield line_number, None, 'JSON غير صالح'
+                continue
+            if not isinstance(row, dict):
+                yield line_number, None, 'يجب أن يكون كل سطر كائن JSON'
+                continue
+            yield line_number, row, None
+
+
+class ItemImporter:
+    """استيراد منتجات بالجملة من CSV أو JSONL
+
+    كل صف يتحقق بقواعد ItemCreateSerializer مع فئات محملة مسبقاً، والصفوف
+    الصالحة تدرج بـ bulk_create على دفعات كل منها في معاملة مستقلة. أخطاء
+    الصفوف تسجل بدون إيقاف الاستيراد.
+    """
+
+    batch_size = 500
+    # أقصى عدد أخطاء تعاد في التقرير
+    max_reported_errors = 100
+
+    def __init__(self, user, batch_size: Optional[int] = None, max_rows: Optional[int] = None):
+        self.user = user
+        self.batch_size = batch_size or self.batch_size
+        self.max_rows = max_rows
+        self.categories = self.load_categories()
+
+    def load_categories(self) -> Dict:
+        """قاموس الفئات بالمعرف والاسم بالعربية والإنجليزية"""
+        from .models import Category
+
+        categories = {}
+        for category in Category.objects.cached(3600):
+            for key in (category.pk, category.name, category.name_ar):
+                categories.setdefault(str(key).strip().lower(), category)
+        return categories
+
+    def build_item(self, data: Dict):
+        from .models import Item
+        from . import geo
+
+        item = Item(user=self.user, **data)
+        if item.latitude is None or item.longitude is None:
+            geo.locate(item)
+        else:
+            item.geohash = geo.geohash_encode(item.latitude, item.longitude)
+        return item
+
+    def insert(self, items: List) -> List:
+        """إدراج دفعة في معاملة واحدة مع إشارة الإنشاء الجماعي"""
+        from .models import Item
+        from .signals import items_bulk_created
+
+        with transaction.atomic():
+            created = Item.objects.bulk_create(items)
+            items_bulk_created.send(sender=Item, items=created)
+        return created
+
+    def run(self, rows: Iterable[Tuple[int, Optional[Dict], Optional[str]]]) -> Dict:
+        from .serializers import ItemImportSerializer
+
+        context = {'categories': self.categories}
+        result = {'created': 0, 'failed': 0, 'errors': []}
+        batch = []
+
+        def fail(line, errors):
+            result['failed'] += 1
+            if len(result['errors']) < self.max_reported_errors:
+                result['errors'].append({'row': line, 'errors': errors})
+
+        for count, (line, row, error) in enumerate(rows, start=1):
+            if self.max_rows and count > self.max_rows:
+                fail(line, {'non_field_errors': [f'تم تجاوز الحد الأقصى ({self.max_rows} صف)']})
+                break
+            if error:
+                fail(line, {'non_field_errors': [error]})
+                continue
+            serializer = ItemImportSerializer(data=row, context=context)
+            if not serializer.is_valid():
+                fail(line, serializer.errors)
+                continue
+            batch.append(self.build_item(serializer.validated_data))
+            if len(batch) >= self.batch_size:
+                result['created'] += len(self.insert(batch))
+                batch = []
+
+        if batch:
+            result['created'] += len(self.insert(batch))
+        logger.info(f"Item import by {self.user.pk}: {result['created']} created, {result['failed']} failed")
+        return result
@@ -0,0 +1,95 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+from accounts.models import User
+from items.images import variant_path
+from items.models import Category, Item, ItemImage
+from items.serializers import ItemListSerializer, ItemListValuesSerializer
+from performance.serialization import dumps
+from performance.utils import ImageOptimizer
+
+
+class Rollback(Exception):
+    """إلغاء بيانات القياس بعد الانتهاء"""
+
+
+class Command(BaseCommand):
+    help = 'مقارنة سرعة مسلسل قائمة المنتجات العادي ومسار values() على بيانات مؤقتة'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--items',
+            type=int,
+            default=10000,
+            help='عدد المنتجات المؤقتة (افتراضي: 10000)'
+        )
+        parser.add_argument(
+            '--rounds',
+            type=int,
+            default=3,
+            help='عدد مرات القياس، يؤخذ أفضلها (افتراضي: 3)'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.benchmark(options['items'], options['rounds'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, count):
+        user = User.objects.create_user(username='benchmark-serializers', password=None)
+        category = Category.objects.create(name='benchmark-serializers', name_ar='قياس')
+        items = Item.objects.bulk_create([
+            Item(
+                title=f'منتج للقياس {i}',
+                description='وصف منتج مستعمل بحالة جيدة',
+                category=category,
+                user=user,
+                condition='good',
+                quantity=1,
+                unit='قطعة',
+                price=i % 500,
+                location='القاهرة',
+                status='active',
+            )
+            for i in range(count)
+        ], batch_size=1000)
+        ItemImage.objects.bulk_create([
+            # نفس مفاتيح generate_variants (المقاسات وwebp)
+            ItemImage(item=item, image=f'items/{item.pk}.jpg', is_primary=True, variants={
+                name: variant_path(item.pk, name)
+                for name in [str(size) for size in ImageOptimizer.VARIANT_SIZES] + ['webp']
+            })
+            for item in items
+        ], batch_size=1000)
+        return category
+
+    def benchmark(self, count, rounds):
+        category = self.seed(count)
+        request = APIRequestFactory().get('/api/items/')
+        context = {'request': request}
+        queryset = Item.objects.for_list().filter(category=category).order_by('-created_at', '-pk')
+
+        def drf():
+            return JSONRenderer().render(ItemListSerializer(queryset.all(), many=True, context=context).data)
+
+        def values():
+            serializer = ItemListValuesSerializer(context)
+            return dumps(serializer.many(list(serializer.values(queryset.all()))))
+
+        if drf() != values():
+            raise CommandError('مخرجات المسارين غير متطابقة')
+
+        for name, render in (('DRF', drf), ('values()', values)):
+            best = min(self.measure(render) for _ in range(rounds))
+            self.stdout.write(f"{name}: {best * 1000:.0f}ms ({count / best:.0f} منتج/ثانية)")
+        self.stdout.write(self.style.SUCCESS(f'المخرجات متطابقة لـ {count} منتج'))
+
+    def measure(self, render):
+        start = time.perf_counter()
+        render()
+        return time.perf_counter() - start
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from items.expiry import expire_due_items
+
+class Command(BaseCommand):
+    help = 'إنهاء المنتجات التي تجاوزت تاريخ انتهاء الصلاحية'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='عدد المنتجات في كل دفعة (افتراضي: 500)'
+        )
+
+    def handle(self, *args, **options):
+        expired = expire_due_items(batch_size=options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'تم إنهاء {expired} منتج')
+        )
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from items.counters import item_counters
+
+class Command(BaseCommand):
+    help = 'كتابة عدادات المشاهدات والاهتمام المعلقة في قاعدة البيانات'
+
+    def handle(self, *args, **options):
+        updated = item_counters.flush()
+        self.stdout.write(
+            self.style.SUCCESS(f'تم تحديث عدادات {updated} منتج')
+        )
@@ -0,0 +1,60 @@
+import os
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ProcessPoolExecutor, wait
+from django.core.management.base import BaseCommand
+from items.images import read_image, save_variants
+from items.models import ItemImage
+from performance.utils import ImageOptimizer
+
+class Command(BaseCommand):
+    help = 'إنتاج المصغرات ونسخ WebP لصور المنتجات على مجموعة عمليات'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='إعادة إنتاج النسخ لجميع الصور وليس الناقصة فقط',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='عدد العمليات (افتراضي: عدد المعالجات)'
+        )
+
+    def handle(self, *args, **options):
+        images = ItemImage.objects.order_by('pk')
+        if not options['all']:
+            images = images.filter(variants={})
+
+        self.processed = self.failed = 0
+        # فك الصور وإعادة تحجيمها في عمليات منفصلة، والتخزين في العملية الرئيسية
+        max_in_flight = options['workers'] * 4
+        with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+            futures = {}
+            for image in images.iterator(chunk_size=100):
+                try:
+                    data = read_image(image)
+                except OSError as e:
+                    self.stdout.write(f'✗ {image.pk}: {e}')
+                    self.failed += 1
+                    continue
+                futures[executor.submit(ImageOptimizer.render_variants, data)] = image
+                if len(futures) >= max_in_flight:
+                    self.collect(futures, FIRST_COMPLETED)
+            self.collect(futures, ALL_COMPLETED)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'تمت معالجة {self.processed} صورة ({self.failed} فشل)')
+        )
+
+    def collect(self, futures, wait_for):
+        """حفظ نتائج العمليات المكتملة"""
+        done, _ = wait(futures, return_when=wait_for)
+        for future in done:
+            image = futures.pop(future)
+            try:
+                save_variants(image, future.result())
+                self.processed += 1
+            except OSError as e:
+                self.stdout.write(f'✗ {image.pk}: {e}')
+                self.failed += 1
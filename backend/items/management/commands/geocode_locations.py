@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from accounts.models import User
+from items.models import Item
+from items import geo
+
+class Command(BaseCommand):
+    help = 'تحديد إحداثيات المنتجات والمستخدمين من أسماء الأماكن'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='إعادة تحديد الإحداثيات للجميع وليس فقط الناقصة'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='عدد السجلات في كل دفعة (افتراضي: 500)'
+        )
+
+    def locate(self, queryset, fields, batch_size):
+        """تحديث الإحداثيات بدفعات bulk_update مرتبة بالمعرف"""
+        updated = 0
+        last_id = 0
+        queryset = queryset.only('id', *fields).order_by('id')
+        while True:
+            batch = list(queryset.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                return updated
+            last_id = batch[-1].id
+            located = [obj for obj in batch if geo.locate(obj)]
+            queryset.model.objects.bulk_update(located, [f for f in fields if f != 'location'])
+            updated += len(located)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        items = Item.objects.all()
+        users = User.objects.exclude(location='')
+        if not options['all']:
+            items = items.filter(latitude__isnull=True)
+            users = users.filter(latitude__isnull=True)
+
+        item_count = self.locate(items, ('location', 'latitude', 'longitude', 'geohash'), batch_size)
+        user_count = self.locate(users, ('location', 'latitude', 'longitude'), batch_size)
+        self.stdout.write(
+            self.style.SUCCESS(f'تم تحديد إحداثيات {item_count} منتج و {user_count} مستخدم')
+        )
@@ -0,0 +1,43 @@
+import json
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from accounts.models import User
+from items.importer import FORMATS, ItemImporter, detect_format, iter_rows
+
+class Command(BaseCommand):
+    help = 'استيراد منتجات بالجملة من ملف CSV أو JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='مسار الملف أو - للقراءة من stdin')
+        parser.add_argument('--user', required=True, help='اسم المستخدم صاحب المنتجات')
+        parser.add_argument('--format', choices=FORMATS, help='صيغة الملف (افتراضياً من الامتداد)')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='عدد المنتجات في كل دفعة إدراج (افتراضي: 500)'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"المستخدم {options['user']} غير موجود")
+
+        path = options['path']
+        fmt = options['format'] or detect_format(filename=path)
+        if fmt is None:
+            raise CommandError('حدد الصيغة بـ --format')
+
+        importer = ItemImporter(user, batch_size=options['batch_size'])
+        if path == '-':
+            result = importer.run(iter_rows(sys.stdin.buffer, fmt))
+        else:
+            with open(path, 'rb') as stream:
+                result = importer.run(iter_rows(stream, fmt))
+
+        for error in result['errors']:
+            self.stderr.write(json.dumps(error, ensure_ascii=False, default=str))
+        self.stdout.write(
+            self.style.SUCCESS(f"تم استيراد {result['created']} منتج، وفشل {result['failed']} صف")
+        )
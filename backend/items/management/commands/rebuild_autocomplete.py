@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+from items.autocomplete import Snapshot, autocomplete_index
+
+class Command(BaseCommand):
+    help = 'إعادة بناء لقطة الإكمال التلقائي من المنتجات النشطة والفئات'
+
+    def handle(self, *args, **options):
+        self.stdout.write('بدء إعادة بناء الإكمال التلقائي...')
+        data = autocomplete_index.compact(full=True)
+        if data is None:
+            raise CommandError('عامل آخر يعيد بناء اللقطة الآن')
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'تم بناء {len(Snapshot.loads(data).entries)} اقتراح ({len(data)} بايت مضغوط)'
+            )
+        )
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from items.duplicates import duplicate_detector
+
+class Command(BaseCommand):
+    help = 'إعادة حساب تواقيع MinHash للمنتجات وتحديد إعادات النشر'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='عدد المنتجات في كل دفعة (افتراضي: 500)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('بدء إعادة حساب التواقيع...')
+        indexed = duplicate_detector.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'تم حساب توقيع {indexed} منتج')
+        )
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from items.facets import item_facets
+
+class Command(BaseCommand):
+    help = 'إعادة حساب أعداد الفلاتر للمنتجات النشطة'
+
+    def handle(self, *args, **options):
+        self.stdout.write('بدء إعادة حساب أعداد الفلاتر...')
+        rows = item_facets.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f'تم حساب {rows} قيمة')
+        )
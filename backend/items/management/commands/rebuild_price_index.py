@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from items.prices import price_index
+
+class Command(BaseCommand):
+    help = 'إعادة حساب ملخصات الأسعار لكل فئة وحالة ووحدة'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='عدد المنتجات في كل دفعة قراءة (افتراضي: 2000)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('بدء إعادة حساب ملخصات الأسعار...')
+        counted = price_index.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'تم تلخيص أسعار {counted} منتج')
+        )
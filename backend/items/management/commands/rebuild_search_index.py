@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from items.search import search_index
+
+class Command(BaseCommand):
+    help = 'إعادة بناء فهرس البحث للمنتجات'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='عدد المنتجات في كل دفعة (افتراضي: 500)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('بدء إعادة بناء فهرس البحث...')
+        indexed = search_index.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'تمت فهرسة {indexed} منتج')
+        )
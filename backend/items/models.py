@@ -1,5 +1,6 @@
 from django.db import models
 from accounts.models import User
+from performance.cache import CachingQuerySet
 
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -9,12 +10,31 @@ class Category(models.Model):
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = CachingQuerySet.as_manager()
+
     class Meta:
         verbose_name_plural = "Categories"
 
     def __str__(self):
         return self.name_ar
 
+class ItemQuerySet(CachingQuerySet):
+    """استعلامات محسنة لنقاط نهاية المنتجات بدون N+1"""
+
+    def for_list(self):
+        """للقوائم: المستخدم والفئة بربط واحد والصورة الأساسية باستعلام مسبق"""
+        return self.select_related('user', 'category').prefetch_related(
+            models.Prefetch(
+                'images',
+                queryset=ItemImage.objects.filter(is_primary=True),
+                to_attr='primary_images'
+            )
+        )
+
+    def for_detail(self):
+        """لصفحة المنتج: مع جميع الصور"""
+        return self.select_related('user', 'category').prefetch_related('images')
+
 class Item(models.Model):
     CONDITION_CHOICES = [
         ('excellent', 'ممتاز'),
@@ -54,6 +74,10 @@ class Item(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     price_type = models.CharField(max_length=20, choices=PRICE_TYPE_CHOICES, default='free')
     location = models.CharField(max_length=200)
+    # إحداثيات الموقع (من الخريطة أو من اسم المكان) وخلية geohash للفلترة المبدئية
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    geohash = models.CharField(max_length=12, blank=True, db_index=True)
     contact_method = models.CharField(max_length=20, choices=CONTACT_METHOD_CHOICES, default='both')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     views = models.PositiveIntegerField(default=0)
@@ -62,9 +86,26 @@ class Item(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     expires_at = models.DateTimeField(null=True, blank=True)
+    # المنتج الأصلي إذا كان هذا إعادة نشر شبه مطابقة من نفس البائع
+    duplicate_of = models.ForeignKey(
+        'self', on_delete=models.SET_NULL, null=True, blank=True, related_name='duplicates'
+    )
+
+    objects = ItemQuerySet.as_manager()
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # فهارس تقسيم الصفحات بالمؤشر (حقل الترتيب، id)
+            models.Index(fields=['status', '-created_at', '-id']),
+            models.Index(fields=['status', '-views', '-id']),
+            models.Index(fields=['status', 'price', 'id']),
+            models.Index(fields=['user', '-created_at', '-id']),
+            # مربع الإحاطة في البحث بالقرب
+            models.Index(fields=['latitude', 'longitude']),
+            # المنتجات النشطة المنتهية لعملية الإنهاء الدوري
+            models.Index(fields=['status', 'expires_at', 'id']),
+        ]
 
     def __str__(self):
         return self.title
@@ -73,6 +114,8 @@ class ItemImage(models.Model):
     item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='images')
     image = models.ImageField(upload_to='items/')
     is_primary = models.BooleanField(default=False)
+    # مسارات النسخ المصغرة {'150': path, '300': path, '600': path, 'webp': path}
+    variants = models.JSONField(default=dict, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -104,3 +147,81 @@ class ItemReport(models.Model):
 
     def __str__(self):
         return f"بلاغ على {self.item.title}"
+
+class SearchPosting(models.Model):
+    """مدخل في الفهرس المعكوس للبحث (مصطلح -> منتج)"""
+    term = models.CharField(max_length=64)
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='search_postings')
+    weight = models.FloatField(default=0)
+
+    class Meta:
+        unique_together = ['term', 'item']
+
+    def __str__(self):
+        return f"{self.term} -> {self.item_id}"
+
+class ItemSignature(models.Model):
+    """توقيع MinHash لنص المنتج (العنوان والوصف)"""
+    item = models.OneToOneField(Item, on_delete=models.CASCADE, primary_key=True, related_name='signature')
+    minhash = models.JSONField(default=list)
+
+    def __str__(self):
+        return f"توقيع {self.item_id}"
+
+class ItemBand(models.Model):
+    """شريحة LSH من توقيع المنتج: المنتجات في نفس الخانة مرشحة للتشابه"""
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='bands')
+    bucket = models.BigIntegerField(db_index=True)
+
+    def __str__(self):
+        return f"{self.bucket} -> {self.item_id}"
+
+class PriceDigest(models.Model):
+    """ملخصات t-digest لسعر الوحدة لكل (فئة، حالة، وحدة)"""
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='price_digests')
+    condition = models.CharField(max_length=20)
+    unit = models.CharField(max_length=50)
+    listed = models.JSONField(default=dict)
+    sold = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['category', 'condition', 'unit']
+
+    def __str__(self):
+        return f"{self.category_id}/{self.condition}/{self.unit}"
+
+class FacetCount(models.Model):
+    """عدد المنتجات النشطة لكل قيمة فلتر (فئة، حالة، نوع السعر، موقع)"""
+    facet = models.CharField(max_length=20)
+    value = models.CharField(max_length=200)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ['facet', 'value']
+
+    def __str__(self):
+        return f"{self.facet}={self.value}: {self.count}"
+
+class PlatformStats(models.Model):
+    """إحصائيات المنصة في صف واحد محدث بالفروق ويعاد حسابه دورياً"""
+    total_items = models.IntegerField(default=0)
+    total_users = models.IntegerField(default=0)
+    completed_deals = models.IntegerField(default=0)
+    registered_users = models.IntegerField(default=0)
+    reconciled_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "Platform stats"
+
+    def __str__(self):
+        return f"إحصائيات المنصة ({self.updated_at})"
+
+class CounterFlush(models.Model):
+    """لقطة عدادات طبقت على جدول المنتجات (لمنع تطبيقها مرتين)"""
+    flush_id = models.CharField(max_length=64, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return self.flush_id
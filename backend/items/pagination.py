@@ -0,0 +1,209 @@
+import base64
+import json
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class ItemKeysetPagination(BasePagination):
+    """تقسيم صفحات بمؤشر (keyset) على (حقل الترتيب، id) بتكلفة ثابتة لأي عمق"""
+
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    ordering_param = 'ordering'
+    ordering_fields = ('created_at', 'views', 'price')
+    # حقول محسوبة يمكن الترتيب بها إذا كانت موجودة في الاستعلام (الصلة والمسافة)
+    # بالاتجاه الافتراضي لكل منها
+    annotation_ordering_fields = ('-relevance', 'distance')
+    default_ordering = '-created_at'
+    invalid_cursor_message = 'المؤشر غير صالح'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_ordering(self, request, view=None, queryset=None) -> str:
+        """حقل الترتيب المطلوب (مع - للتنازلي) أو الافتراضي"""
+        allowed = getattr(view, 'ordering_fields', None) or self.ordering_fields
+        annotated = [
+            field for field in self.annotation_ordering_fields
+            if queryset is not None and field.lstrip('-') in queryset.query.annotations
+        ]
+        ordering = request.query_params.get(self.ordering_param, '').split(',')[0].strip()
+        if ordering.lstrip('-') in [field.lstrip('-') for field in annotated]:
+            return ordering
+        if ordering.lstrip('-') in allowed and ordering.lstrip('-') in self.ordering_fields:
+            return ordering
+        # نتائج البحث ترتب بالصلة والاستعلامات المحسوبة بالمسافة بالأقرب افتراضياً
+        if annotated:
+            return annotated[0]
+        return self.default_ordering
+
+    def _field_info(self, queryset, field):
+        """(دالة التحويل، يقبل null) لحقل الترتيب"""
+        if field in queryset.query.annotations:
+            return float, False
+        model_field = queryset.model._meta.get_field(field)
+        return model_field.to_python, model_field.null
+
+    def encode_cursor(self, ordering: str, value, pk: int, reverse: bool) -> str:
+        payload = {'o': ordering, 'v': value, 'id': pk}
+        if reverse:
+            payload['r'] = 1
+        data = json.dumps(payload, default=str, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+    def decode_cursor(self, request, ordering: str) -> Optional[dict]:
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            cursor = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            if cursor['o'] != ordering:
+                raise ValueError
+            int(cursor['id'])
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def _keyset_filter(self, field, value, pk, ascending: bool, nulls_last: bool, nullable: bool) -> Q:
+        """شرط الصفوف التي تأتي بعد الموضع (value, pk) في الترتيب المعطى"""
+        after = 'gt' if ascending else 'lt'
+        if value is None:
+            condition = Q(**{f'{field}__isnull': True, f'pk__{after}': pk})
+            if not nulls_last:
+                condition |= Q(**{f'{field}__isnull': False})
+            return condition
+        condition = Q(**{f'{field}__{after}': value}) | Q(**{field: value, f'pk__{after}': pk})
+        if nullable and nulls_last:
+            condition |= Q(**{f'{field}__isnull': True})
+        return condition
+
+    def _order_by(self, field, ascending: bool, nulls_last: bool, nullable: bool):
+        if nullable:
+            nulls = {'nulls_last': True} if nulls_last else {'nulls_first': True}
+        else:
+            nulls = {}
+        expression = F(field).asc(**nulls) if ascending else F(field).desc(**nulls)
+        return [expression, F('pk').asc() if ascending else F('pk').desc()]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size_value = self.get_page_size(request)
+        self.ordering = self.get_ordering(request, view, queryset)
+        field = self.ordering.lstrip('-')
+        to_python, nullable = self._field_info(queryset, field)
+        cursor = self.decode_cursor(request, self.ordering)
+        self.reverse = bool(cursor and cursor.get('r'))
+
+        # الاتجاه العكسي يستخدم لجلب الصفحة السابقة
+        ascending = not self.ordering.startswith('-')
+        nulls_last = True
+        if self.reverse:
+            ascending, nulls_last = not ascending, False
+
+        queryset = queryset.order_by(*self._order_by(field, ascending, nulls_last, nullable))
+        if cursor:
+            value = cursor['v']
+            if value is not None:
+                try:
+                    value = to_python(value)
+                except (ValidationError, TypeError, ValueError):
+                    raise NotFound(self.invalid_cursor_message)
+            queryset = queryset.filter(
+                self._keyset_filter(field, value, int(cursor['id']), ascending, nulls_last, nullable)
+            )
+
+        rows = list(queryset[:self.page_size_value + 1])
+        has_more = len(rows) > self.page_size_value
+        rows = rows[:self.page_size_value]
+        if self.reverse:
+            rows.reverse()
+
+        self.next_cursor = self.previous_cursor = None
+        if rows:
+            first, last = rows[0], rows[-1]
+            if has_more or self.reverse:
+                self.next_cursor = self.encode_cursor(self.ordering, *self._position(last, field), False)
+            if cursor and (has_more or not self.reverse):
+                self.previous_cursor = self.encode_cursor(self.ordering, *self._position(first, field), True)
+        return rows
+
+    def _position(self, row, field):
+        """(قيمة حقل الترتيب، id) لكائن أو لصف values()"""
+        if isinstance(row, dict):
+            return row[field], row['id']
+        return getattr(row, field), row.pk
+
+    def paginate_ranked(self, ranked: List[Tuple[int, float]], request) -> List[int]:
+        """تقسيم نتائج بحث مرتبة بالصلة [(id, score)] بمؤشر على (score, id)"""
+        self.request = request
+        self.page_size_value = self.get_page_size(request)
+        self.ordering = 'relevance'
+        cursor = self.decode_cursor(request, self.ordering)
+        self.reverse = bool(cursor and cursor.get('r'))
+
+        # النتائج مرتبة تنازلياً، فالمفاتيح السالبة مرتبة تصاعدياً للبحث الثنائي
+        start, end = 0, self.page_size_value
+        if cursor:
+            try:
+                key = (-float(cursor['v']), -int(cursor['id']))
+            except (TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+            keys = [(-score, -item_id) for item_id, score in ranked]
+            if self.reverse:
+                position = bisect_left(keys, key)
+                start, end = max(0, position - self.page_size_value), position
+            else:
+                position = bisect_right(keys, key)
+                start, end = position, position + self.page_size_value
+        page = ranked[start:end]
+
+        self.next_cursor = self.previous_cursor = None
+        if page:
+            if end < len(ranked):
+                self.next_cursor = self.encode_cursor(self.ordering, page[-1][1], page[-1][0], False)
+            if start > 0:
+                self.previous_cursor = self.encode_cursor(self.ordering, page[0][1], page[0][0], True)
+        return [item_id for item_id, _ in page]
+
+    def _link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        return self._link(self.next_cursor)
+
+    def get_previous_link(self):
+        return self._link(self.previous_cursor)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
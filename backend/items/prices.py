@@ -0,0 +1,249 @@
+import math
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+from django.db import IntegrityError, transaction
+from performance.cache import ReadThroughCache
+from .search import normalize_text
+import logging
+
+logger = logging.getLogger('items')
+
+# دقة الملخص: عدد المراكز لا يتجاوز تقريباً هذه القيمة
+COMPRESSION = 100
+# أقل عدد أسعار لاعتبار الملخص كافياً قبل الرجوع لكل الحالات
+MIN_SAMPLES = 5
+QUANTILES = {'p10': 0.1, 'p25': 0.25, 'median': 0.5, 'p75': 0.75, 'p90': 0.9}
+PRICED_TYPES = ('fixed', 'negotiable')
+# listed: أسعار العرض عند الإنشاء، sold: أسعار المنتجات المباعة
+KINDS = ('listed', 'sold')
+
+# الملخصات المحسوبة في ذاكرة العملية، تبطل لكل (فئة، وحدة) يتغير ملخصها
+price_cache = ReadThroughCache('price_suggestions', timeout=3600, max_local_entries=1024)
+
+
+def _k(q: float) -> float:
+    """دالة المقياس k1: مراكز أصغر عند الأطراف لدقة أعلى في المئينات البعيدة"""
+    return COMPRESSION / (2 * math.pi) * math.asin(2 * q - 1)
+
+
+class TDigest:
+    """ملخص t-digest لتوزيع قيم قابل للدمج (مراكز [متوسط، وزن] مرتبة)"""
+
+    def __init__(self, centroids: Optional[List[List[float]]] = None,
+                 minimum: Optional[float] = None, maximum: Optional[float] = None):
+        self.centroids = [list(centroid) for centroid in centroids or []]
+        self.min = minimum
+        self.max = maximum
+
+    @property
+    def count(self) -> float:
+        return sum(weight for _, weight in self.centroids)
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict]) -> 'TDigest':
+        data = data or {}
+        return cls(data.get('c'), data.get('min'), data.get('max'))
+
+    def to_dict(self) -> Dict:
+        if not self.centroids:
+            return {}
+        return {'c': self.centroids, 'min': self.min, 'max': self.max}
+
+    def add(self, values: Iterable[float]) -> 'TDigest':
+        values = [float(value) for value in values]
+        if values:
+            self._merge([[value, 1.0] for value in values], min(values), max(values))
+        return self
+
+    def merge(self, other: 'TDigest') -> 'TDigest':
+        if other.centroids:
+            self._merge(other.centroids, other.min, other.max)
+        return self
+
+    def _merge(self, centroids, minimum, maximum):
+        self.min = minimum if self.min is None else min(self.min, minimum)
+        self.max = maximum if self.max is None else max(self.max, maximum)
+        points = sorted(self.centroids + [list(centroid) for centroid in centroids])
+        total = sum(weight for _, weight in points)
+
+        merged = []
+        mean, weight = points[0]
+        weight_before = 0.0
+        k_lower = _k(0.0)
+        for next_mean, next_weight in points[1:]:
+            if _k((weight_before + weight + next_weight) / total) - k_lower <= 1:
+                weight += next_weight
+                mean += (next_mean - mean) * next_weight / weight
+            else:
+                merged.append([mean, weight])
+                weight_before += weight
+                k_lower = _k(weight_before / total)
+                mean, weight = next_mean, next_weight
+        merged.append([mean, weight])
+        self.centroids = merged
+
+    def quantile(self, q: float) -> Optional[float]:
+        """القيمة عند المئين q بالاستيفاء بين مراكز الكتل"""
+        if not self.centroids:
+            return None
+        # نقاط (الوزن التراكمي، القيمة) من الأصغر إلى الأكبر
+        points = [(0.0, self.min)]
+        cumulative = 0.0
+        for mean, weight in self.centroids:
+            points.append((cumulative + weight / 2, mean))
+            cumulative += weight
+        points.append((cumulative, self.max))
+
+        target = q * cumulative
+        for (left_rank, left), (right_rank, right) in zip(points, points[1:]):
+            if target <= right_rank:
+                if right_rank == left_rank:
+                    return right
+                return left + (right - left) * (target - left_rank) / (right_rank - left_rank)
+        return self.max
+
+
+def normalize_unit(unit: str) -> str:
+    """توحيد كتابة الوحدة (كيلو/كيلو، قطعة/قطعه)"""
+    return normalize_text(unit or '').strip()[:50]
+
+
+def unit_price(item) -> Optional[float]:
+    """سعر الوحدة لمنتج بسعر، أو None للمجاني أو بدون سعر"""
+    if item.price_type not in PRICED_TYPES or item.price is None or item.price <= 0:
+        return None
+    return float(item.price) / max(item.quantity or 1, 1)
+
+
+def digest_key(item) -> Tuple[int, str, str]:
+    return item.category_id, item.condition, normalize_unit(item.unit)
+
+
+def summary_group(category_id: int, unit: str) -> str:
+    """مجموعة الكاش لاقتراحات (فئة، وحدة): الاقتراح قد يدمج كل حالاتها"""
+    return f"{category_id}:{unit}"
+
+
+class PriceIndex:
+    """ملخصات أسعار الوحدة لكل (فئة، حالة، وحدة) تحدث بالدمج
+
+    كل إضافة تدمج ملخص الأسعار الجديدة في صف PriceDigest المقفل بدلاً من
+    إعادة قراءة المنتجات. الاقتراحات تقرأ من ذاكرة العملية، وعند قلة
+    الأسعار لحالة معينة تدمج ملخصات كل حالات الفئة والوحدة.
+    """
+
+    def add_items(self, items: Iterable, kind: str = 'listed'):
+        """إضافة أسعار مجموعة منتجات إلى ملخصاتها"""
+        values = defaultdict(list)
+        for item in items:
+            price = unit_price(item)
+            if price is not None:
+                values[digest_key(item)].append(price)
+        if values:
+            self.apply({key: TDigest().add(prices) for key, prices in values.items()}, kind)
+
+    def apply(self, digests: Dict[Tuple[int, str, str], TDigest], kind: str):
+        """دمج ملخصات جديدة في الصفوف المخزنة"""
+        from .models import PriceDigest
+
+        with transaction.atomic():
+            for (category_id, condition, unit), digest in sorted(digests.items()):
+                lookup = {'category_id': category_id, 'condition': condition, 'unit': unit}
+                row = PriceDigest.objects.select_for_update().filter(**lookup).first()
+                if row is None:
+                    try:
+                        # savepoint حتى لا يفسد تعارض الإنشاء المعاملة الخارجية
+                        with transaction.atomic():
+                            PriceDigest.objects.create(**lookup, **{kind: digest.to_dict()})
+                        continue
+                    except IntegrityError:
+                        row = PriceDigest.objects.select_for_update().get(**lookup)
+                stored = TDigest.from_dict(getattr(row, kind)).merge(digest)
+                setattr(row, kind, stored.to_dict())
+                row.save(update_fields=[kind, 'updated_at'])
+        groups = [summary_group(category_id, unit) for category_id, _, unit in digests]
+        transaction.on_commit(lambda: price_cache.invalidate_groups(groups))
+
+    def rebuild(self, batch_size: int = 2000) -> int:
+        """إعادة حساب كل الملخصات من المنتجات"""
+        from .models import Item, PriceDigest
+
+        digests = {kind: defaultdict(TDigest) for kind in KINDS}
+        queryset = Item.objects.filter(price_type__in=PRICED_TYPES, price__gt=0).only(
+            'pk', 'category', 'condition', 'unit', 'price', 'price_type', 'quantity', 'status'
+        ).order_by('pk')
+        counted = 0
+        last_pk = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            for kind in KINDS:
+                values = defaultdict(list)
+                for item in batch:
+                    if kind == 'listed' or item.status == 'sold':
+                        values[digest_key(item)].append(unit_price(item))
+                for key, prices in values.items():
+                    digests[kind][key].add(prices)
+            counted += len(batch)
+            last_pk = batch[-1].pk
+
+        with transaction.atomic():
+            PriceDigest.objects.all().delete()
+            keys = set(digests['listed']) | set(digests['sold'])
+            PriceDigest.objects.bulk_create([
+                PriceDigest(
+                    category_id=category_id, condition=condition, unit=unit,
+                    **{kind: digests[kind][(category_id, condition, unit)].to_dict() for kind in KINDS}
+                )
+                for category_id, condition, unit in keys
+            ])
+        transaction.on_commit(price_cache.invalidate)
+        return counted
+
+    def summary(self, category_id: int, condition: str, unit: str) -> Dict:
+        """مئينات سعر الوحدة (من ذاكرة العملية إن أمكن)"""
+        unit = normalize_unit(unit)
+        return price_cache.get_or_build(
+            f"{category_id}:{condition}:{unit}",
+            lambda: self.build_summary(category_id, condition, unit),
+            group=summary_group(category_id, unit),
+        )
+
+    def build_summary(self, category_id: int, condition: str, unit: str) -> Dict:
+        from .models import PriceDigest
+
+        rows = list(PriceDigest.objects.filter(category_id=category_id, unit=unit))
+        exact = [row for row in rows if row.condition == condition]
+        for scope, scoped_rows in (('condition', exact), ('category', rows)):
+            # المباع أولاً لأنه أقرب لسعر السوق الفعلي
+            for kind in ('sold', 'listed'):
+                digest = TDigest()
+                for row in scoped_rows:
+                    digest.merge(TDigest.from_dict(getattr(row, kind)))
+                if digest.count >= MIN_SAMPLES:
+                    return {
+                        'scope': scope,
+                        'source': kind,
+                        'count': int(digest.count),
+                        'unit_price': {name: round(digest.quantile(q), 2) for name, q in QUANTILES.items()},
+                    }
+        return {}
+
+    def suggest(self, category_id: int, condition: str, unit: str, quantity: int = 1) -> Optional[Dict]:
+        """نطاق سعر مقترح (الربيع الأول إلى الثالث) لكمية معينة"""
+        summary = self.summary(category_id, condition, unit)
+        if not summary:
+            return None
+        quantity = max(int(quantity or 1), 1)
+        prices = summary['unit_price']
+        return dict(
+            summary,
+            quantity=quantity,
+            price_range={'min': round(prices['p25'] * quantity, 2), 'max': round(prices['p75'] * quantity, 2)},
+            suggested_price=round(prices['median'] * quantity, 2),
+        )
+
+
+# إنشاء instance عام
+price_index = PriceIndex()
@@ -0,0 +1,391 @@
+import hashlib
+import json
+import math
+import re
+import uuid
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, Count, FloatField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Ln
+from performance.cache import advanced_cache
+import logging
+
+logger = logging.getLogger('items')
+
+# التشكيل والتطويل وعلامات القرآن
+_DIACRITICS_RE = re.compile('[\u0610-\u061a\u0640\u064b-\u065f\u0670\u06d6-\u06ed]')
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+_CHAR_MAP = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ى': 'ي', 'ئ': 'ي', 'ؤ': 'و', 'ة': 'ه',
+    '٠': '0', '١': '1', '٢': '2', '٣': '3', '٤': '4',
+    '٥': '5', '٦': '6', '٧': '7', '٨': '8', '٩': '9',
+})
+
+# السوابق واللواحق مكتوبة بعد التطبيع (ة -> ه)
+_AR_PREFIXES = ('وال', 'بال', 'كال', 'فال', 'لل', 'ال')
+_AR_SUFFIXES = ('ها', 'ان', 'ات', 'ون', 'ين', 'يه', 'ه', 'ي')
+
+_STOPWORDS = {
+    'في', 'من', 'علي', 'الي', 'عن', 'مع', 'او', 'ثم', 'هذا', 'هذه', 'ذلك', 'التي', 'الذي',
+    'a', 'an', 'the', 'and', 'or', 'of', 'for', 'in', 'on', 'with', 'to',
+}
+
+MAX_TERM_LENGTH = 64
+
+# أوزان الحقول في الترتيب
+FIELD_WEIGHTS = {
+    'title': 3.0,
+    'category': 2.0,
+    'description': 1.0,
+}
+
+# الحقول التي تؤثر على محتوى الفهرس
+INDEXED_FIELDS = {'title', 'description', 'category', 'status', 'location', 'price_type', 'condition'}
+
+FILTER_FIELDS = ('category', 'condition', 'price_type', 'location')
+
+
+def normalize_text(text: str) -> str:
+    """توحيد النص العربي: إزالة التشكيل وتوحيد الألف والياء والتاء المربوطة"""
+    if not text:
+        return ''
+    text = _DIACRITICS_RE.sub('', text)
+    return text.translate(_CHAR_MAP).lower()
+
+
+def stem(token: str) -> str:
+    """تجذيع خفيف للكلمة (على نمط Light10)"""
+    if token.isascii():
+        if len(token) > 4 and token.endswith('ies'):
+            return token[:-3] + 'y'
+        if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+            return token[:-1]
+        return token
+
+    if len(token) >= 4 and token.startswith('و'):
+        token = token[1:]
+    for prefix in _AR_PREFIXES:
+        if token.startswith(prefix) and len(token) - len(prefix) >= 2:
+            token = token[len(prefix):]
+            break
+    for suffix in _AR_SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 2:
+            token = token[:-len(suffix)]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """تقسيم النص إلى كلمات موحدة بدون كلمات التوقف"""
+    return [
+        token[:MAX_TERM_LENGTH]
+        for token in _TOKEN_RE.findall(normalize_text(text))
+        if token not in _STOPWORDS
+    ]
+
+
+def analyze(text: str) -> List[str]:
+    """تحليل النص إلى مصطلحات الفهرس"""
+    terms = []
+    for token in tokenize(text):
+        term = stem(token)
+        if term:
+            terms.append(term)
+    return terms
+
+
+def filter_term(field: str, value) -> str:
+    """مصطلح الفلتر المخزن في الفهرس (مثل condition:good)"""
+    return f"{field}:{value}"[:MAX_TERM_LENGTH]
+
+
+class SearchIndex:
+    """فهرس معكوس للبحث في المنتجات مخزن في جدول SearchPosting"""
+
+    # عدد المعرفات في كل استعلام IN
+    chunk_size = 500
+
+    def build_postings(self, item) -> Dict[str, float]:
+        """حساب مصطلحات المنتج وأوزانها"""
+        weights = Counter()
+        category = item.category
+        fields = {
+            'title': item.title,
+            'description': item.description,
+            'category': f"{category.name} {category.name_ar}",
+        }
+        for field, text in fields.items():
+            for term in analyze(text):
+                weights[term] += FIELD_WEIGHTS[field]
+
+        # مصطلحات الفلاتر بوزن صفري لا تدخل في الترتيب
+        weights[filter_term('category', item.category_id)] += 0
+        weights[filter_term('condition', item.condition)] += 0
+        weights[filter_term('price_type', item.price_type)] += 0
+        for term in analyze(item.location):
+            weights[filter_term('location', term)] += 0
+        return weights
+
+    def index_item(self, item):
+        """تحديث مدخلات منتج واحد في الفهرس"""
+        self.index_items([item])
+
+    def index_items(self, items: Iterable):
+        """تحديث مدخلات مجموعة من المنتجات في الفهرس"""
+        from .models import SearchPosting
+
+        items = list(items)
+        if not items:
+            return
+        postings = []
+        for item in items:
+            if item.status != 'active':
+                continue
+            for term, weight in self.build_postings(item).items():
+                postings.append(SearchPosting(term=term, item_id=item.pk, weight=weight))
+
+        item_ids = [item.pk for item in items]
+        with transaction.atomic():
+            terms = self.text_terms(item_ids)
+            SearchPosting.objects.filter(item_id__in=item_ids).delete()
+            SearchPosting.objects.bulk_create(postings, batch_size=1000)
+        terms.update(posting.term for posting in postings if posting.weight > 0)
+        search_results.touch_on_commit(terms)
+
+    def text_terms(self, item_ids: List[int]) -> set:
+        """المصطلحات النصية المفهرسة حالياً لمجموعة منتجات (بدون مصطلحات الفلاتر)"""
+        from .models import SearchPosting
+        return set(
+            SearchPosting.objects.filter(item_id__in=item_ids, weight__gt=0)
+            .values_list('term', flat=True).distinct()
+        )
+
+    def remove_item(self, item_id: int):
+        """حذف منتج من الفهرس"""
+        self.remove_items([item_id])
+
+    def remove_items(self, item_ids: Iterable[int]):
+        """حذف مجموعة منتجات من الفهرس"""
+        from .models import SearchPosting
+
+        item_ids = list(item_ids)
+        with transaction.atomic():
+            terms = self.text_terms(item_ids)
+            SearchPosting.objects.filter(item_id__in=item_ids).delete()
+        search_results.touch_on_commit(terms)
+
+    def rebuild(self, batch_size: int = 500) -> int:
+        """إعادة بناء الفهرس بالكامل"""
+        from .models import Item, SearchPosting
+
+        SearchPosting.objects.all().delete()
+        queryset = Item.objects.filter(status='active').select_related('category').order_by('pk')
+        indexed = 0
+        last_pk = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            self.index_items(batch)
+            indexed += len(batch)
+            last_pk = batch[-1].pk
+        # المنتجات غير النشطة حذفت بدون معرفة مصطلحاتها
+        transaction.on_commit(search_results.invalidate)
+        return indexed
+
+    def filter_terms(self, filters: Optional[Dict]) -> List[str]:
+        """تحويل الفلاتر إلى مصطلحات قوائم النشر"""
+        terms = []
+        for field in FILTER_FIELDS:
+            value = (filters or {}).get(field)
+            if value in (None, ''):
+                continue
+            if field == 'location':
+                terms.extend(filter_term('location', term) for term in analyze(str(value)))
+            else:
+                terms.append(filter_term(field, value))
+        return terms
+
+    def document_count(self) -> int:
+        """عدد المنتجات النشطة لحساب IDF من إحصائيات المنصة المحفوظة بدون عد الجدول"""
+        from .stats import platform_stats
+        return max(platform_stats.cached_dict()['total_items'], 1)
+
+    def search(self, query: str, filters: Optional[Dict] = None) -> List[Tuple[int, float]]:
+        """البحث وإرجاع (معرف المنتج، الدرجة) مرتبة تنازلياً"""
+        from .models import SearchPosting
+
+        query_terms = list(dict.fromkeys(analyze(query)))
+        if not query_terms:
+            return []
+        all_terms = list(dict.fromkeys(query_terms + self.filter_terms(filters)))
+
+        # طول كل قائمة نشر لبدء التقاطع بالأقصر
+        document_frequency = dict(
+            SearchPosting.objects.filter(term__in=all_terms)
+            .values_list('term')
+            .annotate(df=Count('id'))
+        )
+        if any(term not in document_frequency for term in all_terms):
+            return []
+
+        candidates = None
+        term_weights = defaultdict(dict)
+        for term in sorted(all_terms, key=document_frequency.get):
+            postings = SearchPosting.objects.filter(term=term)
+            if candidates is None:
+                rows = postings.values_list('item_id', 'weight')
+            else:
+                rows = []
+                candidate_list = list(candidates)
+                for start in range(0, len(candidate_list), self.chunk_size):
+                    rows.extend(
+                        postings.filter(item_id__in=candidate_list[start:start + self.chunk_size])
+                        .values_list('item_id', 'weight')
+                    )
+            weights = dict(rows)
+            candidates = set(weights)
+            if term in query_terms:
+                term_weights[term] = weights
+            if not candidates:
+                return []
+
+        total_documents = self.document_count()
+        scores = []
+        for item_id in candidates:
+            score = 0.0
+            for term in query_terms:
+                idf = math.log(1 + total_documents / document_frequency[term])
+                score += (1 + math.log(term_weights[term][item_id])) * idf
+            scores.append((item_id, score))
+
+        scores.sort(key=lambda pair: (pair[1], pair[0]), reverse=True)
+        return scores
+
+    def rank_queryset(self, queryset, query: str):
+        """المنتجات المطابقة لكل مصطلحات الاستعلام مع درجة relevance محسوبة في قاعدة البيانات
+
+        نفس درجات search() بدون تحميل المعرفات: التطابق باستعلام فرعي مجمع على
+        SearchPosting والدرجة باستعلام فرعي مرتبط، فيمكن ترتيب النتائج وتقسيمها
+        مع فلاتر الاستعلام الأخرى.
+        """
+        from .models import SearchPosting
+
+        query_terms = list(dict.fromkeys(analyze(query)))
+        if not query_terms:
+            return queryset.none()
+        postings = SearchPosting.objects.filter(term__in=query_terms)
+        document_frequency = dict(postings.values_list('term').annotate(df=Count('id')))
+        if len(document_frequency) < len(query_terms):
+            return queryset.none()
+
+        total_documents = self.document_count()
+        idf = Case(
+            *[
+                When(term=term, then=Value(math.log(1 + total_documents / document_frequency[term])))
+                for term in query_terms
+            ],
+            output_field=FloatField(),
+        )
+        matching = (
+            postings.values('item_id')
+            .annotate(matched=Count('id'))
+            .filter(matched=len(query_terms))
+            .values('item_id')
+        )
+        relevance = (
+            postings.filter(item_id=OuterRef('pk'))
+            .values('item_id')
+            .annotate(score=Sum((1 + Ln('weight')) * idf))
+            .values('score')
+        )
+        return queryset.filter(id__in=matching).annotate(relevance=Subquery(relevance, output_field=FloatField()))
+
+    def search_ids(self, query: str, filters: Optional[Dict] = None) -> List[int]:
+        """معرفات المنتجات المطابقة مرتبة حسب الصلة"""
+        return [item_id for item_id, _ in self.search(query, filters)]
+
+
+class SearchResultCache:
+    """نتائج البحث المرتبة لكل استعلام موحد مع فلاتره (المعرفات والدرجات فقط)
+
+    لكل مصطلح نصي جيل في الكاش يتغير عند تحديث فهرس منتج يحتوي المصطلح قبل
+    التغيير أو بعده. النتيجة تحفظ مع أجيال مصطلحات استعلامها، وأي منتج قد
+    يدخل النتيجة أو يخرج منها يحتوي كل هذه المصطلحات، فلا تبطل إلا النتائج
+    التي يمكن أن يغيرها. الدرجات تعتمد أيضاً على عدد المنتجات الكلي فقد تتأخر
+    قليلاً حتى انتهاء مدة الحفظ.
+    """
+
+    key_prefix = 'search_results'
+    version_namespace = 'search_results'
+    timeout = 600
+
+    def generation_key(self, term: str) -> str:
+        return f"{self.key_prefix}:gen:{term}"
+
+    def result_key(self, query_terms: List[str], filter_terms: List[str]) -> str:
+        version = advanced_cache.get_version(self.version_namespace)
+        digest = hashlib.md5(json.dumps([query_terms, filter_terms]).encode()).hexdigest()
+        return f"{self.key_prefix}:{version}:{digest}"
+
+    def get_or_search(self, index: SearchIndex, query: str,
+                      filters: Optional[Dict] = None) -> List[Tuple[int, float]]:
+        """النتائج المحفوظة للاستعلام أو البحث في الفهرس وحفظها"""
+        # ترتيب الكلمات وتكرارها وتشكيلها لا يغير النتيجة
+        query_terms = sorted(set(analyze(query)))
+        if not query_terms:
+            return []
+        key = self.result_key(query_terms, sorted(set(index.filter_terms(filters))))
+        generation_keys = [self.generation_key(term) for term in query_terms]
+        try:
+            values = cache.get_many(generation_keys + [key])
+        except Exception as e:
+            logger.error(f"Search result cache get error for {key}: {e}")
+            return index.search(query, filters)
+
+        # الأجيال تقرأ قبل البحث: تغيير أثناءه يجعل النتيجة المحفوظة قديمة الجيل
+        generations = [values.get(generation_key) for generation_key in generation_keys]
+        cached = values.get(key)
+        if cached is not None and cached['generations'] == generations:
+            return list(zip(cached['ids'], cached['scores']))
+
+        ranked = index.search(query, filters)
+        try:
+            cache.set(key, {
+                'generations': generations,
+                'ids': [item_id for item_id, _ in ranked],
+                'scores': [score for _, score in ranked],
+            }, self.timeout)
+        except Exception as e:
+            logger.error(f"Search result cache set error for {key}: {e}")
+        return ranked
+
+    def touch(self, terms: Iterable[str]):
+        """تغيير أجيال المصطلحات لإبطال النتائج التي تحتويها"""
+        token = uuid.uuid4().hex
+        generations = {self.generation_key(term): token for term in terms}
+        if not generations:
+            return
+        try:
+            # جيل منتهي الصلاحية لا يساوي المحفوظ في أي نتيجة فيكفي عمر النتائج
+            cache.set_many(generations, self.timeout)
+        except Exception as e:
+            logger.error(f"Search result generation bump error: {e}")
+
+    def touch_on_commit(self, terms: Iterable[str]):
+        # بعد نجاح المعاملة حتى لا تحفظ نتيجة من بيانات قبلها بالجيل الجديد
+        terms = set(terms)
+        if terms:
+            transaction.on_commit(lambda: self.touch(terms))
+
+    def invalidate(self):
+        """إبطال كل النتائج المحفوظة"""
+        advanced_cache.incr_version(self.version_namespace)
+
+
+# إنشاء instance عام
+search_index = SearchIndex()
+search_results = SearchResultCache()
@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from .models import Category, Item, ItemImage, ItemReport
 from accounts.serializers import UserListSerializer
+from performance.serialization import ValuesSerializer
+from .images import variant_urls, variant_urls_from
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -8,29 +10,121 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'name_ar', 'description', 'icon', 'is_active']
 
 class ItemImageSerializer(serializers.ModelSerializer):
+    variants = serializers.SerializerMethodField()
+
     class Meta:
         model = ItemImage
-        fields = ['id', 'image', 'is_primary']
+        fields = ['id', 'image', 'is_primary', 'variants']
+
+    def get_variants(self, obj):
+        return variant_urls(obj, self.context.get('request'))
 
 class ItemListSerializer(serializers.ModelSerializer):
     user = UserListSerializer(read_only=True)
     category = CategorySerializer(read_only=True)
     primary_image = serializers.SerializerMethodField()
+    primary_image_variants = serializers.SerializerMethodField()
+    distance = serializers.SerializerMethodField()
 
     class Meta:
         model = Item
         fields = [
             'id', 'title', 'description', 'category', 'user', 'condition',
-            'price', 'price_type', 'location', 'status', 'views',
-            'interested_count', 'primary_image', 'created_at'
+            'price', 'price_type', 'location', 'distance', 'status', 'views',
+            'interested_count', 'primary_image', 'primary_image_variants',
+            'duplicate_of', 'created_at'
         ]
 
+    def _primary_image(self, obj):
+        # استخدام الصورة المحملة مسبقاً عبر Item.objects.for_list() بدون استعلام إضافي
+        if hasattr(obj, 'primary_images'):
+            return obj.primary_images[0] if obj.primary_images else None
+        return obj.images.filter(is_primary=True).first()
+
     def get_primary_image(self, obj):
-        primary_image = obj.images.filter(is_primary=True).first()
+        primary_image = self._primary_image(obj)
         if primary_image:
             return self.context['request'].build_absolute_uri(primary_image.image.url)
         return None
 
+    def get_primary_image_variants(self, obj):
+        primary_image = self._primary_image(obj)
+        if primary_image:
+            return variant_urls(primary_image, self.context['request'])
+        return {}
+
+    def get_distance(self, obj):
+        # المسافة بالكيلومتر عند البحث بالقرب فقط
+        distance = getattr(obj, 'distance', None)
+        return round(distance, 2) if distance is not None else None
+
+# مفتاح الصورة الأساسية في الصفوف المحملة مع صورتها
+PRIMARY_IMAGE_KEY = '_primary_image'
+
+class ItemListValuesSerializer(ValuesSerializer):
+    """ItemListSerializer من صفوف values() بنفس المخرجات، للقراءة فقط"""
+
+    def __init__(self, context):
+        super().__init__(ItemListSerializer, context, method_fields={
+            'distance': self.get_distance,
+            'primary_image': self.get_primary_image,
+            'primary_image_variants': self.get_primary_image_variants,
+        })
+        self.request = context['request']
+        self.image_storage = ItemImage._meta.get_field('image').storage
+        self.primary_images = {}
+
+    def values(self, queryset):
+        """صفوف values() للاستعلام (مع المسافة والصلة إذا كانت محسوبة)"""
+        fields = self.value_fields()
+        for annotation in ('distance', 'relevance'):
+            if annotation in queryset.query.annotations:
+                fields.append(annotation)
+        return queryset.prefetch_related(None).values(*fields)
+
+    def load_primary_images(self, item_ids):
+        """{معرف المنتج: (الصورة، النسخ)} باستعلام واحد كما في Item.objects.for_list()"""
+        images = ItemImage.objects.filter(
+            item_id__in=item_ids, is_primary=True
+        ).values_list('item_id', 'image', 'variants')
+        primary_images = {}
+        for item_id, image, variants in images:
+            primary_images.setdefault(item_id, (image, variants))
+        return primary_images
+
+    def load(self, item_ids):
+        """{معرف: صف} للمنتجات النشطة مع صورتها الأساسية (صفوف كاش item_row_cache)"""
+        rows = {row['id']: row for row in self.values(Item.objects.filter(id__in=item_ids, status='active'))}
+        primary_images = self.load_primary_images(list(rows))
+        for item_id, row in rows.items():
+            row[PRIMARY_IMAGE_KEY] = primary_images.get(item_id)
+        return rows
+
+    def many(self, rows):
+        # الصفوف المحملة مع صورتها لا تحتاج استعلام الصور
+        missing = [row['id'] for row in rows if PRIMARY_IMAGE_KEY not in row]
+        self.primary_images = self.load_primary_images(missing) if missing else {}
+        for row in rows:
+            if PRIMARY_IMAGE_KEY in row:
+                self.primary_images[row['id']] = row[PRIMARY_IMAGE_KEY]
+        return super().many(rows)
+
+    def get_primary_image(self, row):
+        primary_image = self.primary_images.get(row['id'])
+        if primary_image:
+            return self.request.build_absolute_uri(self.image_storage.url(primary_image[0]))
+        return None
+
+    def get_primary_image_variants(self, row):
+        primary_image = self.primary_images.get(row['id'])
+        if primary_image:
+            return variant_urls_from(primary_image[1], self.request)
+        return {}
+
+    def get_distance(self, row):
+        distance = row.get('distance')
+        return round(distance, 2) if distance is not None else None
+
 class ItemDetailSerializer(serializers.ModelSerializer):
     user = UserListSerializer(read_only=True)
     category = CategorySerializer(read_only=True)
@@ -41,8 +135,8 @@ class ItemDetailSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'title', 'description', 'category', 'user', 'condition',
             'quantity', 'unit', 'price', 'price_type', 'location',
-            'contact_method', 'status', 'views', 'interested_count',
-            'is_featured', 'images', 'created_at', 'updated_at'
+            'latitude', 'longitude', 'contact_method', 'status', 'views',
+            'interested_count', 'is_featured', 'duplicate_of', 'images', 'created_at', 'updated_at'
         ]
 
 class ItemCreateSerializer(serializers.ModelSerializer):
@@ -56,9 +150,13 @@ class ItemCreateSerializer(serializers.ModelSerializer):
         model = Item
         fields = [
             'title', 'description', 'category', 'condition', 'quantity',
-            'unit', 'price', 'price_type', 'location', 'contact_method',
-            'images'
+            'unit', 'price', 'price_type', 'location', 'latitude', 'longitude',
+            'contact_method', 'images'
         ]
+        extra_kwargs = {
+            'latitude': {'min_value': -90, 'max_value': 90},
+            'longitude': {'min_value': -180, 'max_value': 180},
+        }
 
     def create(self, validated_data):
         images_data = validated_data.pop('images', [])
@@ -74,6 +172,30 @@ class ItemCreateSerializer(serializers.ModelSerializer):
         
         return item
 
+class PreloadedCategoryField(serializers.Field):
+    """فئة بالمعرف أو الاسم من قاموس محمل مسبقاً بدون استعلام لكل صف"""
+
+    default_error_messages = {
+        'does_not_exist': 'الفئة غير موجودة',
+    }
+
+    def to_internal_value(self, data):
+        category = self.context['categories'].get(str(data).strip().lower())
+        if category is None:
+            self.fail('does_not_exist')
+        return category
+
+    def to_representation(self, value):
+        return value.pk
+
+class ItemImportSerializer(ItemCreateSerializer):
+    """تحقق صف استيراد بنفس قواعد إنشاء المنتج"""
+    category = PreloadedCategoryField()
+    images = None
+
+    class Meta(ItemCreateSerializer.Meta):
+        fields = [field for field in ItemCreateSerializer.Meta.fields if field != 'images']
+
 class ItemReportSerializer(serializers.ModelSerializer):
     class Meta:
         model = ItemReport
@@ -0,0 +1,311 @@
+from django.db import transaction
+from collections import Counter
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import Signal, receiver
+from accounts.models import User
+from accounts.serializers import UserListSerializer
+from .models import Category, Item, ItemImage
+from .search import search_index, search_results, INDEXED_FIELDS
+from .facets import item_facets, FACET_FIELDS
+from .stats import platform_stats
+from .caching import category_cache, featured_cache, item_row_cache
+from .conditional import bump_items_version, touch_item
+from .duplicates import duplicate_detector, SIGNATURE_FIELDS
+from .prices import price_index
+from .autocomplete import autocomplete_index
+from . import geo
+import logging
+import weakref
+
+logger = logging.getLogger('items')
+
+# تغيير حالة مجموعة منتجات بـ update() بدون post_save
+# المعاملات: states (قيم TRACKED_FIELDS مع id قبل التغيير)، new_status
+items_bulk_status_changed = Signal()
+# إنشاء مجموعة منتجات بـ bulk_create. المعاملات: items (بمعرفاتها)
+items_bulk_created = Signal()
+
+GEO_FIELDS = {'location', 'latitude', 'longitude'}
+# الحقول التي تحفظ قيمها عند التحميل لمعرفة ما تغير عند الحفظ
+TRACKED_FIELDS = {
+    Item: ('title', 'latitude', 'longitude', 'status', 'is_featured') + tuple(FACET_FIELDS.values()),
+    User: ('location', 'latitude', 'longitude', 'is_active'),
+}
+# بيانات البائع المعروضة داخل صفوف المنتجات في القوائم
+LISTED_USER_FIELDS = set(UserListSerializer.Meta.fields)
+
+
+def snapshot(instance):
+    return {field: getattr(instance, field) for field in TRACKED_FIELDS[type(instance)]}
+
+
+@receiver(post_init, sender=Item)
+@receiver(post_init, sender=User)
+def remember_state(sender, instance, **kwargs):
+    """حفظ القيم المحملة لمعرفة تغييرها عند الحفظ"""
+    # القراءة من __dict__ حتى لا تحمل الحقول المؤجلة باستعلام إضافي
+    instance._loaded_state = {
+        field: instance.__dict__[field]
+        for field in TRACKED_FIELDS[sender] if field in instance.__dict__
+    }
+
+
+@receiver(pre_save, sender=Item)
+@receiver(pre_save, sender=User)
+def geocode_location(sender, instance, update_fields=None, **kwargs):
+    """تحديد الإحداثيات من اسم المكان إذا لم ترسل أو تغير المكان"""
+    if update_fields and not set(update_fields) & GEO_FIELDS:
+        return
+    loaded = getattr(instance, '_loaded_state', {})
+    point = (instance.latitude, instance.longitude)
+    moved = (
+        instance.location != loaded.get('location')
+        and point == (loaded.get('latitude'), loaded.get('longitude'))
+    )
+    if None in point or moved:
+        geo.locate(instance)
+    elif hasattr(instance, 'geohash'):
+        instance.geohash = geo.geohash_encode(*point)
+
+
+@receiver(pre_save, sender=Item)
+def load_previous_state(sender, instance, **kwargs):
+    """قراءة الحالة السابقة من القاعدة إذا حمل المنتج بحقول مؤجلة"""
+    if instance._state.adding or instance.pk is None:
+        instance._previous_state = None
+        return
+    loaded = getattr(instance, '_loaded_state', {})
+    missing = [field for field in TRACKED_FIELDS[Item] if field not in loaded]
+    if missing:
+        loaded = dict(loaded, **(Item.objects.filter(pk=instance.pk).values(*missing).first() or {}))
+    instance._previous_state = loaded
+
+
+def stats_deltas(previous, current):
+    """فروق إحصائيات المنصة لانتقال حالة منتج"""
+    was = (previous or {}).get('status')
+    now = (current or {}).get('status')
+    return {
+        'total_items': (now == 'active') - (was == 'active'),
+        'completed_deals': (now == 'sold') - (was == 'sold'),
+    }
+
+
+def invalidate_featured(previous, current):
+    """إبطال كاش المنتجات المميزة إذا كان المنتج مميزاً قبل التغيير أو بعده"""
+    if (previous or {}).get('is_featured') or (current or {}).get('is_featured'):
+        transaction.on_commit(featured_cache.invalidate)
+
+
+@receiver(post_save, sender=Item)
+def apply_item_transition(sender, instance, created=False, update_fields=None, **kwargs):
+    """تحديث أعداد الفلاتر والإحصائيات عند تغير حالة المنتج أو قيمه"""
+    previous = None if created else getattr(instance, '_previous_state', None)
+    current = snapshot(instance)
+    if update_fields:
+        # الحفظ الجزئي لا يغير الحقول الأخرى في القاعدة
+        current = dict(previous or {}, **{
+            field: current[field] for field in current
+            if field in update_fields or field.replace('_id', '') in update_fields
+        })
+    item_facets.apply_transition(previous, current)
+    autocomplete_index.apply_transition(previous, current)
+
+    deltas = stats_deltas(previous, current)
+    if created and not Item.objects.filter(user_id=instance.user_id).exclude(pk=instance.pk).exists():
+        deltas['total_users'] = 1
+    platform_stats.apply(**deltas)
+    invalidate_featured(previous, current)
+    transaction.on_commit(bump_items_version)
+    instance._loaded_state = current
+
+
+@receiver(post_save, sender=User)
+def apply_user_transition(sender, instance, created=False, **kwargs):
+    """تحديث عدد المستخدمين المسجلين عند الإنشاء أو تغيير التفعيل"""
+    loaded = getattr(instance, '_loaded_state', {})
+    was_active = False if created else loaded.get('is_active', instance.is_active)
+    platform_stats.apply(registered_users=instance.is_active - was_active)
+    instance._loaded_state = snapshot(instance)
+
+
+@receiver(post_save, sender=User)
+def invalidate_seller_rows(sender, instance, created=False, update_fields=None, **kwargs):
+    """إبطال صفوف المنتجات المحفوظة والمنتجات المميزة وETag القوائم عند تغيير بيانات البائع المعروضة فيها"""
+    if created or (update_fields and not set(update_fields) & LISTED_USER_FIELDS):
+        return
+    transaction.on_commit(item_row_cache.invalidate_all)
+    transaction.on_commit(featured_cache.invalidate)
+    transaction.on_commit(bump_items_version)
+
+
+@receiver(pre_delete, sender=Item)
+def remember_deleted_state(sender, instance, **kwargs):
+    # الصف ما زال موجوداً فيمكن تحميل الحقول المؤجلة
+    instance._previous_state = snapshot(instance)
+    # مدخلات الفهرس تحذف مع المنتج (CASCADE) قبل post_delete
+    instance._search_terms = search_index.text_terms([instance.pk])
+
+
+# المستخدمون الذين أنقص عددهم في كل عملية حذف (حذف مستخدم يحذف كل منتجاته معاً)
+_removed_sellers = weakref.WeakKeyDictionary()
+
+
+@receiver(post_delete, sender=Item)
+def apply_item_deletion(sender, instance, origin=None, **kwargs):
+    """إنقاص أعداد الفلاتر والإحصائيات وإبطال نتائج البحث عند حذف منتج"""
+    previous = getattr(instance, '_previous_state', None)
+    search_results.touch_on_commit(getattr(instance, '_search_terms', ()))
+    item_facets.apply_transition(previous, None)
+    autocomplete_index.apply_transition(previous, None)
+
+    deltas = stats_deltas(previous, None)
+    if not Item.objects.filter(user_id=instance.user_id).exists():
+        removed = _removed_sellers.setdefault(origin, set()) if origin is not None else set()
+        if instance.user_id not in removed:
+            removed.add(instance.user_id)
+            deltas['total_users'] = -1
+    platform_stats.apply(**deltas)
+    invalidate_featured(previous, None)
+    transaction.on_commit(bump_items_version)
+
+
+@receiver(post_delete, sender=User)
+def apply_user_deletion(sender, instance, **kwargs):
+    platform_stats.apply(registered_users=-int(instance.is_active))
+
+
+@receiver(items_bulk_status_changed, sender=Item)
+def apply_bulk_transition(sender, states, new_status, **kwargs):
+    """تحديث الفلاتر والإحصائيات والفهرس والكاش بعد تغيير حالة جماعي"""
+    facet_deltas = Counter()
+    title_deltas = Counter()
+    stats = Counter()
+    for previous in states:
+        current = dict(previous, status=new_status)
+        facet_deltas.update(item_facets.contribution(current))
+        facet_deltas.subtract(item_facets.contribution(previous))
+        title_deltas.update(autocomplete_index.contribution(current))
+        title_deltas.subtract(autocomplete_index.contribution(previous))
+        stats.update(stats_deltas(previous, current))
+    item_facets.apply(facet_deltas)
+    autocomplete_index.add(title_deltas)
+    platform_stats.apply(**stats)
+
+    item_ids = [state['id'] for state in states]
+    if new_status == 'active':
+        search_index.index_items(Item.objects.filter(id__in=item_ids).select_related('category'))
+    else:
+        search_index.remove_items(item_ids)
+    if any(state.get('is_featured') for state in states):
+        transaction.on_commit(featured_cache.invalidate)
+    transaction.on_commit(bump_items_version)
+    transaction.on_commit(lambda: item_row_cache.invalidate(item_ids))
+
+
+@receiver(items_bulk_created, sender=Item)
+def apply_bulk_creation(sender, items, **kwargs):
+    """تحديث الفلاتر والإحصائيات والفهرس بعد إنشاء جماعي"""
+    facet_deltas = Counter()
+    title_deltas = Counter()
+    stats = Counter()
+    created_per_user = Counter()
+    for item in items:
+        current = snapshot(item)
+        facet_deltas.update(item_facets.contribution(current))
+        title_deltas.update(autocomplete_index.contribution(current))
+        stats.update(stats_deltas(None, current))
+        created_per_user[item.user_id] += 1
+        item._loaded_state = current
+
+    # مستخدم جديد في عدد البائعين إذا كانت كل منتجاته من هذه الدفعة
+    for user_id, created in created_per_user.items():
+        if Item.objects.filter(user_id=user_id).count() == created:
+            stats['total_users'] += 1
+    item_facets.apply(facet_deltas)
+    autocomplete_index.add(title_deltas)
+    platform_stats.apply(**stats)
+    search_index.index_items(items)
+    duplicate_detector.index_items(items, force=True)
+    price_index.add_items(items)
+    if any(item.is_featured for item in items):
+        transaction.on_commit(featured_cache.invalidate)
+    transaction.on_commit(bump_items_version)
+
+
+@receiver(post_save, sender=Item)
+def index_item_on_save(sender, instance, update_fields=None, **kwargs):
+    """تحديث فهرس البحث عند حفظ المنتج"""
+    # تجاهل الحفظ الجزئي لحقول لا تؤثر على الفهرس (مثل views)
+    if update_fields and not set(update_fields) & INDEXED_FIELDS:
+        return
+    search_index.index_item(instance)
+
+
+@receiver(post_save, sender=Item)
+@receiver(post_delete, sender=Item)
+def invalidate_item_row(sender, instance, **kwargs):
+    """حذف صف المنتج المحفوظ لنتائج البحث بعد نجاح المعاملة"""
+    # المعرف يقرأ الآن لأن الحذف يعيده None قبل تنفيذ on_commit
+    item_id = instance.pk
+    transaction.on_commit(lambda: item_row_cache.invalidate([item_id]))
+
+
+@receiver(post_save, sender=Item)
+def detect_duplicates_on_save(sender, instance, update_fields=None, **kwargs):
+    """تحديث توقيع MinHash وتحديد إعادة النشر عند تغيير نص المنتج"""
+    if update_fields and not set(update_fields) & SIGNATURE_FIELDS:
+        return
+    duplicate_detector.index_item(instance)
+
+
+@receiver(post_save, sender=Item)
+def update_price_index(sender, instance, created=False, **kwargs):
+    """إضافة سعر المنتج لملخص الأسعار عند إنشائه وعند بيعه"""
+    if created:
+        price_index.add_items([instance], 'listed')
+    previous = getattr(instance, '_previous_state', None) or {}
+    if instance.status == 'sold' and previous.get('status') != 'sold':
+        price_index.add_items([instance], 'sold')
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_caches(sender, **kwargs):
+    """إبطال كاش الفئات والمنتجات المميزة وصفوف المنتجات (تعرض الفئة) بعد نجاح المعاملة"""
+    transaction.on_commit(category_cache.invalidate)
+    transaction.on_commit(featured_cache.invalidate)
+    transaction.on_commit(item_row_cache.invalidate_all)
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_items(sender, instance, created=False, **kwargs):
+    """إعادة فهرسة منتجات الفئة عند تغيير اسمها"""
+    if created:
+        return
+    search_index.index_items(
+        Item.objects.filter(category=instance, status='active').select_related('category')
+    )
+
+
+@receiver(post_save, sender=ItemImage)
+@receiver(post_delete, sender=ItemImage)
+def touch_item_on_image_change(sender, instance, **kwargs):
+    """الصور جزء من استجابة المنتج فتغيرها يغير ETag"""
+    touch_item(instance.item_id)
+
+
+@receiver(post_save, sender=ItemImage)
+def enqueue_image_variants(sender, instance, created=False, **kwargs):
+    """جدولة إنتاج نسخ الصورة بعد حفظها"""
+    if not created or not instance.image:
+        return
+
+    def enqueue():
+        from .tasks import generate_image_variants
+        try:
+            generate_image_variants.delay(instance.pk)
+        except Exception as e:
+            logger.error(f"Could not enqueue image variants for {instance.pk}: {e}")
+
+    transaction.on_commit(enqueue)
@@ -0,0 +1,92 @@
+from typing import Dict
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from performance.cache import advanced_cache
+import logging
+
+logger = logging.getLogger('items')
+
+# قيم نقطة stats في الكاش تحدث في الخلفية فلا تعيد الطلبات حسابها عند انتهائها
+STATS_CACHE_KEY = 'platform_stats'
+STATS_CACHE_TIMEOUT = 60
+
+
+class PlatformStatsService:
+    """إحصائيات المنصة المادية (materialized)
+
+    صف واحد يحدث بفروق من إشارات المنتجات والمستخدمين، ويعاد حسابه بالكامل
+    دورياً لتصحيح أي انحراف (مثل التحديثات الجماعية التي لا ترسل إشارات).
+    """
+
+    FIELDS = ('total_items', 'total_users', 'completed_deals', 'registered_users')
+    row_id = 1
+
+    def count_all(self) -> Dict[str, int]:
+        """الحساب الكامل من الجداول"""
+        from accounts.models import User
+        from .models import Item
+
+        return {
+            'total_items': Item.objects.filter(status='active').count(),
+            # المستخدمون الذين لديهم منتجات
+            'total_users': Item.objects.values('user').distinct().count(),
+            'completed_deals': Item.objects.filter(status='sold').count(),
+            'registered_users': User.objects.filter(is_active=True).count(),
+        }
+
+    def reconcile(self):
+        """إعادة الحساب الكامل وكتابة الصف"""
+        from .models import PlatformStats
+
+        counts = self.count_all()
+        with transaction.atomic():
+            row, _ = PlatformStats.objects.update_or_create(
+                pk=self.row_id,
+                defaults=dict(counts, reconciled_at=timezone.now())
+            )
+        logger.info(f"Platform stats reconciled: {counts}")
+        return row
+
+    def get(self):
+        """قراءة الصف (ينشأ بحساب كامل في أول مرة)"""
+        from .models import PlatformStats
+
+        row = PlatformStats.objects.filter(pk=self.row_id).first()
+        return row or self.reconcile()
+
+    def apply(self, **deltas):
+        """إضافة فروق ذرية إلى الصف"""
+        from .models import PlatformStats
+
+        deltas = {field: delta for field, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        unknown = set(deltas) - set(self.FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown stats fields: {unknown}")
+
+        updated = PlatformStats.objects.filter(pk=self.row_id).update(
+            updated_at=timezone.now(),
+            **{field: F(field) + delta for field, delta in deltas.items()}
+        )
+        if not updated:
+            # لا يوجد صف بعد: الحساب الكامل يشمل التغيير الحالي
+            try:
+                with transaction.atomic():
+                    self.reconcile()
+            except IntegrityError:
+                self.apply(**deltas)
+
+    def as_dict(self) -> Dict[str, int]:
+        row = self.get()
+        return {field: getattr(row, field) for field in self.FIELDS}
+
+    def cached_dict(self) -> Dict[str, int]:
+        """القيم من الكاش (متأخرة حتى STATS_CACHE_TIMEOUT ثانية)"""
+        return advanced_cache.get_or_set(STATS_CACHE_KEY, self.as_dict, STATS_CACHE_TIMEOUT)
+
+
+# إنشاء instance عام
+platform_stats = PlatformStatsService()
+advanced_cache.register_refresh(STATS_CACHE_KEY, platform_stats.as_dict, STATS_CACHE_TIMEOUT)
@@ -0,0 +1,44 @@
+from celery import shared_task
+import logging
+from .counters import item_counters
+
+logger = logging.getLogger(__name__)
+
+@shared_task
+def flush_item_counters():
+    """كتابة زيادات المشاهدات والاهتمام المتراكمة في قاعدة البيانات"""
+    updated = item_counters.flush()
+    if updated:
+        logger.info(f"تم تحديث عدادات {updated} منتج")
+    return updated
+
+@shared_task
+def generate_image_variants(image_id):
+    """إنتاج المصغرات ونسخة WebP لصورة منتج مرفوعة"""
+    from .images import generate_variants
+    return generate_variants(image_id)
+
+@shared_task
+def reconcile_platform_stats():
+    """إعادة حساب إحصائيات المنصة بالكامل لتصحيح أي انحراف في الفروق"""
+    from .stats import platform_stats
+    row = platform_stats.reconcile()
+    return {field: getattr(row, field) for field in platform_stats.FIELDS}
+
+@shared_task
+def expire_items(batch_size=500):
+    """إنهاء المنتجات النشطة التي تجاوزت تاريخ انتهاء الصلاحية"""
+    from .expiry import expire_due_items
+    return expire_due_items(batch_size=batch_size)
+
+@shared_task
+def compact_autocomplete():
+    """دمج فروق الإكمال التلقائي المتراكمة في لقطة جديدة مشتركة"""
+    from .autocomplete import autocomplete_index
+    autocomplete_index.compact()
+
+@shared_task
+def refresh_cache_keys():
+    """إعادة حساب مفاتيح الكاش المسجلة للتحديث في الخلفية قبل انتهائها"""
+    from performance.cache import advanced_cache
+    return advanced_cache.refresh_registered()
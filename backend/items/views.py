@@ -1,43 +1,156 @@
 from rest_framework import generics, permissions, status, filters
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
-from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework.settings import api_settings
 from django.db.models import Q
+from django.utils.cache import get_conditional_response
+from performance.cache import advanced_cache
+from performance.serialization import PrerenderedResponse, accepts_fast_json, dumps
+from django_filters.rest_framework import DjangoFilterBackend
 from .models import Category, Item, ItemReport
 from .serializers import (
     CategorySerializer,
     ItemListSerializer,
+    ItemListValuesSerializer,
     ItemDetailSerializer,
     ItemCreateSerializer,
     ItemReportSerializer
 )
-from .filters import ItemFilter
+from .filters import ItemFilter, IndexedSearchFilter
+from .pagination import ItemKeysetPagination
+from .search import analyze, search_index, search_results
+from .counters import item_counters
+from .facets import item_facets
+from .stats import platform_stats
+from .duplicates import duplicate_detector
+from .prices import price_index
+from .autocomplete import autocomplete_index
+from .importer import FORMATS as IMPORT_FORMATS, ItemImporter, detect_format, iter_rows
+from .conditional import ConditionalGetMixin, ITEMS_VERSION, make_etag, set_validators
+from .caching import build_categories, category_cache, featured_cache, item_row_cache, json_response, render_json
+from . import geo
+
+# أقصى عدد صفوف في طلب استيراد واحد (الملفات الأكبر عبر أمر import_items)
+IMPORT_MAX_ROWS = 5000
 
 class CategoryListView(generics.ListAPIView):
     queryset = Category.objects.filter(is_active=True)
     serializer_class = CategorySerializer
     permission_classes = [permissions.AllowAny]
 
-class ItemListView(generics.ListAPIView):
-    queryset = Item.objects.filter(status='active')
+    def get(self, request, *args, **kwargs):
+        etag = make_etag('categories', category_cache.version())
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = json_response(category_cache.get_or_build('', build_categories))
+        return set_validators(response, etag, None)
+
+class PendingCountersMixin:
+    """دمج زيادات العدادات المعلقة في الصفحة قبل التسلسل"""
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is not None:
+            item_counters.merge_pending(page)
+        return page
+
+class ValuesListMixin:
+    """قوائم JSON من صفوف values() ومرمز سريع بدون إنشاء كائنات النماذج
+
+    المخرجات مطابقة لمسار DRF العادي، الذي يبقى للواجهة التفاعلية وindent.
+    """
+    values_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        if not accepts_fast_json(request):
+            return super().list(request, *args, **kwargs)
+        serializer = self.values_serializer_class(self.get_serializer_context())
+        queryset = serializer.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            data = serializer.many(list(queryset))
+        else:
+            data = self.get_paginated_response(serializer.many(page)).data
+        return PrerenderedResponse(data, dumps(data))
+
+class ItemListView(ConditionalGetMixin, PendingCountersMixin, ValuesListMixin, generics.ListAPIView):
+    queryset = Item.objects.for_list().filter(status='active')
     serializer_class = ItemListSerializer
     permission_classes = [permissions.AllowAny]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, IndexedSearchFilter, filters.OrderingFilter]
     filterset_class = ItemFilter
     search_fields = ['title', 'description']
     ordering_fields = ['created_at', 'views', 'price']
     ordering = ['-created_at']
+    pagination_class = ItemKeysetPagination
+    values_serializer_class = ItemListValuesSerializer
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        # إخفاء إعادات النشر طالما المنتج الأصلي معروض (include_duplicates=1 لإظهارها)
+        if self.request.query_params.get('include_duplicates') not in ('1', 'true'):
+            queryset = queryset.exclude(duplicate_of__status='active')
+        return queryset
+
+    def get_validators(self, request, *args, **kwargs):
+        # إصدار المنتجات والفئات من الكاش بدون استعلام على الجدول
+        version = advanced_cache.get_version(ITEMS_VERSION, default=None)
+        if version is None:
+            # بدون إصدار لا يمكن معرفة تغير القائمة
+            return None, None
+        return make_etag(
+            'items',
+            version,
+            category_cache.version(),
+            sorted(request.GET.lists()),
+            request.META.get('HTTP_ACCEPT', ''),
+        ), None
 
-class ItemDetailView(generics.RetrieveAPIView):
+class ItemFacetsView(generics.GenericAPIView):
+    """أعداد الفلاتر (فئة، حالة، نوع السعر، موقع) لنفس فلاتر قائمة المنتجات"""
     queryset = Item.objects.filter(status='active')
+    permission_classes = [permissions.AllowAny]
+    filter_backends = [DjangoFilterBackend, IndexedSearchFilter]
+    filterset_class = ItemFilter
+    search_fields = ['title', 'description']
+
+    def get(self, request, *args, **kwargs):
+        params = set(ItemFilter.base_filters) | {api_settings.SEARCH_PARAM}
+        if params & {key for key, value in request.query_params.items() if value}:
+            counts = item_facets.compute_counts(self.filter_queryset(self.get_queryset()))
+        else:
+            # الصفحة الرئيسية: قراءة الأعداد المخزنة بدون المرور على المنتجات
+            counts = item_facets.stored_counts()
+        return Response(item_facets.format(counts))
+
+class ItemDetailView(ConditionalGetMixin, generics.RetrieveAPIView):
+    queryset = Item.objects.for_detail().filter(status='active')
     serializer_class = ItemDetailSerializer
     permission_classes = [permissions.AllowAny]
+    validators_from_loaded = True
+
+    def item_validators(self, request, pk, updated_at):
+        return (
+            make_etag('item', pk, updated_at.isoformat(), category_cache.version(), request.META.get('HTTP_ACCEPT', '')),
+            int(updated_at.timestamp()),
+        )
+
+    def get_validators(self, request, *args, **kwargs):
+        updated_at = Item.objects.filter(pk=kwargs['pk'], status='active').values_list('updated_at', flat=True).first()
+        if updated_at is None:
+            return None, None
+        return self.item_validators(request, kwargs['pk'], updated_at)
+
+    def not_modified(self, request, *args, **kwargs):
+        # الزائر المتكرر يحصل على 304 ويحسب كمشاهدة
+        item_counters.incr(kwargs['pk'], 'views')
 
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
-        # زيادة عدد المشاهدات
-        instance.views += 1
-        instance.save(update_fields=['views'])
+        self.validators = self.item_validators(request, instance.pk, instance.updated_at)
+        # زيادة عدد المشاهدات (تكتب في قاعدة البيانات دورياً)
+        item_counters.incr(instance.pk, 'views')
+        item_counters.merge_pending([instance])
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
 
@@ -45,12 +158,38 @@ class ItemCreateView(generics.CreateAPIView):
     serializer_class = ItemCreateSerializer
     permission_classes = [permissions.IsAuthenticated]
 
-class MyItemsView(generics.ListAPIView):
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def import_items(request):
+    """استيراد منتجات بالجملة من ملف CSV/JSONL أو من جسم الطلب مباشرة"""
+    upload = request.FILES.get('file') if request.content_type.startswith('multipart/') else None
+    if upload:
+        fmt = request.query_params.get('format') or detect_format(upload.content_type, upload.name)
+        stream = upload
+    else:
+        fmt = request.query_params.get('format') or detect_format(request.content_type)
+        stream = request.stream
+    if fmt not in IMPORT_FORMATS or stream is None:
+        return Response(
+            {'error': 'يجب إرسال ملف CSV أو JSONL'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    importer = ItemImporter(request.user, max_rows=IMPORT_MAX_ROWS)
+    result = importer.run(iter_rows(stream, fmt))
+    return Response(
+        result,
+        status=status.HTTP_201_CREATED if result['created'] else status.HTTP_400_BAD_REQUEST
+    )
+
+class MyItemsView(PendingCountersMixin, ValuesListMixin, generics.ListAPIView):
     serializer_class = ItemListSerializer
+    values_serializer_class = ItemListValuesSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = ItemKeysetPagination
 
     def get_queryset(self):
-        return Item.objects.filter(user=self.request.user)
+        return Item.objects.for_list().filter(user=self.request.user)
 
 class ItemUpdateView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = ItemCreateSerializer
@@ -62,13 +201,26 @@ class ItemUpdateView(generics.RetrieveUpdateDestroyAPIView):
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def mark_interested(request, item_id):
-    try:
-        item = Item.objects.get(id=item_id, status='active')
-        item.interested_count += 1
-        item.save(update_fields=['interested_count'])
-        return Response({'message': 'تم تسجيل الاهتمام بنجاح'})
-    except Item.DoesNotExist:
+    if not Item.objects.filter(id=item_id, status='active').exists():
+        return Response({'error': 'المنتج غير موجود'}, status=status.HTTP_404_NOT_FOUND)
+    item_counters.incr(item_id, 'interested_count')
+    return Response({'message': 'تم تسجيل الاهتمام بنجاح'})
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def similar_items(request, pk):
+    """منتجات نشطة بنص مشابه (من شرائح LSH بدون مقارنة مع كل المنتجات)"""
+    if not Item.objects.filter(pk=pk, status='active').exists():
         return Response({'error': 'المنتج غير موجود'}, status=status.HTTP_404_NOT_FOUND)
+    scores = dict(duplicate_detector.similar(pk))
+    items = Item.objects.for_list().filter(id__in=scores, status='active')
+    items = sorted(items, key=lambda item: (-scores[item.pk], item.pk))
+    results = ItemListSerializer(
+        item_counters.merge_pending(items), many=True, context={'request': request}
+    ).data
+    for row in results:
+        row['similarity'] = round(scores[row['id']], 2)
+    return Response({'results': results})
 
 class ItemReportView(generics.CreateAPIView):
     serializer_class = ItemReportSerializer
@@ -82,45 +234,117 @@ def search_items(request):
     location = request.GET.get('location', '')
     price_type = request.GET.get('price_type', '')
     condition = request.GET.get('condition', '')
+    paginator = ItemKeysetPagination()
 
-    items = Item.objects.filter(status='active')
+    # near=lat,lon أو اسم مكان معروف يتحول إلى بحث بالقرب بدلاً من مطابقة النص
+    point = geo.parse_point(request.GET.get('near', ''))
+    if point is None and location:
+        point = geo.geocode(location)
+    radius = geo.parse_radius(request.GET.get('radius'))
 
-    if query:
-        items = items.filter(
-            Q(title__icontains=query) | Q(description__icontains=query)
-        )
+    if analyze(query):
+        # البحث عبر الفهرس مع تطبيق الفلاتر كتقاطع لقوائم النشر
+        category_id = None
+        if category:
+            category_id = Category.objects.filter(name=category).values_list('id', flat=True).cached(3600).first()
+
+        ranked = []
+        if not category or category_id is not None:
+            ranked = search_results.get_or_search(search_index, query, filters={
+                'category': category_id,
+                'location': '' if point else location,
+                'price_type': price_type,
+                'condition': condition,
+            })
+            if point:
+                ranked = geo.filter_ranked(ranked, point[0], point[1], radius)
+        if ranked and not request.GET.get(paginator.cursor_query_param):
+            # عمليات البحث التي لها نتائج تدخل في اقتراحات الإكمال التلقائي
+            autocomplete_index.record_query(query)
+        # الصفحة من صفوف المنتجات المحفوظة، والناقص منها باستعلام واحد
+        item_ids = paginator.paginate_ranked(ranked, request)
+        serializer = ItemListValuesSerializer({'request': request})
+        rows = item_row_cache.get_many(item_ids, serializer)
+        page = item_counters.merge_pending([rows[item_id] for item_id in item_ids if item_id in rows])
+        response = paginator.get_paginated_response(serializer.many(page))
+        if accepts_fast_json(request):
+            return PrerenderedResponse(response.data, dumps(response.data))
+        return response
+    else:
+        items = Item.objects.for_list().filter(status='active')
+
+        if query.strip():
+            # استعلام بلا مصطلحات في الفهرس (كلمات توقف فقط) يطابق النص كما هو
+            items = items.filter(Q(title__icontains=query.strip()) | Q(description__icontains=query.strip()))
+
+        if category:
+            items = items.filter(category__name=category)
 
-    if category:
-        items = items.filter(category__name=category)
+        if point:
+            items = geo.nearby(items, point[0], point[1], radius)
+        elif location:
+            items = items.filter(location__icontains=location)
 
-    if location:
-        items = items.filter(location__icontains=location)
+        if price_type:
+            items = items.filter(price_type=price_type)
 
-    if price_type:
-        items = items.filter(price_type=price_type)
+        if condition:
+            items = items.filter(condition=condition)
 
-    if condition:
-        items = items.filter(condition=condition)
+        page = item_counters.merge_pending(paginator.paginate_queryset(items, request))
 
-    serializer = ItemListSerializer(items, many=True, context={'request': request})
-    return Response(serializer.data)
+    serializer = ItemListSerializer(page, many=True, context={'request': request})
+    return paginator.get_paginated_response(serializer.data)
 
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
 def featured_items(request):
-    items = Item.objects.filter(status='active', is_featured=True)[:6]
-    serializer = ItemListSerializer(items, many=True, context={'request': request})
-    return Response(serializer.data)
+    def build():
+        items = Item.objects.for_list().filter(status='active', is_featured=True)[:6]
+        items = item_counters.merge_pending(list(items))
+        serializer = ItemListSerializer(items, many=True, context={'request': request})
+        return render_json(serializer.data)
+
+    # روابط الصور مطلقة فتختلف النسخة حسب العنوان
+    return json_response(featured_cache.get_or_build(request.build_absolute_uri('/'), build))
 
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
 def stats(request):
-    total_items = Item.objects.filter(status='active').count()
-    total_users = Item.objects.values('user').distinct().count()
-    completed_deals = Item.objects.filter(status='sold').count()
-    
-    return Response({
-        'total_items': total_items,
-        'total_users': total_users,
-        'completed_deals': completed_deals,
-    })
+    # صف واحد محدث بالفروق بدلاً من عد الجداول، يقرأ من الكاش ويحدث في الخلفية
+    return Response(platform_stats.cached_dict())
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def price_suggestion(request):
+    """نطاق سعر مقترح من ملخصات أسعار المنتجات (بدون استدعاء الذكاء الاصطناعي)"""
+    category = request.GET.get('category', '').strip()
+    condition = request.GET.get('condition', '')
+    unit = request.GET.get('unit', '')
+    if not category or not unit or condition not in dict(Item.CONDITION_CHOICES):
+        return Response(
+            {'error': 'يجب تحديد الفئة والحالة والوحدة'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        quantity = max(int(request.GET.get('quantity', 1)), 1)
+    except ValueError:
+        return Response({'error': 'الكمية غير صالحة'}, status=status.HTTP_400_BAD_REQUEST)
+
+    category_id = int(category) if category.isdigit() else (
+        Category.objects.filter(name=category).values_list('id', flat=True).cached(3600).first()
+    )
+    suggestion = price_index.suggest(category_id, condition, unit, quantity) if category_id else None
+    if suggestion is None:
+        return Response({'error': 'لا توجد أسعار كافية لهذه الفئة'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(suggestion)
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def autocomplete(request):
+    """اقتراحات الإكمال التلقائي لخانة البحث من ذاكرة العملية"""
+    try:
+        limit = min(max(int(request.GET.get('limit', 10)), 1), 20)
+    except ValueError:
+        limit = 10
+    return Response({'suggestions': autocomplete_index.suggest(request.GET.get('q', ''), limit)})
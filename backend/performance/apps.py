@@ -0,0 +1,17 @@
+from django.apps import AppConfig
+from django.conf import settings
+
+
+class PerformanceConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'performance'
+
+    def ready(self):
+        from django.db import connections
+        from django.db.backends.signals import connection_created
+        from .queries import install_query_monitor, query_monitor
+
+        if getattr(settings, 'SQL_MONITOR_ENABLED', True):
+            connection_created.connect(install_query_monitor, dispatch_uid='performance.query_monitor')
+            for connection in connections.all(initialized_only=True):
+                query_monitor.install(connection)
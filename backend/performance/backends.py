@@ -0,0 +1,46 @@
+from django.core.cache.backends.redis import RedisCache
+from . import timing
+
+
+class TimedCacheMixin:
+    """قياس زمن عمليات الكاش المشترك ضمن أزمنة الطلب (cache)"""
+
+    def get(self, *args, **kwargs):
+        with timing.timed('cache'):
+            return super().get(*args, **kwargs)
+
+    def set(self, *args, **kwargs):
+        with timing.timed('cache'):
+            return super().set(*args, **kwargs)
+
+    def add(self, *args, **kwargs):
+        with timing.timed('cache'):
+            return super().add(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with timing.timed('cache'):
+            return super().delete(*args, **kwargs)
+
+    def get_many(self, *args, **kwargs):
+        with timing.timed('cache'):
+            return super().get_many(*args, **kwargs)
+
+    def set_many(self, *args, **kwargs):
+        with timing.timed('cache'):
+            return super().set_many(*args, **kwargs)
+
+    def delete_many(self, *args, **kwargs):
+        with timing.timed('cache'):
+            return super().delete_many(*args, **kwargs)
+
+    def incr(self, *args, **kwargs):
+        with timing.timed('cache'):
+            return super().incr(*args, **kwargs)
+
+    def touch(self, *args, **kwargs):
+        with timing.timed('cache'):
+            return super().touch(*args, **kwargs)
+
+
+class TimedRedisCache(TimedCacheMixin, RedisCache):
+    pass
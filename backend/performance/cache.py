@@ -1,10 +1,24 @@
+import atexit
+import fnmatch
 import hashlib
 import json
+import math
+import os
 import pickle
-from typing import Any, Optional, Union, List
+import random
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict, defaultdict
+from typing import Any, Dict, Iterable, Optional, Union, List
 from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
 from django.conf import settings
-from django.db.models import QuerySet
+from django.db import models, transaction
+from django.db.models import QuerySet, prefetch_related_objects
+from django.db.models.query import ModelIterable, NamedValuesListIterable, ValuesIterable
+from django.db.models.signals import post_delete, post_save
+from django.db.models.utils import create_namedtuple_class
 from django.utils import timezone
 from datetime import timedelta
 import redis
@@ -12,12 +26,237 @@ import logging
 
 logger = logging.getLogger('performance')
 
+class CacheEntry:
+    """قيمة محفوظة عبر get_or_set مع زمن حسابها وانتهائها (لإعادة الحساب المبكرة)"""
+
+    __slots__ = ('value', 'delta', 'expiry')
+
+    def __init__(self, value: Any, delta: float, expiry: float):
+        self.value = value
+        self.delta = delta
+        self.expiry = expiry
+
+    def __getstate__(self):
+        return (self.value, self.delta, self.expiry)
+
+    def __setstate__(self, state):
+        self.value, self.delta, self.expiry = state
+
+
+class LocalLRU:
+    """ذاكرة LRU داخل العملية محدودة بالحجم بالبايت مع مدة صلاحية لكل مفتاح"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, size, expires = item
+            if expires <= time.monotonic():
+                self._remove(key)
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, timeout: float):
+        try:
+            size = len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        except Exception:
+            # قيمة لا تسلسل لا تحفظ محلياً
+            self.delete(key)
+            return
+        with self._lock:
+            self._remove(key)
+            if size > self.max_bytes or timeout <= 0:
+                return
+            self._data[key] = (value, size, time.monotonic() + timeout)
+            self.size += size
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._data)))
+
+    def _remove(self, key: str):
+        item = self._data.pop(key, None)
+        if item is not None:
+            self.size -= item[1]
+
+    def delete(self, key: str):
+        with self._lock:
+            self._remove(key)
+
+    def delete_matching(self, pattern: str):
+        with self._lock:
+            for key in fnmatch.filter(list(self._data), pattern):
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+
+
+class BackgroundFlusher:
+    """خيط في الخلفية لكل عملية يستدعي flush() كل flush_interval ثانية"""
+
+    thread_name = 'flusher'
+
+    def __init__(self, flush_interval: float = 60):
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        # العملية التي بدأ فيها خيط الكتابة (العمليات المتفرعة تبدأ خيطها)
+        self._flusher_pid = None
+
+    def _ensure_flusher(self):
+        pid = os.getpid()
+        if self._flusher_pid == pid or not self.flush_interval:
+            return
+        with self._lock:
+            if self._flusher_pid == pid:
+                return
+            self._flusher_pid = pid
+        threading.Thread(target=self._run, name=self.thread_name, daemon=True).start()
+
+    def _run(self):
+        from django.db import connection
+
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            finally:
+                # اتصال هذا الخيط لا يغلقه request_finished
+                connection.close()
+
+    def flush(self) -> int:
+        raise NotImplementedError
+
+
+class CacheStatsCollector(BackgroundFlusher):
+    """عدادات إصابات الكاش في الذاكرة مجمعة حسب بادئة المفتاح
+
+    القراءة تزيد عداداً في الذاكرة فقط. خيط في الخلفية لكل عملية يكتب
+    العدادات كل flush_interval ثانية بعبارة upsert واحدة في CacheStats،
+    والباقي يكتب عند إغلاق العملية.
+    """
+
+    thread_name = 'cache-stats-flusher'
+
+    def __init__(self, flush_interval: float = 60):
+        super().__init__(flush_interval)
+        self._counts = defaultdict(lambda: [0, 0])
+
+    @staticmethod
+    def prefix(key: str) -> str:
+        """مجموعة المفتاح: الجزء قبل أول ':' (queryset، view، platform_stats...)"""
+        return key.split(':', 1)[0][:255]
+
+    def record(self, key: str, hit: bool):
+        with self._lock:
+            self._counts[self.prefix(key)][0 if hit else 1] += 1
+        self._ensure_flusher()
+
+    def pending(self) -> Dict[str, List[int]]:
+        """العدادات التي لم تكتب بعد {بادئة: [إصابات، إخفاقات]}"""
+        with self._lock:
+            return {prefix: list(counts) for prefix, counts in self._counts.items()}
+
+    def flush(self) -> int:
+        """كتابة العدادات المتراكمة في CacheStats وإرجاع عدد البادئات"""
+        with self._lock:
+            counts, self._counts = self._counts, defaultdict(lambda: [0, 0])
+        if not counts:
+            return 0
+        try:
+            self._upsert(counts)
+        except Exception as e:
+            logger.error(f"Cache stats flush error: {e}")
+            # إعادة العدادات لتكتب في المرة التالية
+            with self._lock:
+                for prefix, (hits, misses) in counts.items():
+                    self._counts[prefix][0] += hits
+                    self._counts[prefix][1] += misses
+            return 0
+        return len(counts)
+
+    def _upsert(self, counts: Dict[str, List[int]]):
+        """INSERT ... ON CONFLICT بزيادة العدادات الموجودة (PostgreSQL وSQLite)"""
+        from django.db import connection
+        from .models import CacheStats
+
+        qn = connection.ops.quote_name
+        table = qn(CacheStats._meta.db_table)
+        key, hits, misses = qn('key'), qn('hits'), qn('misses')
+        last_accessed, created_at = qn('last_accessed'), qn('created_at')
+        now = connection.ops.adapt_datetimefield_value(timezone.now())
+        rows = sorted(counts.items())
+        params = []
+        for prefix, (hit_count, miss_count) in rows:
+            params.extend([prefix, hit_count, miss_count, now, now])
+        values = ', '.join(['(%s, %s, %s, %s, %s)'] * len(rows))
+        sql = (
+            f"INSERT INTO {table} ({key}, {hits}, {misses}, {last_accessed}, {created_at}) VALUES {values} "
+            f"ON CONFLICT ({key}) DO UPDATE SET "
+            f"{hits} = {table}.{hits} + EXCLUDED.{hits}, "
+            f"{misses} = {table}.{misses} + EXCLUDED.{misses}, "
+            f"{last_accessed} = EXCLUDED.{last_accessed}"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+    def hit_rates(self) -> Dict[str, Dict]:
+        """نسبة الإصابة لكل بادئة من CacheStats مع العدادات التي لم تكتب بعد"""
+        from .models import CacheStats
+
+        totals = defaultdict(lambda: [0, 0])
+        for prefix, hits, misses in CacheStats.objects.values_list('key', 'hits', 'misses'):
+            totals[prefix][0] += hits
+            totals[prefix][1] += misses
+        for prefix, (hits, misses) in self.pending().items():
+            totals[prefix][0] += hits
+            totals[prefix][1] += misses
+        return {
+            prefix: {
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': round(hits / (hits + misses) * 100, 2) if hits + misses else 0.0,
+            }
+            for prefix, (hits, misses) in sorted(totals.items())
+        }
+
+
 class AdvancedCache:
-    """نظام كاش متقدم مع Redis"""
-    
+    """نظام كاش متقدم مع Redis
+
+    طبقتان: ذاكرة LRU في كل عملية أمام الكاش المشترك. مدة الطبقة المحلية قصيرة
+    (CACHE_LOCAL_TIMEOUT) لأن الحذف من عملية أخرى لا يصلها. get_or_set يمنع
+    تزاحم إعادة الحساب: خيط واحد في العملية وعامل واحد عبر قفل في الكاش
+    المشترك، ويعيد الحساب مبكراً باحتمال يزيد مع اقتراب الانتهاء (XFetch)
+    بينما يستمر الآخرون في استخدام القيمة الحالية.
+    """
+
+    # انتظار عامل آخر يحسب نفس المفتاح قبل الحساب بدون قفل
+    lock_timeout = 30
+    lock_wait = 5.0
+    lock_poll_interval = 0.05
+    # أقفال العملية موزعة على عدد ثابت بدلاً من قفل لكل مفتاح
+    lock_stripes = 64
+
     def __init__(self):
         self.redis_client = redis.from_url(settings.REDIS_URL)
         self.default_timeout = getattr(settings, 'CACHE_DEFAULT_TIMEOUT', 3600)
+        self.local_timeout = getattr(settings, 'CACHE_LOCAL_TIMEOUT', 5)
+        self.local = LocalLRU(getattr(settings, 'CACHE_LOCAL_MAX_BYTES', 16 * 1024 * 1024))
+        self.counters = Counter()
+        self._counters_lock = threading.Lock()
+        self._stripes = [threading.Lock() for _ in range(self.lock_stripes)]
+        # المفاتيح التي تحدث في الخلفية: {مفتاح: (دالة، مدة، التحديث قبل الانتهاء بثوان)}
+        self.refreshers = {}
+        self.stats = CacheStatsCollector(getattr(settings, 'CACHE_STATS_FLUSH_INTERVAL', 60))
         
     def generate_key(self, prefix: str, *args, **kwargs) -> str:
         """توليد مفتاح كاش فريد"""
@@ -28,111 +267,646 @@ class AdvancedCache:
         }
         key_string = json.dumps(key_data, sort_keys=True, default=str)
         return f"{prefix}:{hashlib.md5(key_string.encode()).hexdigest()}"
-    
-    def get(self, key: str, default=None) -> Any:
-        """استرجاع من الكاش مع تسجيل الإحصائيات"""
+
+    def _count(self, tier: str, hit: bool):
+        with self._counters_lock:
+            self.counters[f"{tier}_{'hits' if hit else 'misses'}"] += 1
+
+    def tier_stats(self) -> dict:
+        """عدد الإصابات والإخفاقات لكل طبقة منذ بدء العملية"""
+        with self._counters_lock:
+            counters = dict(self.counters)
+        stats = {
+            tier: {'hits': counters.get(f"{tier}_hits", 0), 'misses': counters.get(f"{tier}_misses", 0)}
+            for tier in ('local', 'shared')
+        }
+        stats['early_refreshes'] = counters.get('early_refreshes', 0)
+        stats['lock_waits'] = counters.get('lock_waits', 0)
+        stats['local_bytes'] = self.local.size
+        return stats
+
+    def clear_local(self):
+        """مسح الطبقة المحلية والعدادات (للاختبارات والإغلاق)"""
+        self.local.clear()
+        with self._counters_lock:
+            self.counters.clear()
+
+    def _local_timeout(self, entry: Any) -> float:
+        if isinstance(entry, CacheEntry):
+            return min(self.local_timeout, entry.expiry - time.time())
+        return self.local_timeout
+
+    def _shared_get(self, key: str) -> Any:
         try:
-            value = cache.get(key, default)
-            self._update_stats(key, hit=value is not None)
-            return value
+            value = cache.get(key)
         except Exception as e:
             logger.error(f"Cache get error for key {key}: {e}")
+            return None
+        self._count('shared', value is not None)
+        self._update_stats(key, hit=value is not None)
+        if value is not None:
+            self.local.set(key, value, self._local_timeout(value))
+        return value
+
+    def tag_versions(self, tags: List[str]) -> List[int]:
+        """أرقام إصدارات الوسوم بقراءة واحدة (تحفظ في الطبقة المحلية لمدتها)"""
+        keys = [f"version:tag:{tag}" for tag in tags]
+        versions = {key: self.local.get(key) for key in keys}
+        missing = [key for key, version in versions.items() if version is None]
+        if missing:
+            try:
+                found = cache.get_many(missing)
+                for key in missing:
+                    if key not in found:
+                        # الإصدار الأول قيمة زمنية أكبر من أي إصدار سابق حذف
+                        cache.add(key, int(time.time() * 1000), None)
+                        found[key] = cache.get(key)
+            except Exception as e:
+                logger.error(f"Cache tag version read error for {tags}: {e}")
+                found = {}
+            for key in missing:
+                versions[key] = found.get(key) or 0
+                self.local.set(key, versions[key], self.local_timeout)
+        return [versions[key] for key in keys]
+
+    def tagged_key(self, key: str, tags: Iterable[str] = ()) -> str:
+        """المفتاح مع إصدارات وسومه: زيادة إصدار وسم تجعل مفاتيحه القديمة غير قابلة للوصول"""
+        tags = sorted(set(tags))
+        if not tags:
+            return key
+        versions = self.tag_versions(tags)
+        digest = hashlib.md5(json.dumps(list(zip(tags, versions))).encode()).hexdigest()[:12]
+        # البادئة تبقى كما هي لإحصائيات الكاش
+        return f"{key}:g{digest}"
+
+    def invalidate_tags(self, *tags: str):
+        """إبطال كل المفاتيح المرتبطة بالوسوم بزيادة إصدار كل وسم (O(1) لكل وسم)"""
+        for tag in tags:
+            self.incr_version(f"tag:{tag}")
+            self.local.delete(f"version:tag:{tag}")
+
+    def get(self, key: str, default=None, tags: Iterable[str] = ()) -> Any:
+        """استرجاع من الطبقة المحلية ثم الكاش المشترك مع تسجيل الإحصائيات"""
+        key = self.tagged_key(key, tags)
+        value = self.local.get(key)
+        self._count('local', value is not None)
+        if value is None:
+            value = self._shared_get(key)
+        if value is None:
             return default
+        return value.value if isinstance(value, CacheEntry) else value
     
-    def set(self, key: str, value: Any, timeout: Optional[int] = None) -> bool:
+    def set(self, key: str, value: Any, timeout: Optional[int] = None, tags: Iterable[str] = ()) -> bool:
         """حفظ في الكاش"""
+        key = self.tagged_key(key, tags)
         try:
             timeout = timeout or self.default_timeout
-            return cache.set(key, value, timeout)
+            result = cache.set(key, value, timeout)
+            self.local.set(key, value, min(self.local_timeout, timeout))
+            return result
         except Exception as e:
             logger.error(f"Cache set error for key {key}: {e}")
+            self.local.delete(key)
             return False
     
-    def delete(self, key: str) -> bool:
+    def delete(self, key: str, tags: Iterable[str] = ()) -> bool:
         """حذف من الكاش"""
+        key = self.tagged_key(key, tags)
+        self.local.delete(key)
         try:
             return cache.delete(key)
         except Exception as e:
             logger.error(f"Cache delete error for key {key}: {e}")
             return False
-    
-    def get_or_set(self, key: str, callable_func, timeout: Optional[int] = None) -> Any:
-        """استرجاع أو تعيين قيمة جديدة"""
-        value = self.get(key)
-        if value is None:
-            value = callable_func()
-            self.set(key, value, timeout)
+
+    def _should_refresh(self, key: str, entry: CacheEntry, beta: float) -> bool:
+        """إعادة حساب مبكرة باحتمال يزيد مع اقتراب الانتهاء وطول زمن الحساب (XFetch)"""
+        if key in self.refreshers:
+            # المهمة الدورية تحدثها قبل انتهائها
+            return False
+        return time.time() - entry.delta * beta * math.log(1.0 - random.random()) >= entry.expiry
+
+    def get_or_set(self, key: str, callable_func, timeout: Optional[int] = None, beta: float = 1.0,
+                   tags: Iterable[str] = ()) -> Any:
+        """استرجاع أو تعيين قيمة جديدة بدون تزاحم على إعادة الحساب"""
+        key = self.tagged_key(key, tags)
+        timeout = timeout or self.default_timeout
+        entry = self.local.get(key)
+        self._count('local', entry is not None)
+        if entry is None:
+            entry = self._shared_get(key)
+        if not isinstance(entry, CacheEntry):
+            # قيمة محفوظة عبر set: تستخدم كما هي
+            if entry is not None:
+                return entry
+        elif not self._should_refresh(key, entry, beta):
+            return entry.value
+        else:
+            with self._counters_lock:
+                self.counters['early_refreshes'] += 1
+
+        with self._stripes[hash(key) % self.lock_stripes]:
+            # خيط آخر في العملية قد يكون حسبها أثناء الانتظار
+            current = self.local.get(key)
+            if isinstance(current, CacheEntry) and current is not entry:
+                return current.value
+            return self._recompute(key, callable_func, timeout, entry)
+
+    def _recompute(self, key: str, callable_func, timeout: int, stale: Optional[CacheEntry]) -> Any:
+        lock_key = f"lock:{key}"
+        token = uuid.uuid4().hex
+        try:
+            locked = cache.add(lock_key, token, self.lock_timeout)
+        except Exception as e:
+            logger.error(f"Cache lock error for key {key}: {e}")
+            locked = True
+            lock_key = None
+        if locked:
+            try:
+                return self.compute(key, callable_func, timeout)
+            finally:
+                if lock_key is not None:
+                    self._release(lock_key, token)
+
+        if stale is not None:
+            # عامل آخر يعيد الحساب والقيمة الحالية ما زالت صالحة
+            return stale.value
+        with self._counters_lock:
+            self.counters['lock_waits'] += 1
+        deadline = time.monotonic() + self.lock_wait
+        while time.monotonic() < deadline:
+            time.sleep(self.lock_poll_interval)
+            try:
+                entry = cache.get(key)
+            except Exception:
+                break
+            if entry is not None:
+                self.local.set(key, entry, self._local_timeout(entry))
+                return entry.value if isinstance(entry, CacheEntry) else entry
+        logger.warning(f"Cache lock wait timed out for key {key}")
+        return self.compute(key, callable_func, timeout)
+
+    def _release(self, lock_key: str, token: str):
+        try:
+            if cache.get(lock_key) == token:
+                cache.delete(lock_key)
+        except Exception as e:
+            logger.error(f"Cache lock release error for {lock_key}: {e}")
+
+    def compute(self, key: str, callable_func, timeout: int) -> Any:
+        """حساب القيمة وحفظها في الطبقتين مع زمن الحساب"""
+        started = time.monotonic()
+        value = callable_func()
+        entry = CacheEntry(value, time.monotonic() - started, time.time() + timeout)
+        try:
+            cache.set(key, entry, timeout)
+        except Exception as e:
+            logger.error(f"Cache set error for key {key}: {e}")
+        self.local.set(key, entry, self._local_timeout(entry))
         return value
+
+    def register_refresh(self, key: str, callable_func, timeout: int, refresh_ahead: int = 30):
+        """تحديث المفتاح في الخلفية (refresh_registered) بدلاً من إعادة حسابه في الطلبات"""
+        self.refreshers[key] = (callable_func, timeout, refresh_ahead)
+
+    def refresh_registered(self) -> List[str]:
+        """إعادة حساب المفاتيح المسجلة التي تقترب من الانتهاء (تستدعى دورياً)"""
+        refreshed = []
+        for key, (callable_func, timeout, refresh_ahead) in list(self.refreshers.items()):
+            try:
+                entry = cache.get(key)
+            except Exception as e:
+                logger.error(f"Cache refresh read error for key {key}: {e}")
+                continue
+            if isinstance(entry, CacheEntry) and entry.expiry - time.time() > refresh_ahead:
+                continue
+            token = uuid.uuid4().hex
+            lock_key = f"lock:{key}"
+            try:
+                if not cache.add(lock_key, token, self.lock_timeout):
+                    continue
+            except Exception as e:
+                logger.error(f"Cache lock error for key {key}: {e}")
+                continue
+            try:
+                self.compute(key, callable_func, timeout)
+                refreshed.append(key)
+            except Exception as e:
+                logger.error(f"Cache refresh error for key {key}: {e}")
+            finally:
+                self._release(lock_key, token)
+        return refreshed
     
-    def invalidate_pattern(self, pattern: str) -> int:
-        """حذف جميع المفاتيح التي تطابق النمط"""
+    def get_version(self, namespace: str, default: Optional[int] = 0) -> Optional[int]:
+        """رقم الإصدار الحالي لمجموعة مفاتيح (أو default إذا تعذرت قراءته)"""
+        key = f"version:{namespace}"
         try:
-            keys = self.redis_client.keys(pattern)
-            if keys:
-                return self.redis_client.delete(*keys)
+            version = cache.get(key)
+            if version is None:
+                cache.add(key, int(time.time() * 1000), None)
+                version = cache.get(key)
+            return version or default
+        except Exception as e:
+            logger.error(f"Cache version read error for {namespace}: {e}")
+            return default
+
+    def incr_version(self, namespace: str) -> int:
+        """زيادة رقم الإصدار لإبطال كل مفاتيح المجموعة دفعة واحدة"""
+        key = f"version:{namespace}"
+        try:
+            return cache.incr(key)
+        except ValueError:
+            # المفتاح غير موجود: قيمة زمنية أكبر من أي إصدار سابق
+            version = int(time.time() * 1000)
+            cache.set(key, version, None)
+            return version
+        except Exception as e:
+            logger.error(f"Cache version bump error for {namespace}: {e}")
             return 0
+
+    def invalidate_pattern(self, pattern: str, batch_size: int = 500) -> int:
+        """حذف المفاتيح المطابقة للنمط بـ SCAN على دفعات (للتنظيف الإداري)
+
+        لا يوقف Redis مثل KEYS لكنه يمر على كل المفاتيح، فالإبطال المعتاد
+        يكون بالوسوم (invalidate_tags).
+        """
+        self.local.delete_matching(pattern)
+        # المفاتيح في Redis تحمل بادئة الكاش وإصداره (مثل :1:)
+        raw_pattern = cache.make_key(pattern)
+        deleted = 0
+        batch = []
+        try:
+            for key in self.redis_client.scan_iter(match=raw_pattern, count=batch_size):
+                batch.append(key)
+                if len(batch) >= batch_size:
+                    # UNLINK يحرر الذاكرة في الخلفية
+                    deleted += self.redis_client.unlink(*batch)
+                    batch = []
+            if batch:
+                deleted += self.redis_client.unlink(*batch)
         except Exception as e:
             logger.error(f"Cache invalidate pattern error for {pattern}: {e}")
-            return 0
+        return deleted
     
     def _update_stats(self, key: str, hit: bool):
-        """تحديث إحصائيات الكاش"""
-        from .models import CacheStats
-        try:
-            stats, created = CacheStats.objects.get_or_create(key=key)
-            if hit:
-                stats.hits += 1
-            else:
-                stats.misses += 1
-            stats.save(update_fields=['hits', 'misses', 'last_accessed'])
-        except Exception as e:
-            logger.error(f"Cache stats update error: {e}")
+        """تحديث إحصائيات الكاش (في الذاكرة فقط، تكتب دورياً)"""
+        self.stats.record(key, hit)
+
+    def hit_rates(self) -> Dict[str, Dict]:
+        """نسب الإصابة الحالية لكل بادئة مفاتيح"""
+        return self.stats.hit_rates()
 
 # إنشاء instance عام
 advanced_cache = AdvancedCache()
+atexit.register(advanced_cache.stats.flush)
+
+class ReadThroughCache:
+    """كاش قراءة مباشرة لبيانات جاهزة (bytes) في ذاكرة العملية والكاش المشترك
+
+    المفاتيح تحمل رقم إصدار المجموعة، فزيادته (invalidate) تبطل النسخ القديمة
+    في جميع العمليات بدون البحث عنها أو حذفها. المتغيرات المرتبطة بمجموعة
+    فرعية (group) تحمل إصدارها أيضاً، فـ invalidate_groups تبطلها وحدها.
+    """
+
+    def __init__(self, namespace: str, timeout: Optional[int] = None,
+                 version_check_interval: float = 1.0, max_local_entries: int = 64):
+        self.namespace = namespace
+        self.timeout = timeout
+        # قراءة الإصدار من الكاش المشترك مرة كل فترة على الأكثر
+        self.version_check_interval = version_check_interval
+        self.max_local_entries = max_local_entries
+        self._local = {}
+        self._version = None
+        self._version_checked = 0.0
+        # {مجموعة فرعية: (الإصدار، وقت القراءة)}
+        self._group_versions = {}
+        self._lock = threading.Lock()
+
+    def group_namespace(self, group: str) -> str:
+        return f"{self.namespace}:{group}"
+
+    def group_version(self, group: str) -> int:
+        now = time.monotonic()
+        version, checked = self._group_versions.get(group, (None, 0.0))
+        if version is None or now - checked >= self.version_check_interval:
+            version = advanced_cache.get_version(self.group_namespace(group))
+            with self._lock:
+                if len(self._group_versions) >= self.max_local_entries:
+                    self._group_versions.clear()
+                self._group_versions[group] = (version, now)
+        return version
+
+    def version(self) -> int:
+        now = time.monotonic()
+        if self._version is None or now - self._version_checked >= self.version_check_interval:
+            self._version = advanced_cache.get_version(self.namespace)
+            self._version_checked = now
+        return self._version
+
+    def invalidate(self):
+        """إبطال كل النسخ المحفوظة لهذه المجموعة"""
+        version = advanced_cache.incr_version(self.namespace)
+        with self._lock:
+            self._version = version
+            self._version_checked = time.monotonic()
+            self._local.clear()
+
+    def invalidate_groups(self, groups: Iterable[str]):
+        """إبطال متغيرات مجموعات فرعية فقط"""
+        now = time.monotonic()
+        for group in set(groups):
+            version = advanced_cache.incr_version(self.group_namespace(group))
+            with self._lock:
+                self._group_versions[group] = (version, now)
+
+    def clear_local(self):
+        """مسح ذاكرة العملية (يعاد قراءة الإصدار في الطلب التالي)"""
+        with self._lock:
+            self._version = None
+            self._group_versions.clear()
+            self._local.clear()
+
+    def get_or_build(self, variant: str, builder, group: Optional[str] = None) -> bytes:
+        """إرجاع القيمة المحفوظة للمتغير أو بناؤها وحفظها"""
+        version = self.version()
+        if group is not None:
+            version = f"{version}.{self.group_version(group)}"
+        local = self._local.get(variant)
+        if local and local[0] == version:
+            return local[1]
+
+        key = f"{self.namespace}:{version}:{hashlib.md5(variant.encode()).hexdigest()}"
+        try:
+            value = cache.get(key)
+        except Exception as e:
+            logger.error(f"Read-through cache get error for {key}: {e}")
+            value = None
+        if value is None:
+            value = builder()
+            try:
+                cache.set(key, value, self.timeout or advanced_cache.default_timeout)
+            except Exception as e:
+                logger.error(f"Read-through cache set error for {key}: {e}")
+
+        with self._lock:
+            if len(self._local) >= self.max_local_entries:
+                self._local.clear()
+            self._local[variant] = (version, value)
+        return value
 
 class QueryCache:
-    """كاش خاص بالاستعلامات"""
-    
+    """كاش خاص بالاستعلامات
+
+    كل نتيجة موسومة بالنماذج التي يقرأ منها الاستعلام (model:<label>)، فإبطال
+    نموذج يزيد إصدار وسمه فقط بدلاً من البحث عن مفاتيحه. النتائج تخزن صفوفاً
+    مضغوطة (tuples بترتيب ثابت) ويعاد بناء الكائنات منها بـ from_db، والنماذج
+    المراقبة تبطل وسمها تلقائياً بعد كل كتابة.
+    """
+
     @staticmethod
     def cache_queryset(queryset: QuerySet, timeout: int = 3600) -> List:
         """كاش نتائج QuerySet"""
-        key = QueryCache._generate_queryset_key(queryset)
-        cached_result = advanced_cache.get(key)
-        
-        if cached_result is None:
-            # تحويل QuerySet إلى قائمة وحفظها
-            result = list(queryset)
-            advanced_cache.set(key, result, timeout)
-            return result
-        
-        return cached_result
-    
+        result = QueryCache.fetch(queryset, timeout)
+        if queryset._prefetch_related_lookups and issubclass(queryset._iterable_class, ModelIterable):
+            prefetch_related_objects(result, *queryset._prefetch_related_lookups)
+        return result
+
+    @staticmethod
+    def fetch(queryset: QuerySet, timeout: Optional[int] = None) -> List:
+        """نتائج الاستعلام من الكاش أو من قاعدة البيانات (بدون prefetch_related)"""
+        if queryset.query.extra_select or queryset.query.combinator:
+            # أعمدة extra والاستعلامات المركبة لا تدخل في خطة الصفوف
+            return list(queryset._iterable_class(queryset))
+        if queryset.query.is_empty():
+            return []
+        try:
+            key = QueryCache._generate_queryset_key(queryset)
+        except EmptyResultSet:
+            # شرط لا يطابق أي صف (مثل id__in=[]) لا يمكن تحويله إلى SQL
+            return []
+        tags = QueryCache.model_tags(queryset)
+        payload = advanced_cache.get_or_set(key, lambda: QueryCache.compact_rows(queryset), timeout, tags=tags)
+        return QueryCache.restore(queryset, payload)
+
     @staticmethod
     def _generate_queryset_key(queryset: QuerySet) -> str:
         """توليد مفتاح للـ QuerySet"""
         query_str = str(queryset.query)
         model_name = queryset.model._meta.label
-        return advanced_cache.generate_key('queryset', model_name, query_str)
+        return advanced_cache.generate_key(
+            'queryset', model_name, query_str, queryset._iterable_class.__name__, queryset._fields
+        )
+
+    @staticmethod
+    def row_plan(queryset: QuerySet) -> Dict:
+        """أعمدة الصف المضغوط: حقول النموذج ثم النماذج المربوطة بـ select_related ثم التعليقات"""
+        query = queryset.query
+        lookups = []
+
+        def node(model, path, select_related):
+            attnames = QueryCache._loaded_attnames(model, query, path)
+            lookups.extend(f"{path}__{name}" if path else name for name in attnames)
+            related = []
+            if isinstance(select_related, dict):
+                for name, nested in select_related.items():
+                    field = model._meta.get_field(name)
+                    if not field.many_to_one and not (field.one_to_one and field.concrete):
+                        continue
+                    related.append((field, node(field.related_model, f"{path}__{name}" if path else name, nested)))
+            return model, attnames, related
+
+        root = node(queryset.model, '', query.select_related)
+        annotations = list(query.annotation_select)
+        lookups.extend(annotations)
+        return {'root': root, 'annotations': annotations, 'lookups': lookups}
+
+    @staticmethod
+    def _loaded_attnames(model, query, path: str) -> List[str]:
+        """الحقول المحملة لنموذج بترتيب concrete_fields مع احترام only/defer"""
+        names, defer = query.deferred_loading
+        prefix = f"{path}__" if path else ''
+        selected = set()
+        for name in names:
+            if name.startswith(prefix):
+                parts = name[len(prefix):].split('__')
+                # only('category__name') يحمل الحقل category من النموذج الأساسي
+                if not defer or len(parts) == 1:
+                    selected.add(parts[0])
+        if not selected:
+            return [field.attname for field in model._meta.concrete_fields]
+        return [
+            field.attname for field in model._meta.concrete_fields
+            if field.primary_key or (field.name in selected or field.attname in selected) != defer
+        ]
+
+    @staticmethod
+    def compact_rows(queryset: QuerySet) -> Dict:
+        """تنفيذ الاستعلام وتحويل نتيجته إلى صفوف tuples"""
+        iterable = queryset._iterable_class
+        if issubclass(iterable, ModelIterable):
+            plan = QueryCache.row_plan(queryset)
+            rows_queryset = queryset.values_list(*plan['lookups'])
+            return {'kind': 'model', 'rows': list(rows_queryset._iterable_class(rows_queryset))}
+        rows = list(iterable(queryset))
+        if issubclass(iterable, ValuesIterable):
+            names = list(rows[0]) if rows else []
+            return {'kind': 'values', 'names': names, 'rows': [tuple(row.values()) for row in rows]}
+        if issubclass(iterable, NamedValuesListIterable):
+            names = list(rows[0]._fields) if rows else []
+            return {'kind': 'named', 'names': names, 'rows': [tuple(row) for row in rows]}
+        return {'kind': 'rows', 'rows': rows}
+
+    @staticmethod
+    def restore(queryset: QuerySet, payload: Dict) -> List:
+        """إعادة بناء نتيجة الاستعلام من الصفوف المخزنة"""
+        kind = payload['kind']
+        rows = payload['rows']
+        if kind == 'values':
+            return [dict(zip(payload['names'], row)) for row in rows]
+        if kind == 'named':
+            row_class = create_namedtuple_class(*payload['names'])
+            return [row_class(*row) for row in rows]
+        if kind == 'rows':
+            return list(rows)
+
+        plan = QueryCache.row_plan(queryset)
+        db = queryset.db
+        annotations = plan['annotations']
+        instances = []
+        for row in rows:
+            values = iter(row)
+            instance = QueryCache._build(plan['root'], values, db)
+            for name, value in zip(annotations, values):
+                setattr(instance, name, value)
+            instances.append(instance)
+        return instances
+
+    @staticmethod
+    def _build(node, values, db):
+        model, attnames, related = node
+        row = [next(values) for _ in attnames]
+        pk_index = attnames.index(model._meta.pk.attname)
+        instance = model.from_db(db, attnames, row) if row[pk_index] is not None else None
+        for field, child in related:
+            # LEFT JOIN بدون صف مربوط يعطي أعمدة فارغة
+            related_instance = QueryCache._build(child, values, db)
+            if instance is not None:
+                field.set_cached_value(instance, related_instance)
+        return instance
+
+    @staticmethod
+    def model_tag(model_class) -> str:
+        return f"model:{model_class._meta.concrete_model._meta.label}"
+
+    @staticmethod
+    def model_tags(queryset: QuerySet) -> List[str]:
+        """وسوم النموذج والنماذج المربوطة في الاستعلام (select_related والفلاتر)"""
+        from django.apps import apps
+
+        tables = {queryset.model._meta.db_table}
+        tables.update(join.table_name for join in queryset.query.alias_map.values())
+        return sorted({
+            QueryCache.model_tag(model) for model in apps.get_models()
+            if model._meta.db_table in tables
+        })
     
     @staticmethod
     def invalidate_model_cache(model_class):
         """إلغاء كاش نموذج معين"""
-        model_name = model_class._meta.label
-        pattern = f"queryset:*{model_name}*"
-        return advanced_cache.invalidate_pattern(pattern)
+        advanced_cache.invalidate_tags(QueryCache.model_tag(model_class))
+
+    @staticmethod
+    def invalidate_on_commit(model_class):
+        """إبطال كاش النموذج بعد نجاح المعاملة الحالية"""
+        tag = QueryCache.model_tag(model_class)
+        transaction.on_commit(lambda: advanced_cache.invalidate_tags(tag))
+
+    @staticmethod
+    def watch(model_class):
+        """إبطال كاش النموذج تلقائياً عند الحفظ والحذف"""
+        label = model_class._meta.label
+        post_save.connect(_invalidate_sender, sender=model_class, dispatch_uid=f"query_cache:save:{label}")
+        post_delete.connect(_invalidate_sender, sender=model_class, dispatch_uid=f"query_cache:delete:{label}")
+
+
+def _invalidate_sender(sender, **kwargs):
+    QueryCache.invalidate_on_commit(sender)
+
+
+class CachingManager(models.Manager):
+    """مدير يسجل نموذجه للإبطال التلقائي عند ربطه بالنموذج"""
+
+    def contribute_to_class(self, cls, name):
+        super().contribute_to_class(cls, name)
+        if not cls._meta.abstract:
+            QueryCache.watch(cls)
+
+
+class CachingQuerySet(QuerySet):
+    """QuerySet يمكن كاش نتيجته بـ .cached(ttl) ويبطل كاش نموذجه عند الكتابة الجماعية"""
+
+    _cache_timeout = None
+
+    @classmethod
+    def as_manager(cls):
+        manager = CachingManager.from_queryset(cls)()
+        manager._built_with_as_manager = True
+        return manager
+    as_manager.queryset_only = True
+
+    def cached(self, ttl: Optional[int] = None) -> 'CachingQuerySet':
+        """نسخة تقرأ نتيجتها من كاش الاستعلامات"""
+        clone = self._chain()
+        clone._cache_timeout = ttl or advanced_cache.default_timeout
+        return clone
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._cache_timeout = self._cache_timeout
+        return clone
+
+    def _fetch_all(self):
+        if self._result_cache is None and self._cache_timeout is not None:
+            self._result_cache = QueryCache.fetch(self, self._cache_timeout)
+        # prefetch_related يعمل على الكائنات المعاد بناؤها كالمعتاد
+        super()._fetch_all()
+
+    def update(self, **kwargs):
+        rows = super().update(**kwargs)
+        QueryCache.invalidate_on_commit(self.model)
+        return rows
+    update.alters_data = True
+
+    def delete(self):
+        result = super().delete()
+        QueryCache.invalidate_on_commit(self.model)
+        return result
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def bulk_create(self, *args, **kwargs):
+        objs = super().bulk_create(*args, **kwargs)
+        QueryCache.invalidate_on_commit(self.model)
+        return objs
+
+    def bulk_update(self, *args, **kwargs):
+        rows = super().bulk_update(*args, **kwargs)
+        QueryCache.invalidate_on_commit(self.model)
+        return rows
+    bulk_update.alters_data = True
 
 class ViewCache:
     """كاش خاص بالـ Views"""
     
     @staticmethod
-    def cache_view_response(view_name: str, request_data: dict, response_data: Any, timeout: int = 1800):
+    def cache_view_response(view_name: str, request_data: dict, response_data: Any, timeout: int = 1800,
+                            tags: Iterable[str] = ()):
         """كاش استجابة View"""
         key = advanced_cache.generate_key('view', view_name, **request_data)
-        advanced_cache.set(key, response_data, timeout)
+        advanced_cache.set(key, response_data, timeout, tags=tags)
     
     @staticmethod
-    def get_cached_view_response(view_name: str, request_data: dict) -> Optional[Any]:
+    def get_cached_view_response(view_name: str, request_data: dict, tags: Iterable[str] = ()) -> Optional[Any]:
         """استرجاع استجابة View المحفوظة"""
         key = advanced_cache.generate_key('view', view_name, **request_data)
-        return advanced_cache.get(key)
+        return advanced_cache.get(key, tags=tags)
@@ -1,19 +1,22 @@
+import gzip
 import time
 import functools
 import hashlib
 from django.core.cache import cache
-from django.http import JsonResponse
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
 from django.utils.decorators import method_decorator
 from django.views.decorators.cache import cache_page
 from django.views.decorators.vary import vary_on_headers
-from .cache import advanced_cache, ViewCache
-from .models import QueryPerformance
+from .cache import advanced_cache, QueryCache, ViewCache
+from .middleware import negotiate_encoding
+from .queries import query_monitor
 import logging
 
 logger = logging.getLogger('performance')
 
-def cache_result(timeout=3600, key_prefix=''):
-    """ديكوريتر لكاش نتائج الدوال"""
+def cache_result(timeout=3600, key_prefix='', tags=()):
+    """ديكوريتر لكاش نتائج الدوال (tags: وسوم تبطل بـ advanced_cache.invalidate_tags)"""
     def decorator(func):
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
@@ -25,21 +28,68 @@ def cache_result(timeout=3600, key_prefix=''):
             )
             
             # محاولة استرجاع من الكاش
-            result = advanced_cache.get(key)
+            result = advanced_cache.get(key, tags=tags)
             if result is not None:
                 return result
             
             # تنفيذ الدالة وحفظ النتيجة
             result = func(*args, **kwargs)
-            advanced_cache.set(key, result, timeout)
+            advanced_cache.set(key, result, timeout, tags=tags)
             return result
         
         return wrapper
     return decorator
 
-def cache_api_response(timeout=1800):
-    """ديكوريتر لكاش استجابات API"""
+# ترويسات لا تخزن مع الاستجابة (تخص طلباً بعينه أو يعاد حسابها عند الإرسال)
+UNCACHED_HEADERS = {'content-length', 'content-encoding', 'set-cookie', 'x-response-time', 'x-cache'}
+
+
+def auth_scope(request) -> str:
+    """نطاق المستخدم في مفتاح الكاش: ترويسة التفويض أو مستخدم الجلسة أو مجهول"""
+    authorization = request.META.get('HTTP_AUTHORIZATION')
+    if authorization:
+        return 'auth:' + hashlib.sha256(authorization.encode()).hexdigest()
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f"user:{user.pk}"
+    return 'anon'
+
+
+def accepts_gzip(request) -> bool:
+    """gzip هو الترميز المختار لهذا العميل حسب Accept-Encoding وأوزان q"""
+    return negotiate_encoding(request.META.get('HTTP_ACCEPT_ENCODING', '')) == 'gzip'
+
+
+def cached_response(entry: dict, request) -> HttpResponse:
+    """استجابة من النسخة المخزنة بدون المرور على الـ View أو DRF"""
+    if accepts_gzip(request):
+        response = HttpResponse(entry['body'], status=entry['status'])
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(gzip.decompress(entry['body']), status=entry['status'])
+    for header, value in entry['headers']:
+        response[header] = value
+    response['X-Cache'] = 'HIT'
+    return response
+
+
+def cache_api_response(timeout=1800, tags=(), models=(), scope='user'):
+    """ديكوريتر لكاش استجابات API كاملة (الحالة والترويسات والجسم المضغوط)
+
+    المفتاح يتغير بالـ View ومعاملاتها ومعاملات الاستعلام وترويسة Accept ونطاق
+    المستخدم (scope='public' للاستجابات التي لا تعتمد على المستخدم). الجسم يخزن
+    مضغوطاً بـ gzip ويرسل كما هو للعملاء الذين يقبلونه. models: النماذج التي
+    تقرأ منها الـ View، أي كتابة عليها تبطل الكاش، ويمكن إبطال الـ View وحدها
+    بـ view.invalidate().
+    """
     def decorator(view_func):
+        view_name = f"{view_func.__module__}.{view_func.__qualname__}"
+        view_tag = f"view:{view_name}"
+        for model in models:
+            QueryCache.watch(model)
+        view_tags = sorted({view_tag, *tags, *(QueryCache.model_tag(model) for model in models)})
+        vary = ('Accept', 'Accept-Encoding') if scope == 'public' else ('Accept', 'Accept-Encoding', 'Authorization', 'Cookie')
+
         @functools.wraps(view_func)
         def wrapper(request, *args, **kwargs):
             # تجاهل الكاش للطلبات غير GET
@@ -48,61 +98,57 @@ def cache_api_response(timeout=1800):
             
             # إنشاء مفتاح كاش
             cache_key_data = {
-                'view': view_func.__name__,
                 'args': args,
                 'kwargs': kwargs,
-                'query_params': dict(request.GET),
-                'user_id': getattr(request.user, 'id', None)
+                'query_params': sorted(request.GET.lists()),
+                'accept': request.META.get('HTTP_ACCEPT', ''),
+                'scope': 'public' if scope == 'public' else auth_scope(request),
             }
             
-            cached_response = ViewCache.get_cached_view_response(
-                view_func.__name__, 
-                cache_key_data
-            )
-            
-            if cached_response:
-                return JsonResponse(cached_response)
+            entry = ViewCache.get_cached_view_response(view_name, cache_key_data, tags=view_tags)
+            if entry is not None:
+                return cached_response(entry, request)
             
-            # تنفيذ View وحفظ النتيجة
+            # تنفيذ View وحفظ الاستجابة بعد التصيير
             response = view_func(request, *args, **kwargs)
+            if hasattr(response, 'render') and not response.is_rendered:
+                response.render()
+            patch_vary_headers(response, vary)
             
-            if hasattr(response, 'data') and response.status_code == 200:
-                ViewCache.cache_view_response(
-                    view_func.__name__,
-                    cache_key_data,
-                    response.data,
-                    timeout
-                )
-            
+            cacheable = (
+                response.status_code == 200
+                and not response.streaming
+                and not response.has_header('Content-Encoding')
+                and not response.cookies
+                and 'no-store' not in response.get('Cache-Control', '')
+                and 'private' not in response.get('Cache-Control', '')
+            )
+            if cacheable:
+                ViewCache.cache_view_response(view_name, cache_key_data, {
+                    'status': response.status_code,
+                    'headers': [
+                        (header, value) for header, value in response.items()
+                        if header.lower() not in UNCACHED_HEADERS
+                    ],
+                    'body': gzip.compress(response.content, compresslevel=6),
+                }, timeout, tags=view_tags)
+            response['X-Cache'] = 'MISS'
             return response
-        
+
+        wrapper.invalidate = lambda: advanced_cache.invalidate_tags(view_tag)
         return wrapper
     return decorator
 
 def monitor_query_performance(func):
-    """مراقبة أداء الاستعلامات"""
+    """قياس استعلامات SQL التي تنفذها الدالة بمراقب الاستعلامات
+
+    المراقب مسجل على كل الاتصالات افتراضياً (SQL_MONITOR_ENABLED)، والديكوريتر
+    يسجله على الاتصال أثناء الدالة فقط إذا كان معطلاً.
+    """
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        start_time = time.time()
-        
-        try:
-            result = func(*args, **kwargs)
-            execution_time = time.time() - start_time
-            
-            # تسجيل الأداء إذا كان بطيئاً
-            if execution_time > 0.1:  # أكثر من 100ms
-                QueryPerformance.objects.create(
-                    query_hash=hashlib.md5(str(func).encode()).hexdigest(),
-                    query_sql=str(func.__name__),
-                    execution_time=execution_time,
-                    table_name=getattr(func, '__qualname__', 'unknown')
-                )
-            
-            return result
-            
-        except Exception as e:
-            logger.error(f"Query performance monitoring error: {e}")
-            raise
+        with query_monitor.capture():
+            return func(*args, **kwargs)
     
     return wrapper
 
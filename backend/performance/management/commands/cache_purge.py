@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from performance.cache import advanced_cache
+
+class Command(BaseCommand):
+    help = 'حذف مفاتيح الكاش المطابقة لنمط (SCAN على دفعات بدون إيقاف Redis)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('pattern', help='نمط المفاتيح مثل queryset:*')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='عدد المفاتيح في كل دفعة SCAN/UNLINK',
+        )
+
+    def handle(self, *args, **options):
+        deleted = advanced_cache.invalidate_pattern(options['pattern'], batch_size=options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'تم حذف {deleted} مفتاح')
+        )
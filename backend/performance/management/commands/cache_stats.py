@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from performance.cache import advanced_cache
+
+class Command(BaseCommand):
+    help = 'عرض نسب إصابة الكاش لكل مجموعة مفاتيح'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--flush',
+            action='store_true',
+            help='كتابة عدادات هذه العملية في CacheStats أولاً',
+        )
+
+    def handle(self, *args, **options):
+        if options['flush']:
+            advanced_cache.stats.flush()
+
+        rates = advanced_cache.hit_rates()
+        for prefix, stats in rates.items():
+            self.stdout.write(
+                f"{prefix}: {stats['hit_rate']}% ({stats['hits']} إصابة، {stats['misses']} إخفاق)"
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(f'تم عرض إحصائيات {len(rates)} مجموعة')
+        )
@@ -1,7 +1,7 @@
 from django.core.management.base import BaseCommand
-from django.core.cache import cache
-from items.models import Item, Category
-from accounts.models import User
+from items.models import Category
+from items.caching import build_categories, category_cache
+from items.stats import platform_stats, STATS_CACHE_KEY, STATS_CACHE_TIMEOUT
 from performance.cache import advanced_cache
 
 class Command(BaseCommand):
@@ -10,24 +10,16 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         self.stdout.write('بدء تسخين الكاش...')
         
-        # كاش الفئات
-        categories = list(Category.objects.filter(is_active=True))
-        advanced_cache.set('active_categories', categories, 3600)
-        self.stdout.write(f'✓ تم كاش {len(categories)} فئة')
+        # كاش الفئات الذي تقرأ منه نقطة categories
+        category_cache.get_or_build('', build_categories)
+        self.stdout.write(f'✓ تم كاش {Category.objects.filter(is_active=True).count()} فئة')
         
-        # كاش العناصر المميزة
-        featured_items = list(Item.objects.filter(is_featured=True, status='active')[:10])
-        advanced_cache.set('featured_items', featured_items, 1800)
-        self.stdout.write(f'✓ تم كاش {len(featured_items)} عنصر مميز')
+        # المنتجات المميزة تبنى عند أول طلب لأن روابط الصور تعتمد على عنوان الطلب
         
-        # كاش الإحصائيات
-        stats = {
-            'total_items': Item.objects.filter(status='active').count(),
-            'total_users': User.objects.filter(is_active=True).count(),
-            'completed_deals': Item.objects.filter(status='sold').count(),
-        }
-        advanced_cache.set('platform_stats', stats, 3600)
-        self.stdout.write('✓ تم كاش الإحصائيات')
+        # إعادة حساب صف الإحصائيات الذي تقرأ منه نقطة stats
+        platform_stats.reconcile()
+        advanced_cache.compute(STATS_CACHE_KEY, platform_stats.as_dict, STATS_CACHE_TIMEOUT)
+        self.stdout.write('✓ تم تحديث الإحصائيات')
         
         self.stdout.write(
             self.style.SUCCESS('تم تسخين الكاش بنجاح')
@@ -0,0 +1,218 @@
+import atexit
+import bisect
+import glob
+import json
+import os
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, Optional, Tuple
+from django.conf import settings
+from .cache import BackgroundFlusher
+import logging
+
+logger = logging.getLogger('performance')
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# (النوع، الوصف) لكل مقياس يصدر
+METRICS = {
+    'http_request_duration_seconds': ('histogram', 'HTTP request latency by route'),
+    'http_requests_in_progress': ('gauge', 'HTTP requests currently being served by route'),
+    'http_response_size_bytes': ('summary', 'HTTP response body size on the wire (after compression) by route'),
+    'http_request_db_seconds': ('summary', 'Time spent in SQL queries per request by route'),
+    'http_request_cache_seconds': ('summary', 'Time spent in shared cache calls per request by route'),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    escaped = (
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class MetricsRegistry(BackgroundFlusher):
+    """مقاييس HTTP بصيغة Prometheus مجمعة في ذاكرة كل عملية
+
+    كل عامل (gunicorn worker) يجمع في ذاكرته ويكتب لقطة تراكمية في ملف باسم
+    رقم العملية ووقت بدئها داخل directory كل flush_interval ثوانٍ وعند الإغلاق
+    (كتابة ذرية بـ os.replace)، فعامل جديد أعيد له رقم عامل منتهٍ لا يكتب فوق عداداته.
+    نقطة /metrics تجمع ملفات كل العمليات مع حالة العملية الحالية، والعدادات
+    تبقى بعد انتهاء العامل بينما المقاييس اللحظية (gauge) تؤخذ من العمليات الحية فقط.
+    المجلد يفرغ عند بدء التشغيل (docker-entrypoint.sh) كما في PROMETHEUS_MULTIPROC_DIR.
+    """
+
+    thread_name = 'metrics-writer'
+
+    def __init__(self, directory: str, flush_interval: float = 5, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(flush_interval)
+        self.directory = directory
+        self.buckets = tuple(sorted(buckets))
+        # {(اسم، وسوم): [عدد كل خانة غير تراكمي..., +Inf، المجموع]}
+        self._histograms: Dict[Tuple[str, Labels], list] = {}
+        # {(اسم، وسوم): [المجموع، العدد]}
+        self._summaries: Dict[Tuple[str, Labels], list] = defaultdict(lambda: [0.0, 0])
+        self._gauges: Dict[Tuple[str, Labels], float] = defaultdict(float)
+        # (رقم العملية، وقت البدء بالميلي ثانية) يحدد من جديد بعد fork
+        self._process = (None, 0)
+
+    def observe(self, name: str, labels: Labels, value: float):
+        """إضافة قيمة لمدرج تكراري"""
+        with self._lock:
+            counts = self._histograms.get((name, labels))
+            if counts is None:
+                counts = self._histograms[(name, labels)] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            counts[-1] += value
+        self._ensure_flusher()
+
+    def summarize(self, name: str, labels: Labels, value: float):
+        """إضافة قيمة لملخص (مجموع وعدد)"""
+        with self._lock:
+            summary = self._summaries[(name, labels)]
+            summary[0] += value
+            summary[1] += 1
+        self._ensure_flusher()
+
+    def gauge_inc(self, name: str, labels: Labels, amount: float = 1):
+        with self._lock:
+            self._gauges[(name, labels)] += amount
+
+    def snapshot(self) -> Dict:
+        """الحالة التراكمية للعملية بصيغة قابلة للكتابة JSON"""
+        with self._lock:
+            return {
+                'buckets': list(self.buckets),
+                'histograms': [[name, list(labels), list(counts)] for (name, labels), counts in self._histograms.items()],
+                'summaries': [[name, list(labels), list(values)] for (name, labels), values in self._summaries.items()],
+                'gauges': [[name, list(labels), value] for (name, labels), value in self._gauges.items()],
+            }
+
+    def process_id(self) -> str:
+        """رقم العملية مع وقت بدئها لتمييز العمليات التي تعيد استخدام نفس الرقم"""
+        pid = os.getpid()
+        if self._process[0] != pid:
+            self._process = (pid, int(time.time() * 1000))
+        return f"{pid}-{self._process[1]}"
+
+    def path(self, process_id: Optional[str] = None) -> str:
+        return os.path.join(self.directory, f"metrics-{process_id or self.process_id()}.json")
+
+    @staticmethod
+    def parse_path(path: str) -> Tuple[int, int]:
+        """(رقم العملية، وقت البدء) من اسم ملف اللقطة"""
+        pid, _, started = os.path.basename(path)[len('metrics-'):-len('.json')].partition('-')
+        return int(pid), int(started or 0)
+
+    def flush(self) -> int:
+        """كتابة لقطة العملية في ملفها"""
+        snapshot = self.snapshot()
+        path = self.path()
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            temporary = f"{path}.tmp"
+            with open(temporary, 'w') as handle:
+                json.dump(snapshot, handle)
+            os.replace(temporary, path)
+        except OSError as e:
+            logger.error(f"Metrics write error: {e}")
+            return 0
+        return len(snapshot['histograms']) + len(snapshot['summaries'])
+
+    def collect(self) -> Dict:
+        """دمج لقطات كل العمليات مع حالة هذه العملية"""
+        own_path = self.path()
+        snapshots = [((os.getpid(), self._process[1]), self.snapshot())]
+        for path in glob.glob(os.path.join(self.directory, 'metrics-*.json')):
+            if path == own_path:
+                continue
+            try:
+                process = self.parse_path(path)
+                with open(path) as handle:
+                    snapshots.append((process, json.load(handle)))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Metrics read error {path}: {e}")
+
+        # الملف الأحدث لكل رقم عملية هو الوحيد الذي قد يخص عملية حية
+        latest = {}
+        for (pid, started), _ in snapshots:
+            latest[pid] = max(latest.get(pid, started), started)
+
+        histograms, summaries, gauges = {}, defaultdict(lambda: [0.0, 0]), defaultdict(float)
+        for (pid, started), snapshot in snapshots:
+            if snapshot.get('buckets') != list(self.buckets):
+                continue
+            for name, labels, counts in snapshot['histograms']:
+                key = (name, tuple(map(tuple, labels)))
+                merged = histograms.setdefault(key, [0] * len(counts))
+                for index, count in enumerate(counts):
+                    merged[index] += count
+            for name, labels, (total, count) in snapshot['summaries']:
+                summary = summaries[(name, tuple(map(tuple, labels)))]
+                summary[0] += total
+                summary[1] += count
+            if started == latest[pid] and (pid == os.getpid() or pid_alive(pid)):
+                for name, labels, value in snapshot['gauges']:
+                    gauges[(name, tuple(map(tuple, labels)))] += value
+        return {'histograms': histograms, 'summaries': summaries, 'gauges': gauges}
+
+    def render(self) -> str:
+        """المقاييس بصيغة Prometheus النصية (0.0.4)"""
+        collected = self.collect()
+        series = defaultdict(list)
+        for (name, labels), counts in sorted(collected['histograms'].items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                series[name].append(f"{name}_bucket{format_labels(labels + (('le', format_value(bound)),))} {cumulative}")
+            series[name].append(f"{name}_sum{format_labels(labels)} {format_value(counts[-1])}")
+            series[name].append(f"{name}_count{format_labels(labels)} {cumulative}")
+        for (name, labels), (total, count) in sorted(collected['summaries'].items()):
+            series[name].append(f"{name}_sum{format_labels(labels)} {format_value(total)}")
+            series[name].append(f"{name}_count{format_labels(labels)} {count}")
+        for (name, labels), value in sorted(collected['gauges'].items()):
+            series[name].append(f"{name}{format_labels(labels)} {format_value(value)}")
+
+        lines = []
+        for name, (kind, description) in METRICS.items():
+            if name in series:
+                lines.append(f"# HELP {name} {description}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.extend(series[name])
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        """تصفير مقاييس هذه العملية (للاختبارات)"""
+        with self._lock:
+            self._histograms.clear()
+            self._summaries.clear()
+            self._gauges.clear()
+
+
+# إنشاء instance عام
+metrics = MetricsRegistry(
+    directory=getattr(settings, 'METRICS_DIR', None) or os.path.join(tempfile.gettempdir(), 'greenswap-metrics'),
+    flush_interval=getattr(settings, 'METRICS_FLUSH_INTERVAL', 5),
+    buckets=getattr(settings, 'METRICS_BUCKETS', DEFAULT_BUCKETS),
+)
+atexit.register(metrics.flush)
@@ -1,17 +1,72 @@
+import hashlib
 import time
+import zlib
 import logging
+from typing import Optional
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
 from django.utils.deprecation import MiddlewareMixin
 from django.core.cache import cache
 from django.http import HttpResponse
-from .models import QueryPerformance
+from . import timing
+from .cache import LocalLRU
+from .metrics import metrics
+
+try:
+    import brotli
+except ImportError:  # br غير متاح، يستخدم zstd أو gzip
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # zstd غير متاح
+    zstandard = None
 
 logger = logging.getLogger('performance')
 
+# الترميزات المتاحة بترتيب تفضيل الخادم عند تساوي q
+ENCODINGS = [
+    encoding for encoding, module in (('br', brotli), ('zstd', zstandard), ('gzip', zlib))
+    if module is not None
+]
+# مستويات الضغط (صغير، متوسط، كبير أو بث) لكل ترميز
+LEVELS = {'br': (5, 4, 1), 'zstd': (6, 3, 1), 'gzip': (6, 4, 1)}
+COMPRESSIBLE_TYPES = {
+    'application/json', 'application/javascript', 'application/xml', 'application/x-ndjson',
+    'application/jsonl', 'application/manifest+json', 'image/svg+xml',
+}
+
+# النسخ المضغوطة للاستجابات المتكررة في ذاكرة العملية
+compressed_variants = LocalLRU(getattr(settings, 'COMPRESSION_CACHE_MAX_BYTES', 8 * 1024 * 1024))
+
+# طرق HTTP المعروفة، والباقي يسجل كـ other حتى لا تتضخم السلاسل
+HTTP_METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+
+def route_label(request) -> str:
+    """نمط المسار المطابق (وليس المسار الفعلي) لوسم المقاييس"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None or not match.route:
+        return 'unmatched'
+    return '/' + match.route
+
+
 class PerformanceMiddleware(MiddlewareMixin):
-    """مراقبة أداء الطلبات"""
+    """مراقبة أداء الطلبات
+
+    يسجل لكل نمط مسار مدرج زمن الاستجابة وعدد الطلبات الجارية وحجم الجسم
+    وزمن SQL والكاش المشترك داخل الطلب في سجل المقاييس (/metrics).
+    يقع قبل CompressionMiddleware فالزمن يشمل الضغط والحجم هو المرسل فعلاً (بعد الضغط).
+    """
     
     def process_request(self, request):
         request._performance_start_time = time.time()
+        timing.start()
+        return None
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._performance_route = route_label(request)
+        metrics.gauge_inc('http_requests_in_progress', (('route', request._performance_route),), 1)
         return None
     
     def process_response(self, request, response):
@@ -27,28 +82,189 @@ class PerformanceMiddleware(MiddlewareMixin):
             
             # إضافة header للأداء
             response['X-Response-Time'] = f"{duration:.3f}s"
+            self.record(request, response, duration)
         
         return response
 
+    def record(self, request, response, duration: float):
+        route = getattr(request, '_performance_route', None)
+        if route is not None:
+            metrics.gauge_inc('http_requests_in_progress', (('route', route),), -1)
+        else:
+            route = route_label(request)
+        method = request.method if request.method in HTTP_METHODS else 'other'
+        labels = (('method', method), ('route', route), ('status', str(response.status_code)))
+        metrics.observe('http_request_duration_seconds', labels, duration)
+
+        route_labels = (('route', route),)
+        # الحجم المرسل على الشبكة: الجسم مضغوط إذا قبل العميل الضغط
+        if not response.streaming:
+            metrics.summarize('http_response_size_bytes', route_labels, len(response.content))
+        timers = timing.stop()
+        metrics.summarize('http_request_db_seconds', route_labels, timers.get('db', 0.0))
+        metrics.summarize('http_request_cache_seconds', route_labels, timers.get('cache', 0.0))
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """أفضل ترميز متاح حسب q في Accept-Encoding ثم ترتيب تفضيل الخادم"""
+    weights = {}
+    for part in accept_encoding.lower().split(','):
+        name, _, params = part.partition(';')
+        name = name.strip()
+        weight = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        if name:
+            weights[name] = weight
+    wildcard = weights.get('*', 0.0)
+    best, best_weight = None, 0.0
+    for encoding in ENCODINGS:
+        weight = weights.get(encoding, wildcard)
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def compressible(content_type: str) -> bool:
+    """أنواع المحتوى النصية فقط؛ الصور والأرشيفات مضغوطة أصلاً"""
+    content_type = content_type.split(';')[0].strip().lower()
+    return content_type.startswith('text/') or content_type in COMPRESSIBLE_TYPES or content_type.endswith(('+json', '+xml'))
+
+
+def compression_level(encoding: str, size: Optional[int]) -> int:
+    """مستوى الضغط حسب الحجم: أعلى للصغير وأسرع للكبير والبث (حجم غير معروف)"""
+    high, medium, low = LEVELS[encoding]
+    if size is None or size >= 1024 * 1024:
+        return low
+    return high if size < 64 * 1024 else medium
+
+
+class StreamCompressor:
+    """ضغط تدريجي بـ gzip أو brotli أو zstd، كل دفعة تخرج فوراً حتى لا يتأخر البث"""
+
+    def __init__(self, encoding: str, level: int):
+        self.encoding = encoding
+        if encoding == 'gzip':
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        elif encoding == 'br':
+            self._compressor = brotli.Compressor(quality=level)
+        else:
+            self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes, flush: bool = True) -> bytes:
+        if self.encoding == 'br':
+            output = self._compressor.process(data)
+            return output + self._compressor.flush() if flush else output
+        output = self._compressor.compress(data)
+        if not flush:
+            return output
+        if self.encoding == 'gzip':
+            return output + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        return output + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        if self.encoding == 'br':
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+    @classmethod
+    def compress_body(cls, encoding: str, level: int, body: bytes) -> bytes:
+        compressor = cls(encoding, level)
+        return compressor.compress(body, flush=False) + compressor.finish()
+
+    @classmethod
+    def compress_stream(cls, encoding: str, level: int, chunks):
+        compressor = cls(encoding, level)
+        for chunk in chunks:
+            if chunk:
+                yield compressor.compress(chunk)
+        yield compressor.finish()
+
+    @classmethod
+    async def compress_async_stream(cls, encoding: str, level: int, chunks):
+        compressor = cls(encoding, level)
+        async for chunk in chunks:
+            if chunk:
+                yield compressor.compress(chunk)
+        yield compressor.finish()
+
+
 class CompressionMiddleware(MiddlewareMixin):
-    """ضغط الاستجابات"""
-    
+    """ضغط الاستجابات بالترميز المتفق عليه مع العميل (brotli/zstd/gzip)
+
+    الاستجابات العادية تضغط مرة واحدة لكل جسم: النسخ المضغوطة للاستجابات
+    القابلة للكاش تحفظ في ذاكرة العملية ببصمة الجسم. استجابات البث تضغط
+    دفعة بدفعة بدون تجميعها في الذاكرة.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+        self.cache_timeout = getattr(settings, 'COMPRESSION_CACHE_TIMEOUT', 300)
+        self.variants = compressed_variants
+
     def process_response(self, request, response):
-        # تطبيق ضغط للاستجابات الكبيرة
-        if (hasattr(response, 'content') and 
-            len(response.content) > 1024 and  # أكبر من 1KB
-            'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')):
-            
-            import gzip
-            compressed_content = gzip.compress(response.content)
-            
-            if len(compressed_content) < len(response.content):
-                response.content = compressed_content
-                response['Content-Encoding'] = 'gzip'
-                response['Content-Length'] = str(len(compressed_content))
-        
+        if (response.has_header('Content-Encoding')
+                or response.status_code == 206
+                or 'no-transform' in response.get('Cache-Control', '')
+                or not compressible(response.get('Content-Type', ''))):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = negotiate_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            level = compression_level(encoding, None)
+            if getattr(response, 'is_async', False):
+                response.streaming_content = StreamCompressor.compress_async_stream(
+                    encoding, level, response.streaming_content
+                )
+            else:
+                response.streaming_content = StreamCompressor.compress_stream(
+                    encoding, level, response.streaming_content
+                )
+            del response['Content-Length']
+        else:
+            content = response.content
+            if len(content) < self.min_size:
+                return response
+            compressed = self.compress(request, response, encoding, content)
+            if len(compressed) >= len(content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        # الجسم تغير فلا يبقى ETag قوياً
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
         return response
 
+    def compress(self, request, response, encoding: str, content: bytes) -> bytes:
+        """ضغط الجسم، أو النسخة المحفوظة لنفس الجسم إذا كانت الاستجابة قابلة للكاش"""
+        level = compression_level(encoding, len(content))
+        cache_control = response.get('Cache-Control', '')
+        cacheable = (
+            request.method in ('GET', 'HEAD') and response.status_code == 200 and not response.cookies
+            and 'private' not in cache_control and 'no-store' not in cache_control
+        )
+        if not cacheable:
+            return StreamCompressor.compress_body(encoding, level, content)
+
+        key = f"{encoding}:{level}:{hashlib.blake2b(content, digest_size=16).hexdigest()}"
+        compressed = self.variants.get(key)
+        if compressed is None:
+            compressed = StreamCompressor.compress_body(encoding, level, content)
+            self.variants.set(key, compressed, self.cache_timeout)
+        return compressed
+
 class CacheControlMiddleware(MiddlewareMixin):
     """إدارة cache headers"""
     
@@ -58,8 +274,8 @@ class CacheControlMiddleware(MiddlewareMixin):
             response['Cache-Control'] = 'public, max-age=31536000'  # سنة واحدة
             response['Expires'] = 'Thu, 31 Dec 2025 23:59:59 GMT'
         
-        # إعداد cache headers للـ API
-        elif request.path.startswith('/api/'):
+        # إعداد cache headers للـ API (مع احترام ما تحدده الـ View مثل no-cache مع ETag)
+        elif request.path.startswith('/api/') and not response.has_header('Cache-Control'):
             if request.method == 'GET':
                 response['Cache-Control'] = 'public, max-age=300'  # 5 دقائق
             else:
@@ -21,11 +21,19 @@ class CacheStats(models.Model):
         return f"{self.key} - Hit Rate: {self.hit_rate:.2f}%"
 
 class QueryPerformance(models.Model):
-    """مراقبة أداء الاستعلامات"""
+    """مراقبة أداء الاستعلامات (صف لكل بصمة استعلام في كل فترة كتابة)"""
+    # بصمة الاستعلام بدون القيم ونصه الموحد
     query_hash = models.CharField(max_length=64, db_index=True)
     query_sql = models.TextField()
+    # أبطأ تنفيذ في الفترة
     execution_time = models.FloatField()
     table_name = models.CharField(max_length=100, db_index=True)
+    calls = models.PositiveIntegerField(default=1)
+    total_time = models.FloatField(default=0)
+    p50 = models.FloatField(default=0)
+    p99 = models.FloatField(default=0)
+    # خطة EXPLAIN لأبطأ SELECT تجاوز الحد
+    explain_plan = models.TextField(blank=True)
     timestamp = models.DateTimeField(auto_now_add=True, db_index=True)
     
     class Meta:
@@ -0,0 +1,265 @@
+import atexit
+import hashlib
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from . import timing
+from .cache import BackgroundFlusher
+import logging
+
+logger = logging.getLogger('performance')
+
+# عدد الأزمنة المحفوظة لكل بصمة لحساب المئينات (عينة عشوائية منتظمة)
+RESERVOIR_SIZE = 512
+# أقصى عدد استعلامات خام محفوظة بصماتها في الذاكرة
+FINGERPRINT_CACHE_SIZE = 4096
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w\"$])-?\d+(?:\.\d+)?(?:e[+-]?\d+)?\b", re.IGNORECASE)
+_PLACEHOLDER = re.compile(r"%s|\$\d+|\?")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_VALUES_LIST = re.compile(r"\bVALUES\s*(\([^()]*\))(?:\s*,\s*\([^()]*\))+", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+_TABLE = re.compile(r"\b(?:FROM|INTO|UPDATE)\s+[\"`]?([\w.]+)", re.IGNORECASE)
+
+
+def normalize_sql(sql: str) -> str:
+    """نص الاستعلام بدون القيم: النصوص والأرقام والمعاملات ? وقوائم IN وصفوف VALUES مختصرة"""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    sql = _VALUES_LIST.sub(r'VALUES \1, ...', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+class QueryStats:
+    """مجاميع بصمة واحدة في فترة الكتابة الحالية"""
+
+    __slots__ = ('sql', 'table', 'calls', 'total', 'max', 'samples', 'slowest', 'alias')
+
+    def __init__(self, sql: str, table: str):
+        self.sql = sql
+        self.table = table
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = []
+        # (الزمن، الاستعلام الخام، المعاملات) لأبطأ SELECT لتحليل خطته عند الكتابة
+        self.slowest = None
+        self.alias = DEFAULT_DB_ALIAS
+
+    def add(self, duration: float):
+        self.calls += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+        if len(self.samples) < RESERVOIR_SIZE:
+            self.samples.append(duration)
+        else:
+            index = random.randrange(self.calls)
+            if index < RESERVOIR_SIZE:
+                self.samples[index] = duration
+
+    def merge(self, other: 'QueryStats'):
+        """دمج مجاميع فترة سابقة لم تكتب بعد"""
+        self.calls += other.calls
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        self.samples.extend(other.samples)
+        if len(self.samples) > RESERVOIR_SIZE:
+            self.samples = random.sample(self.samples, RESERVOIR_SIZE)
+        if other.slowest is not None and (self.slowest is None or other.slowest[0] > self.slowest[0]):
+            self.slowest, self.alias = other.slowest, other.alias
+
+    def percentile(self, q: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class QueryMonitor(BackgroundFlusher):
+    """قياس كل استعلام SQL عبر connection.execute_wrapper مجمعاً حسب البصمة
+
+    الاستعلامات تطبع ببصمة بدون القيم ويحفظ لكل بصمة العدد والمجموع وعينة
+    من الأزمنة في الذاكرة. خيط في الخلفية يكتب صفاً واحداً لكل بصمة في
+    QueryPerformance كل flush_interval ثانية، ويحلل خطة أبطأ استعلام SELECT
+    تجاوز slow_threshold قبل الكتابة (خارج مسار الطلب).
+    """
+
+    thread_name = 'query-monitor-flusher'
+
+    def __init__(self, flush_interval: float = 60, slow_threshold: float = 0.1, max_fingerprints: int = 200):
+        super().__init__(flush_interval)
+        self.slow_threshold = slow_threshold
+        self.max_fingerprints = max_fingerprints
+        self._stats: Dict[str, QueryStats] = {}
+        self._fingerprints: Dict[str, tuple] = {}
+        # استعلامات المراقب نفسه (الكتابة وEXPLAIN) لا تقاس
+        self._local = threading.local()
+
+    def fingerprint(self, sql: str) -> tuple:
+        """(بصمة، نص موحد، الجدول) للاستعلام مع حفظها لنفس النص الخام"""
+        cached = self._fingerprints.get(sql)
+        if cached is None:
+            normalized = normalize_sql(sql)
+            table = _TABLE.search(normalized)
+            cached = (
+                hashlib.md5(normalized.encode()).hexdigest(),
+                normalized,
+                table.group(1)[:100] if table else 'unknown',
+            )
+            if len(self._fingerprints) >= FINGERPRINT_CACHE_SIZE:
+                self._fingerprints.clear()
+            self._fingerprints[sql] = cached
+        return cached
+
+    def __call__(self, execute, sql, params, many, context):
+        if getattr(self._local, 'paused', False):
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            timing.add('db', duration)
+            self.record(sql, duration, params, many, context['connection'].alias)
+
+    def record(self, sql: str, duration: float, params=None, many: bool = False, alias: str = DEFAULT_DB_ALIAS):
+        query_hash, normalized, table = self.fingerprint(sql)
+        with self._lock:
+            stats = self._stats.get(query_hash)
+            if stats is None:
+                stats = self._stats[query_hash] = QueryStats(normalized, table)
+            stats.add(duration)
+            if (duration >= self.slow_threshold and not many and normalized[:6].upper() == 'SELECT'
+                    and (stats.slowest is None or duration > stats.slowest[0])):
+                stats.slowest = (duration, sql, params)
+                stats.alias = alias
+        self._ensure_flusher()
+
+    @contextmanager
+    def paused(self):
+        previous = getattr(self._local, 'paused', False)
+        self._local.paused = True
+        try:
+            yield
+        finally:
+            self._local.paused = previous
+
+    def install(self, connection):
+        """تسجيل المراقب على اتصال (مرة واحدة لكل اتصال)"""
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+    @contextmanager
+    def capture(self, using: str = DEFAULT_DB_ALIAS):
+        """قياس الاستعلامات داخل الكتلة إن لم يكن المراقب مسجلاً على الاتصال"""
+        connection = connections[using]
+        if self in connection.execute_wrappers:
+            yield
+        else:
+            with connection.execute_wrapper(self):
+                yield
+
+    def pending(self) -> Dict[str, Dict]:
+        """مجاميع البصمات التي لم تكتب بعد"""
+        with self._lock:
+            return {
+                query_hash: {
+                    'sql': stats.sql, 'table': stats.table, 'calls': stats.calls, 'total_time': stats.total,
+                    'p50': stats.percentile(0.5), 'p99': stats.percentile(0.99), 'max_time': stats.max,
+                }
+                for query_hash, stats in self._stats.items()
+            }
+
+    def explain(self, stats: QueryStats) -> str:
+        """خطة تنفيذ أبطأ استعلام في البصمة (بدون تنفيذه فعلياً)"""
+        if stats.slowest is None:
+            return ''
+        _, sql, params = stats.slowest
+        connection = connections[stats.alias]
+        try:
+            with transaction.atomic(using=stats.alias), connection.cursor() as cursor:
+                cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}", params)
+                return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+        except Exception as e:
+            logger.warning(f"Query explain error: {e}")
+            return ''
+
+    def flush(self) -> int:
+        """كتابة صف لكل بصمة (الأعلى في الزمن الكلي) في QueryPerformance"""
+        from .models import QueryPerformance
+
+        with self._lock:
+            stats, self._stats = self._stats, {}
+        if not stats:
+            return 0
+        ranked = sorted(stats.items(), key=lambda pair: pair[1].total, reverse=True)
+        ranked, remainder = ranked[:self.max_fingerprints], ranked[self.max_fingerprints:]
+        if remainder:
+            # الباقي يكتب في المرات التالية بدلاً من إسقاطه
+            logger.warning(
+                f"Query stats flush capped at {self.max_fingerprints} fingerprints, "
+                f"{len(remainder)} kept for the next flush"
+            )
+            self.restore(remainder)
+        with self.paused():
+            rows = [
+                QueryPerformance(
+                    query_hash=query_hash,
+                    query_sql=item.sql,
+                    table_name=item.table,
+                    execution_time=item.max,
+                    calls=item.calls,
+                    total_time=item.total,
+                    p50=item.percentile(0.5),
+                    p99=item.percentile(0.99),
+                    explain_plan=self.explain(item),
+                )
+                for query_hash, item in ranked
+            ]
+            try:
+                QueryPerformance.objects.bulk_create(rows)
+            except Exception as e:
+                logger.error(f"Query stats flush error: {e}")
+                self.restore(ranked)
+                return 0
+        return len(rows)
+
+    def drain(self) -> int:
+        """كتابة كل البصمات المعلقة على دفعات (عند إغلاق العملية)"""
+        total = 0
+        while True:
+            written = self.flush()
+            if not written:
+                return total
+            total += written
+
+    def restore(self, items):
+        """إعادة مجاميع [(بصمة، QueryStats)] لم تكتب إلى الذاكرة"""
+        with self._lock:
+            for query_hash, stats in items:
+                current = self._stats.get(query_hash)
+                if current is None:
+                    self._stats[query_hash] = stats
+                else:
+                    current.merge(stats)
+
+
+def install_query_monitor(sender=None, connection=None, **kwargs):
+    """مستقبل connection_created: تسجيل المراقب على كل اتصال جديد"""
+    query_monitor.install(connection)
+
+
+# إنشاء instance عام
+query_monitor = QueryMonitor(
+    flush_interval=getattr(settings, 'SQL_MONITOR_FLUSH_INTERVAL', 60),
+    slow_threshold=getattr(settings, 'SQL_SLOW_QUERY_THRESHOLD', 0.1),
+)
+atexit.register(query_monitor.drain)
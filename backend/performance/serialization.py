@@ -0,0 +1,138 @@
+import json
+from typing import Callable, Dict, List, Optional
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+try:
+    import orjson
+except ImportError:  # الترميز بمكتبة json القياسية
+    orjson = None
+
+# حقول DRF التي تحتاج تحويلاً للقيمة الخام من values()؛ الباقي يمرر كما هو
+_CONVERTED_FIELDS = (
+    serializers.DecimalField,
+    serializers.DateTimeField,
+    serializers.DateField,
+    serializers.TimeField,
+    serializers.DurationField,
+    serializers.FloatField,
+    serializers.UUIDField,
+)
+
+
+def dumps(data) -> bytes:
+    """ترميز JSON بنفس مخرجات JSONRenderer في DRF للبيانات البسيطة"""
+    if orjson is not None and api_settings.UNICODE_JSON and api_settings.COMPACT_JSON:
+        body = orjson.dumps(data)
+    else:
+        separators = (',', ':') if api_settings.COMPACT_JSON else (', ', ': ')
+        body = json.dumps(
+            data, ensure_ascii=not api_settings.UNICODE_JSON,
+            allow_nan=not api_settings.STRICT_JSON, separators=separators
+        ).encode()
+    # JSONRenderer يهرب فواصل الأسطر الخاصة بجافاسكريبت دائماً
+    return body.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+def accepts_fast_json(request) -> bool:
+    """الطلب يقبل JSON المضغوط (وليس الواجهة التفاعلية أو indent)"""
+    renderer = getattr(request, 'accepted_renderer', None)
+    media_type = getattr(request, 'accepted_media_type', '') or ''
+    return renderer is not None and renderer.format == 'json' and 'indent' not in media_type
+
+
+class PrerenderedResponse(Response):
+    """Response بمحتوى JSON مرمز مسبقاً بدلاً من المرور على JSONRenderer
+
+    data تبقى متاحة كما في Response العادية.
+    """
+
+    def __init__(self, data, body: bytes, **kwargs):
+        super().__init__(data, **kwargs)
+        self.body = body
+
+    @property
+    def rendered_content(self):
+        self['Content-Type'] = 'application/json'
+        return self.body
+
+
+class ValuesSerializer:
+    """تسلسل سريع للقراءة فقط من صفوف values()
+
+    خريطة الحقول تحسب مرة واحدة من ModelSerializer الأصلي (الترتيب، المصدر،
+    التحويل)، ثم يتحول كل صف إلى dict بدون إنشاء كائنات النماذج أو المرور على
+    حقول DRF. الحقول المحسوبة (SerializerMethodField) تعطى كدوال على الصف.
+    """
+
+    def __init__(self, serializer_class, context: Optional[Dict] = None, prefix: str = '',
+                 method_fields: Optional[Dict[str, Callable]] = None):
+        self.context = context or {}
+        method_fields = method_fields or {}
+        model = serializer_class.Meta.model
+        serializer = serializer_class(context=self.context)
+        self.plan = []
+
+        for name, field in serializer.fields.items():
+            key = f"{prefix}{field.source}"
+            if name in method_fields:
+                self.plan.append((name, None, method_fields[name], None))
+            elif isinstance(field, serializers.BaseSerializer):
+                nested = ValuesSerializer(type(field), self.context, prefix=f"{key}__")
+                self.plan.append((name, f"{key}__id", None, nested))
+            elif isinstance(field, serializers.SerializerMethodField):
+                raise ImproperlyConfigured(f"{serializer_class.__name__}.{name} needs a values method")
+            elif isinstance(field, serializers.FileField):
+                self.plan.append((name, key, self._file_converter(field, model._meta.get_field(field.source)), None))
+            elif isinstance(field, _CONVERTED_FIELDS):
+                self.plan.append((name, key, field.to_representation, None))
+            else:
+                self.plan.append((name, key, None, None))
+
+    def _file_converter(self, field, model_field):
+        """رابط الملف كما يعيده FileField في DRF من اسم الملف المخزن"""
+        storage = model_field.storage
+        use_url = getattr(field, 'use_url', api_settings.UPLOADED_FILES_USE_URL)
+        request = self.context.get('request')
+
+        def convert(name):
+            # FileField في DRF يعيد None للملف الفارغ
+            if not name:
+                return None
+            if not use_url:
+                return name
+            url = storage.url(name)
+            return request.build_absolute_uri(url) if request is not None else url
+        return convert
+
+    def value_fields(self) -> List[str]:
+        """الحقول المطلوبة في values()"""
+        fields = []
+        for name, key, method, nested in self.plan:
+            if nested is not None:
+                fields.append(key)
+                fields.extend(nested.value_fields())
+            elif key is not None:
+                fields.append(key)
+        # معرف الكائن المتداخل هو نفسه حقل id فيه
+        return list(dict.fromkeys(fields))
+
+    def to_representation(self, row: Dict) -> Dict:
+        data = {}
+        for name, key, converter, nested in self.plan:
+            if key is None:
+                data[name] = converter(row)
+                continue
+            value = row[key]
+            if value is None:
+                data[name] = None
+            elif nested is not None:
+                data[name] = nested.to_representation(row)
+            else:
+                data[name] = converter(value) if converter is not None else value
+        return data
+
+    def many(self, rows) -> List[Dict]:
+        return [self.to_representation(row) for row in rows]
@@ -0,0 +1,43 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+# أزمنة الطلب الحالي في كل خيط {نوع: ثوانٍ} (db، cache)
+_local = threading.local()
+
+
+def start():
+    """بداية قياس طلب جديد في هذا الخيط"""
+    _local.totals = {}
+    _local.active = set()
+
+
+def stop() -> Dict[str, float]:
+    """إنهاء القياس وإرجاع الأزمنة المتراكمة"""
+    totals = getattr(_local, 'totals', None) or {}
+    _local.totals = None
+    _local.active = None
+    return totals
+
+
+def add(kind: str, seconds: float):
+    totals = getattr(_local, 'totals', None)
+    if totals is not None:
+        totals[kind] = totals.get(kind, 0.0) + seconds
+
+
+@contextmanager
+def timed(kind: str):
+    """إضافة زمن الكتلة لنوعها (الكتل المتداخلة من نفس النوع تحسب مرة واحدة)"""
+    active = getattr(_local, 'active', None)
+    if active is None or kind in active:
+        yield
+        return
+    active.add(kind)
+    began = time.perf_counter()
+    try:
+        yield
+    finally:
+        active.discard(kind)
+        add(kind, time.perf_counter() - began)
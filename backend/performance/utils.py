@@ -1,17 +1,60 @@
 import os
-from PIL import Image, ImageOpt
+from io import BytesIO
+from PIL import Image, ImageOps
+from datetime import timedelta
 from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
-import boto3
-from botocore.exceptions import ClientError
+from django.utils import timezone
 import logging
 
+try:
+    import boto3
+    from botocore.exceptions import ClientError
+except ImportError:  # boto3 مطلوب فقط لـ CDNManager
+    boto3 = None
+    ClientError = Exception
+
 logger = logging.getLogger('performance')
 
 class ImageOptimizer:
     """محسن الصور"""
+
+    VARIANT_SIZES = (600, 300, 150)
     
+    @staticmethod
+    def render_variants(image_data: bytes, sizes=VARIANT_SIZES, quality=85, max_size=(1920, 1080)):
+        """فك الصورة مرة واحدة وإنتاج المصغرات ونسخة WebP
+
+        يصحح الاتجاه حسب EXIF ثم يعيد الحفظ بدون بيانات EXIF. المصغرات تشتق
+        من الأكبر إلى الأصغر لتقليل تكلفة إعادة التحجيم.
+        يعيد {'webp': bytes, '600': bytes, ...}
+        """
+        variants = {}
+        with Image.open(BytesIO(image_data)) as original:
+            img = ImageOps.exif_transpose(original)
+            if img.mode in ('LA', 'P'):
+                img = img.convert('RGBA')
+            elif img.mode not in ('RGB', 'RGBA'):
+                img = img.convert('RGB')
+
+            if img.width > max_size[0] or img.height > max_size[1]:
+                img.thumbnail(max_size, Image.Resampling.LANCZOS)
+            output = BytesIO()
+            img.save(output, 'WEBP', quality=quality, method=4)
+            variants['webp'] = output.getvalue()
+
+            # convert تعيد نسخة جديدة فلا تتأثر الصورة الأصلية
+            current = img.convert('RGB')
+            for size in sorted(sizes, reverse=True):
+                current.thumbnail((size, size), Image.Resampling.LANCZOS)
+                output = BytesIO()
+                current.save(output, 'JPEG', quality=quality, optimize=True, progressive=True)
+                variants[str(size)] = output.getvalue()
+
+        return variants
+
     @staticmethod
     def optimize_image(image_path, quality=85, max_width=1920, max_height=1080):
         """تحسين وضغط الصورة"""
@@ -63,6 +106,8 @@ class CDNManager:
     """إدارة CDN"""
     
     def __init__(self):
+        if boto3 is None:
+            raise ImproperlyConfigured('CDNManager requires boto3')
         self.s3_client = boto3.client(
             's3',
             aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
@@ -137,9 +182,18 @@ class DatabaseOptimizer:
         return queryset
     
     @staticmethod
-    def get_slow_queries():
-        """الحصول على الاستعلامات البطيئة"""
+    def get_slow_queries(hours=24, threshold=0.1, limit=20):
+        """بصمات الاستعلامات البطيئة مرتبة بالزمن الكلي (p99 لكل بصمة هو الأعلى بين الفترات)"""
+        from django.db.models import Max, Sum
         from .models import QueryPerformance
-        return QueryPerformance.objects.filter(
-            execution_time__gt=0.1
-        ).order_by('-execution_time')[:20]
+        return list(
+            QueryPerformance.objects.filter(timestamp__gte=timezone.now() - timedelta(hours=hours))
+            .values('query_hash', 'query_sql', 'table_name')
+            .annotate(
+                total_calls=Sum('calls'), total_seconds=Sum('total_time'),
+                max_p50=Max('p50'), max_p99=Max('p99'), max_time=Max('execution_time'),
+                plan=Max('explain_plan'),
+            )
+            .filter(max_p99__gt=threshold)
+            .order_by('-total_seconds')[:limit]
+        )
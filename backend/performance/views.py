@@ -0,0 +1,18 @@
+import hmac
+from django.conf import settings
+from django.http import HttpResponse
+from .metrics import metrics
+
+
+def metrics_view(request):
+    """المقاييس بصيغة Prometheus للعناوين المسموح لها أو برمز METRICS_TOKEN أو للمشرفين"""
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    allowed = (
+        request.META.get('REMOTE_ADDR') in getattr(settings, 'METRICS_ALLOWED_IPS', ['127.0.0.1'])
+        or (token and hmac.compare_digest(authorization, f"Bearer {token}"))
+        or (getattr(request, 'user', None) is not None and request.user.is_staff)
+    )
+    if not allowed:
+        return HttpResponse(status=403)
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,110 @@
+"""
+Advanced Cache Tests
+Testing the in-process tier, single-flight recomputation and early refresh
+"""
+import threading
+import time
+from unittest import mock
+from django.core.cache import cache
+from django.test import SimpleTestCase
+from performance.cache import AdvancedCache, CacheEntry, LocalLRU
+
+class LocalLRUTests(SimpleTestCase):
+    """Test the byte-bounded local tier"""
+
+    def test_evicts_least_recently_used(self):
+        """Test the oldest unused key is dropped when over the byte limit"""
+        lru = LocalLRU(max_bytes=250)
+        lru.set('a', 'x' * 100, 60)
+        lru.set('b', 'y' * 100, 60)
+        lru.get('a')
+        lru.set('c', 'z' * 100, 60)
+        self.assertIsNone(lru.get('b'))
+        self.assertEqual(lru.get('a'), 'x' * 100)
+        self.assertLessEqual(lru.size, 250)
+
+    def test_expiry(self):
+        """Test entries expire after their local timeout"""
+        lru = LocalLRU(max_bytes=1024)
+        lru.set('a', 1, 0.01)
+        time.sleep(0.02)
+        self.assertIsNone(lru.get('a'))
+        self.assertEqual(lru.size, 0)
+
+class AdvancedCacheTests(SimpleTestCase):
+    """Test get_or_set across tiers and concurrent callers"""
+
+    def setUp(self):
+        cache.clear()
+        self.cache = AdvancedCache()
+        self.calls = 0
+
+    def build(self, value='v', delay=0.0):
+        def builder():
+            self.calls += 1
+            time.sleep(delay)
+            return value
+        return builder
+
+    def test_tiers_and_counters(self):
+        """Test values are served locally, then from the shared cache"""
+        self.assertEqual(self.cache.get_or_set('k', self.build(), 60), 'v')
+        self.assertEqual(self.cache.get_or_set('k', self.build(), 60), 'v')
+        self.cache.local.clear()
+        self.assertEqual(self.cache.get('k'), 'v')
+        self.assertEqual(self.calls, 1)
+
+        stats = self.cache.tier_stats()
+        self.assertEqual(stats['local'], {'hits': 1, 'misses': 2})
+        self.assertEqual(stats['shared'], {'hits': 1, 'misses': 1})
+
+    def test_single_flight_threads(self):
+        """Test concurrent misses in one process compute once"""
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(self.cache.get_or_set('k', self.build(delay=0.05), 60)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ['v'] * 8)
+        self.assertEqual(self.calls, 1)
+
+    def test_waits_for_other_worker(self):
+        """Test a miss waits for the worker holding the shared lock"""
+        cache.add('lock:k', 'other', 30)
+        threading.Timer(0.1, lambda: cache.set('k', CacheEntry('theirs', 0.1, time.time() + 60), 60)).start()
+        self.assertEqual(self.cache.get_or_set('k', self.build(), 60), 'theirs')
+        self.assertEqual(self.calls, 0)
+
+    def test_early_refresh(self):
+        """Test XFetch recomputes near expiry and stale values are served while locked"""
+        cache.set('k', CacheEntry('old', 1.0, time.time() + 0.5), 60)
+        with mock.patch('performance.cache.random.random', return_value=0.9):
+            self.assertEqual(self.cache.get_or_set('k', self.build('new'), 60), 'new')
+        self.assertEqual(self.cache.tier_stats()['early_refreshes'], 1)
+
+        self.cache.local.clear()
+        cache.set('k', CacheEntry('old', 1.0, time.time() + 0.5), 60)
+        cache.add('lock:k', 'other', 30)
+        with mock.patch('performance.cache.random.random', return_value=0.9):
+            self.assertEqual(self.cache.get_or_set('k', self.build('new'), 60), 'old')
+
+        with mock.patch('performance.cache.random.random', return_value=0.0):
+            cache.set('j', CacheEntry('kept', 1.0, time.time() + 30), 60)
+            self.assertEqual(self.cache.get_or_set('j', self.build('new'), 60), 'kept')
+        self.assertEqual(self.calls, 1)
+
+    def test_background_refresh(self):
+        """Test registered keys are refreshed by the task instead of requests"""
+        self.cache.register_refresh('k', self.build('fresh'), 60, refresh_ahead=30)
+        cache.set('k', CacheEntry('old', 5.0, time.time() + 10), 60)
+        with mock.patch('performance.cache.random.random', return_value=0.9):
+            self.assertEqual(self.cache.get_or_set('k', self.build('inline'), 60), 'old')
+
+        self.assertEqual(self.cache.refresh_registered(), ['k'])
+        self.assertEqual(self.cache.refresh_registered(), [])
+        self.cache.local.clear()
+        self.assertEqual(self.cache.get_or_set('k', self.build('inline'), 60), 'fresh')
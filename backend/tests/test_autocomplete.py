@@ -0,0 +1,135 @@
+"""
+Autocomplete Tests
+Testing the prefix snapshot, incremental deltas and the autocomplete endpoint
+"""
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from items.autocomplete import AutocompleteIndex, Snapshot, autocomplete_index, key_prefixes
+from items.counters import item_counters
+from items.expiry import expire_due_items
+from items.models import Item, Category
+from django.utils import timezone
+
+User = get_user_model()
+
+class SnapshotTests(TestCase):
+    """Test prefix ranges and popularity ranking"""
+
+    def setUp(self):
+        self.snapshot = Snapshot({
+            'كرسي خشب': ['كرسي خشب', 'item', 5, None],
+            'كرتون': ['كرتون', 'item', 9, None],
+            'باب خشب قديم': ['باب خشب قديم', 'item', 2, None],
+            'wood pallets': ['Wood pallets', 'item', 4, None],
+        })
+
+    def texts(self, prefix, limit=10):
+        return [entry[0] for entry in self.snapshot.search(prefix, limit)]
+
+    def test_prefix_ranked_by_weight(self):
+        """Test precomputed short prefixes and scanned long prefixes agree"""
+        self.assertEqual(self.texts('كر'), ['كرتون', 'كرسي خشب'])
+        self.assertEqual(self.texts('كرس'), ['كرسي خشب'])
+        self.assertEqual(self.texts('كر', limit=1), ['كرتون'])
+
+    def test_word_starts(self):
+        """Test prefixes match any word of a suggestion"""
+        self.assertEqual(self.texts('خشب'), ['كرسي خشب', 'باب خشب قديم'])
+        self.assertEqual(self.texts('pal'), ['Wood pallets'])
+
+    def test_delta_prefixes(self):
+        """Test deltas are indexed under the one and two letter prefixes of each word"""
+        self.assertEqual(key_prefixes('باب خشب'), {'ب', 'با', 'خ', 'خش'})
+        self.assertEqual(key_prefixes('a b'), {'a', 'a ', 'b'})
+
+    def test_round_trip(self):
+        """Test the compressed snapshot restores the same index"""
+        restored = Snapshot.loads(self.snapshot.dumps())
+        self.assertEqual(restored.keys, self.snapshot.keys)
+
+class AutocompleteIndexTests(TestCase):
+    """Test suggestions follow item changes"""
+
+    def setUp(self):
+        cache.clear()
+        autocomplete_index.clear_local()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='seller', password='TestPass123!')
+        self.category = Category.objects.create(name='plastic', name_ar='بلاستيك')
+
+    def tearDown(self):
+        item_counters.flush()
+        autocomplete_index.clear_local()
+
+    def create(self, title, **kwargs):
+        return Item.objects.create(
+            title=title, description='وصف', category=self.category, user=self.user,
+            condition='good', quantity=1, unit='كيلو', location='القاهرة', status='active', **kwargs
+        )
+
+    def texts(self, prefix):
+        return [suggestion['text'] for suggestion in autocomplete_index.suggest(prefix)]
+
+    def test_categories(self):
+        """Test category names are suggested with their id"""
+        self.assertEqual(autocomplete_index.suggest('بلاس'), [
+            {'text': 'بلاستيك', 'type': 'category', 'id': self.category.id}
+        ])
+        self.assertEqual(autocomplete_index.suggest('PLA')[0]['text'], 'plastic')
+
+    def test_missing_snapshot_not_built_in_request(self):
+        """Test a cold start serves categories and pending deltas until the task compacts"""
+        self.create('بلاستيك شفاف')
+        self.assertEqual(self.texts('بلاس'), ['بلاستيك', 'بلاستيك شفاف'])
+        self.assertIsNone(cache.get(autocomplete_index.snapshot_key))
+
+    def test_item_changes_before_and_after_compaction(self):
+        """Test deltas are visible at once and survive compaction"""
+        autocomplete_index.snapshot()
+        self.create('زجاجات بلاستيك')
+        self.create('زُجاجات بلاستيك')
+        self.create('زجاج مكسور')
+        self.assertEqual(self.texts('زجاج'), ['زجاجات بلاستيك', 'زجاج مكسور'])
+
+        autocomplete_index.compact()
+        self.assertEqual(self.texts('زجاج'), ['زجاجات بلاستيك', 'زجاج مكسور'])
+        self.assertEqual(autocomplete_index.snapshot().entries['زجاجات بلاستيك'][2], 2)
+
+    def test_removed_items(self):
+        """Test sold and expired items drop out"""
+        item = self.create('حديد خردة')
+        self.create('حديد تسليح', expires_at=timezone.now())
+        autocomplete_index.compact()
+        item.status = 'sold'
+        item.save()
+        expire_due_items()
+        self.assertEqual(self.texts('حديد'), [])
+        autocomplete_index.compact(full=True)
+        self.assertEqual(self.texts('حديد'), [])
+
+    def test_shared_snapshot(self):
+        """Test another process loads the compacted snapshot from the cache"""
+        self.create('ورق كرتون')
+        autocomplete_index.compact()
+        other = AutocompleteIndex()
+        self.assertEqual([s['text'] for s in other.suggest('ورق')], ['ورق كرتون'])
+
+    def test_popular_queries(self):
+        """Test searches with results become suggestions after repeats"""
+        self.create('علب كانز')
+        url = reverse('search_items')
+        for _ in range(2):
+            self.client.get(url, {'q': 'علب'})
+        self.client.get(url, {'q': 'لا يوجد شيء'})
+        self.assertEqual(self.texts('عل'), ['علب كانز'])
+
+        self.client.get(url, {'q': 'علب'})
+        autocomplete_index.compact()
+        response = self.client.get(reverse('autocomplete'), {'q': 'عل'})
+        self.assertEqual(
+            [(s['text'], s['type']) for s in response.data['suggestions']],
+            [('علب', 'query'), ('علب كانز', 'item')]
+        )
@@ -0,0 +1,53 @@
+"""
+Cache Stats Tests
+Testing in-memory hit counters and their batched upsert into CacheStats
+"""
+from django.core.cache import cache
+from django.test import TestCase
+from performance.cache import AdvancedCache, CacheStatsCollector
+from performance.models import CacheStats
+
+class CacheStatsTests(TestCase):
+    """Test cache reads count in memory and flush in one statement"""
+
+    def setUp(self):
+        cache.clear()
+        self.cache = AdvancedCache()
+        # بدون خيط كتابة في الخلفية أثناء الاختبار
+        self.cache.stats = CacheStatsCollector(flush_interval=0)
+
+    def test_reads_do_no_db_work(self):
+        """Test hits and misses only touch in-memory counters"""
+        self.cache.set('queryset:a', 1)
+        self.cache.local.clear()
+        with self.assertNumQueries(0):
+            self.cache.get('queryset:a')
+            self.cache.get('queryset:b')
+            self.cache.get('view:c')
+        self.assertEqual(self.cache.stats.pending(), {'queryset': [1, 1], 'view': [0, 1]})
+
+    def test_flush_upserts_by_prefix(self):
+        """Test flushes add to existing rows in a single query"""
+        for key in ('queryset:a', 'queryset:b', 'view:c'):
+            self.cache.get(key)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.cache.stats.flush(), 2)
+
+        self.cache.set('queryset:a', 1)
+        self.cache.local.clear()
+        self.cache.get('queryset:a')
+        self.cache.stats.flush()
+        self.assertEqual(
+            dict((row.key, (row.hits, row.misses)) for row in CacheStats.objects.all()),
+            {'queryset': (1, 2), 'view': (0, 1)}
+        )
+        self.assertEqual(self.cache.stats.pending(), {})
+
+    def test_hit_rates_include_pending(self):
+        """Test hit rates combine stored and unflushed counts"""
+        self.cache.get('view:a')
+        self.cache.stats.flush()
+        self.cache.set('view:a', 1)
+        self.cache.local.clear()
+        self.cache.get('view:a')
+        self.assertEqual(self.cache.hit_rates(), {'view': {'hits': 1, 'misses': 1, 'hit_rate': 50.0}})
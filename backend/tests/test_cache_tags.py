@@ -0,0 +1,79 @@
+"""
+Cache Tag Tests
+Testing generation-tagged keys, model invalidation and the SCAN purge
+"""
+from unittest import mock
+from django.core.cache import cache
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from items.models import Item, Category
+from performance.cache import AdvancedCache, QueryCache, advanced_cache
+
+User = get_user_model()
+
+class TaggedKeyTests(TestCase):
+    """Test tag versions are embedded in keys and bumped in O(1)"""
+
+    def setUp(self):
+        cache.clear()
+        self.cache = AdvancedCache()
+
+    def test_invalidate_tags(self):
+        """Test bumping one tag hides only entries carrying it"""
+        self.cache.set('view:a', 1, tags=['items'])
+        self.cache.set('view:b', 2, tags=['items', 'users'])
+        self.cache.set('view:c', 3, tags=['users'])
+        self.cache.invalidate_tags('items')
+        self.assertIsNone(self.cache.get('view:a', tags=['items']))
+        self.assertIsNone(self.cache.get('view:b', tags=['users', 'items']))
+        self.assertEqual(self.cache.get('view:c', tags=['users']), 3)
+
+    def test_other_process_sees_bump(self):
+        """Test a bump reaches other processes once their local version expires"""
+        other = AdvancedCache()
+        self.cache.set('view:a', 1, tags=['items'])
+        self.assertEqual(other.get('view:a', tags=['items']), 1)
+        self.cache.invalidate_tags('items')
+        other.local.clear()
+        self.assertIsNone(other.get('view:a', tags=['items']))
+
+    def test_scan_purge(self):
+        """Test pattern purges use SCAN and UNLINK in batches, never KEYS"""
+        client = mock.Mock()
+        client.scan_iter.return_value = iter([b':1:queryset:a', b':1:queryset:b', b':1:queryset:c'])
+        client.unlink.side_effect = lambda *keys: len(keys)
+        self.cache.redis_client = client
+        self.assertEqual(self.cache.invalidate_pattern('queryset:*', batch_size=2), 3)
+        client.scan_iter.assert_called_once_with(match=':1:queryset:*', count=2)
+        self.assertEqual(client.unlink.call_count, 2)
+        client.keys.assert_not_called()
+
+class QueryCacheTests(TestCase):
+    """Test cached querysets are tagged with every model they read"""
+
+    def setUp(self):
+        cache.clear()
+        advanced_cache.clear_local()
+        user = User.objects.create_user(username='seller', password='TestPass123!')
+        self.category = Category.objects.create(name='paper', name_ar='ورق')
+        Item.objects.create(
+            title='كرتون', description='وصف', category=self.category, user=user,
+            condition='good', quantity=1, unit='كيلو', location='القاهرة', status='active',
+        )
+
+    def test_model_tags(self):
+        """Test joined models are part of the tags"""
+        queryset = Item.objects.select_related('category').filter(category__name='paper')
+        QueryCache.cache_queryset(queryset)
+        self.assertEqual(QueryCache.model_tags(queryset), ['model:items.Category', 'model:items.Item'])
+
+    def test_invalidate_model_cache(self):
+        """Test invalidating a joined model refreshes the cached result"""
+        queryset = Item.objects.filter(category__name='paper')
+        self.assertEqual(len(QueryCache.cache_queryset(queryset)), 1)
+        with self.assertNumQueries(0):
+            QueryCache.cache_queryset(Item.objects.filter(category__name='paper'))
+
+        Category.objects.filter(pk=self.category.pk).update(name='cardboard')
+        QueryCache.invalidate_model_cache(Category)
+        self.assertEqual(QueryCache.cache_queryset(Item.objects.filter(category__name='paper')), [])
@@ -0,0 +1,75 @@
+"""
+Read-Through Cache Tests
+Testing versioned caching of categories and featured items
+"""
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from items.models import Item, Category
+from items.caching import category_cache, featured_cache
+
+User = get_user_model()
+
+class ReadThroughCacheTests(TestCase):
+    """Test cache hits skip the database and saves invalidate"""
+
+    def setUp(self):
+        cache.clear()
+        category_cache.clear_local()
+        featured_cache.clear_local()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='seller', password='TestPass123!')
+        self.category = Category.objects.create(name='wood', name_ar='خشب')
+
+    def create_featured(self, title):
+        return Item.objects.create(
+            title=title,
+            description='خشب مستعمل',
+            category=self.category,
+            user=self.user,
+            condition='good',
+            quantity=1,
+            unit='قطعة',
+            location='دمياط',
+            status='active',
+            is_featured=True,
+        )
+
+    def test_categories_served_from_cache(self):
+        """Test repeat requests run no queries and saves invalidate"""
+        response = self.client.get(reverse('category_list'))
+        self.assertEqual(response.json()[0]['name_ar'], 'خشب')
+        with self.assertNumQueries(0):
+            self.client.get(reverse('category_list'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.name_ar = 'أخشاب'
+            self.category.save()
+        self.assertEqual(self.client.get(reverse('category_list')).json()[0]['name_ar'], 'أخشاب')
+
+    def test_shared_cache_survives_local_reset(self):
+        """Test another process reuses the shared copy"""
+        self.client.get(reverse('category_list'))
+        category_cache.clear_local()
+        with self.assertNumQueries(0):
+            self.client.get(reverse('category_list'))
+
+    def test_featured_invalidated_by_item_changes(self):
+        """Test featured items refresh after a featured item changes"""
+        with self.captureOnCommitCallbacks(execute=True):
+            item = self.create_featured('طاولة')
+        self.assertEqual([row['title'] for row in self.client.get(reverse('featured_items')).json()], ['طاولة'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            item.is_featured = False
+            item.save()
+        self.assertEqual(self.client.get(reverse('featured_items')).json(), [])
+
+    def test_bytes_match_drf_output(self):
+        """Test cached bytes equal the serializer rendering"""
+        from rest_framework.renderers import JSONRenderer
+        from items.serializers import CategorySerializer
+        body = self.client.get(reverse('category_list')).content
+        self.assertEqual(body, JSONRenderer().render(CategorySerializer(Category.objects.all(), many=True).data))
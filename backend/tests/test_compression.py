@@ -0,0 +1,104 @@
+"""
+Compression Middleware Tests
+Testing encoding negotiation, streaming compression and cached compressed variants
+"""
+import gzip
+import json
+import zlib
+from unittest import mock
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.test import SimpleTestCase, RequestFactory
+from performance import middleware
+from performance.middleware import (
+    CompressionMiddleware, StreamCompressor, compressed_variants, compression_level, negotiate_encoding,
+)
+
+BODY = {'results': [{'title': 'زجاجات بلاستيك', 'price': index} for index in range(200)]}
+
+class NegotiationTests(SimpleTestCase):
+    """Test Accept-Encoding parsing and level selection"""
+
+    def test_preference_and_weights(self):
+        """Test q-values win and ties follow the server preference"""
+        with mock.patch.object(middleware, 'ENCODINGS', ['br', 'zstd', 'gzip']):
+            self.assertEqual(negotiate_encoding('gzip, deflate, br, zstd'), 'br')
+            self.assertEqual(negotiate_encoding('br;q=0.5, gzip'), 'gzip')
+            self.assertEqual(negotiate_encoding('*'), 'br')
+            self.assertIsNone(negotiate_encoding('gzip;q=0, identity'))
+            self.assertIsNone(negotiate_encoding(''))
+        with mock.patch.object(middleware, 'ENCODINGS', ['gzip']):
+            self.assertEqual(negotiate_encoding('br, gzip;q=0.1'), 'gzip')
+
+    def test_level_by_size(self):
+        """Test small bodies get the higher level and streams the fastest"""
+        self.assertEqual(compression_level('gzip', 2000), 6)
+        self.assertEqual(compression_level('gzip', 200 * 1024), 4)
+        self.assertEqual(compression_level('gzip', None), 1)
+
+class CompressionMiddlewareTests(SimpleTestCase):
+    """Test which responses are compressed and how"""
+
+    def setUp(self):
+        compressed_variants.clear()
+        self.factory = RequestFactory()
+
+    def process(self, response, accept='gzip, deflate', method='get'):
+        request = getattr(self.factory, method)('/api/items/', HTTP_ACCEPT_ENCODING=accept)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_json_gzip(self):
+        """Test JSON bodies are gzipped with updated headers"""
+        response = JsonResponse(BODY)
+        original = response.content
+        response['ETag'] = '"abc"'
+        response = self.process(response)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), original)
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+        self.assertEqual(response['ETag'], 'W/"abc"')
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_skipped_responses(self):
+        """Test images, small bodies, encoded bodies and identity clients stay as-is"""
+        image = HttpResponse(b'\x89PNG' * 1000, content_type='image/png')
+        self.assertFalse(self.process(image).has_header('Content-Encoding'))
+        self.assertFalse(self.process(JsonResponse({'ok': True})).has_header('Content-Encoding'))
+        encoded = HttpResponse(gzip.compress(b'x' * 5000), content_type='application/json')
+        encoded['Content-Encoding'] = 'gzip'
+        self.assertEqual(gzip.decompress(self.process(encoded).content), b'x' * 5000)
+        plain = self.process(JsonResponse(BODY), accept='identity')
+        self.assertFalse(plain.has_header('Content-Encoding'))
+
+    def test_streaming_incremental(self):
+        """Test streamed chunks are compressed and flushed one by one"""
+        produced = []
+
+        def rows():
+            for index in range(3):
+                produced.append(index)
+                yield (json.dumps({'row': index}) + '\n').encode()
+
+        response = self.process(StreamingHttpResponse(rows(), content_type='application/x-ndjson'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertFalse(response.has_header('Content-Length'))
+        chunks = iter(response.streaming_content)
+        decompressor = zlib.decompressobj(31)
+        self.assertEqual(decompressor.decompress(next(chunks)), b'{"row": 0}\n')
+        self.assertEqual(produced, [0])
+        rest = b''.join(decompressor.decompress(chunk) for chunk in chunks)
+        self.assertEqual(rest.count(b'\n'), 2)
+        self.assertTrue(decompressor.eof)
+
+    def test_cacheable_bodies_compressed_once(self):
+        """Test repeated public bodies reuse the stored variant but private ones do not"""
+        with mock.patch.object(StreamCompressor, 'compress_body', wraps=StreamCompressor.compress_body) as spy:
+            first = self.process(JsonResponse(BODY))
+            second = self.process(JsonResponse(BODY))
+            self.assertEqual(spy.call_count, 1)
+            self.assertEqual(first.content, second.content)
+
+            for _ in range(2):
+                private = JsonResponse(BODY)
+                private['Cache-Control'] = 'private'
+                self.process(private)
+            self.assertEqual(spy.call_count, 3)
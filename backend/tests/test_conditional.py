@@ -0,0 +1,101 @@
+"""
+Conditional GET Tests
+Testing ETag/Last-Modified validators on item and category endpoints
+"""
+from unittest import mock
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from items.models import Item, Category, ItemImage
+from items.caching import category_cache
+from items.counters import item_counters
+
+User = get_user_model()
+
+class ConditionalGetTests(TestCase):
+    """Test 304 answers cost one cheap lookup and changes invalidate"""
+
+    def setUp(self):
+        cache.clear()
+        category_cache.clear_local()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='seller', password='TestPass123!')
+        self.category = Category.objects.create(name='electronics', name_ar='إلكترونيات')
+        self.item = Item.objects.create(
+            title='شاشة',
+            description='شاشة قديمة',
+            category=self.category,
+            user=self.user,
+            condition='fair',
+            quantity=1,
+            unit='قطعة',
+            location='أسيوط',
+            status='active',
+        )
+
+    def tearDown(self):
+        item_counters.flush()
+
+    def test_item_detail(self):
+        """Test If-None-Match and If-Modified-Since on the detail view"""
+        url = reverse('item_detail', kwargs={'pk': self.item.id})
+        response = self.client.get(url)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ItemImage.objects.create(item=self.item, image='items/screen.jpg', is_primary=True)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_not_modified_counts_view(self):
+        """Test repeat visitors answered with 304 are still counted"""
+        url = reverse('item_detail', kwargs={'pk': self.item.id})
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH='W/"stale"').status_code, 200)
+        self.assertEqual(item_counters.pending([self.item.id])['views'][self.item.id], 3)
+
+    def test_item_list(self):
+        """Test list ETags follow the items version without querying"""
+        url = reverse('item_list')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(url, {'condition': 'fair'}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.title = 'شاشة كمبيوتر'
+            self.item.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_item_list_seller_change(self):
+        """Test seller edits shown in list rows change the list ETag"""
+        url = reverse('item_list')
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_verified = True
+            self.user.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_item_list_without_version(self):
+        """Test no ETag is sent when the items version cannot be read"""
+        with mock.patch('performance.cache.cache.get', side_effect=ConnectionError('down')):
+            response = self.client.get(reverse('item_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_categories(self):
+        """Test category ETags follow the category version"""
+        url = reverse('category_list')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
@@ -0,0 +1,125 @@
+"""
+Item Counter Tests
+Testing write-behind view and interest counters
+"""
+import redis
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from items.models import Item, Category
+from items.counters import ItemCounterService, item_counters
+
+User = get_user_model()
+
+class UnreachableRedis:
+    """Redis client whose every call fails"""
+
+    def __getattr__(self, name):
+        def fail(*args, **kwargs):
+            raise redis.ConnectionError('unreachable')
+        return fail
+
+class HashClient:
+    """Redis client holding hashes in memory, enough for pending reads"""
+
+    def __init__(self, hashes):
+        self.hashes = hashes
+        self.results = []
+
+    def pipeline(self, transaction=False):
+        self.results = []
+        return self
+
+    def hmget(self, key, fields):
+        values = self.hashes.get(key, {})
+        self.results.append([values.get(str(field)) for field in fields])
+
+    def execute(self):
+        return self.results
+
+class ItemCounterTests(TestCase):
+    """Test counter buffering, merging and flushing"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='seller', password='TestPass123!')
+        self.category = Category.objects.create(name='paper', name_ar='ورق')
+        self.item = Item.objects.create(
+            title='كرتون',
+            description='كرتون مستعمل',
+            category=self.category,
+            user=self.user,
+            condition='good',
+            quantity=10,
+            unit='كجم',
+            location='الجيزة',
+            status='active',
+        )
+        item_counters.flush()
+
+    def tearDown(self):
+        item_counters.flush()
+
+    def test_local_buffer_when_redis_down(self):
+        """Test increments are buffered and drained with F() updates"""
+        service = ItemCounterService(client=UnreachableRedis())
+        for _ in range(3):
+            service.incr(self.item.id, 'views')
+        service.incr(self.item.id, 'interested_count')
+
+        pending = service.pending([self.item.id])
+        self.assertEqual(pending['views'][self.item.id], 3)
+        self.assertEqual(pending['interested_count'][self.item.id], 1)
+
+        service.drain()
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.views, 3)
+        self.assertEqual(self.item.interested_count, 1)
+        self.assertEqual(service.pending([self.item.id])['views'][self.item.id], 0)
+
+    def test_snapshot_applied_once(self):
+        """Test re-applying a snapshot with the same flush id is a no-op"""
+        service = ItemCounterService(client=UnreachableRedis())
+        self.assertEqual(service._apply('views', {self.item.id: 4}, 'flush-1'), 1)
+        self.assertEqual(service._apply('views', {self.item.id: 4}, 'flush-1'), 0)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.views, 4)
+
+    def test_applied_snapshot_not_counted_twice(self):
+        """Test a flushing hash already recorded in CounterFlush is not pending"""
+        flushing = {'flush_id': b'flush-2', str(self.item.id): b'4'}
+        service = ItemCounterService(client=HashClient({'item_counters:views:flushing': flushing}))
+        self.assertEqual(service.pending([self.item.id])['views'][self.item.id], 4)
+
+        service._apply('views', {self.item.id: 4}, 'flush-2')
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.views, 4)
+        self.assertEqual(service.pending([self.item.id])['views'][self.item.id], 0)
+
+    def test_unknown_field_rejected(self):
+        """Test only counter fields can be incremented"""
+        with self.assertRaises(ValueError):
+            item_counters.incr(self.item.id, 'price')
+
+    def test_detail_view_reads_pending_delta(self):
+        """Test detail responses include not-yet-flushed views"""
+        client = APIClient()
+        url = reverse('item_detail', kwargs={'pk': self.item.id})
+        client.get(url)
+        response = client.get(url)
+        self.assertEqual(response.data['views'], 2)
+
+        item_counters.flush()
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.views, 2)
+
+    def test_mark_interested(self):
+        """Test interest is counted without a row update"""
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post(reverse('mark_interested', kwargs={'item_id': self.item.id}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(item_counters.pending([self.item.id])['interested_count'][self.item.id], 1)
+
+        response = client.post(reverse('mark_interested', kwargs={'item_id': 0}))
+        self.assertEqual(response.status_code, 404)
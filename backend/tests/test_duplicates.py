@@ -0,0 +1,126 @@
+"""
+Duplicate Detection Tests
+Testing MinHash signatures, LSH bands, repost collapsing and similar listings
+"""
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from items.counters import item_counters
+from items.duplicates import BANDS, duplicate_detector, minhash, similarity
+from items.models import Item, Category, ItemBand, ItemSignature
+from items.signals import items_bulk_created
+
+User = get_user_model()
+
+DESCRIPTION = 'كمية كبيرة من زجاجات البلاستيك المستعملة نظيفة ومفروزة جاهزة لإعادة التدوير في المصنع'
+
+class MinHashTests(TestCase):
+    """Test signature estimates"""
+
+    def test_normalized_text_matches(self):
+        """Test diacritics and letter variants give the same signature"""
+        self.assertEqual(minhash('زجاجات بلاستيك', DESCRIPTION), minhash('زُجاجات بلاستيك', DESCRIPTION))
+
+    def test_similarity_estimate(self):
+        """Test small edits stay similar and unrelated text does not"""
+        original = minhash('زجاجات بلاستيك', DESCRIPTION)
+        edited = minhash('زجاجات بلاستيك', DESCRIPTION + ' اليوم')
+        other = minhash('حديد خردة', 'قضبان حديد صدئة من موقع بناء قديم')
+        self.assertGreater(similarity(original, edited), 0.8)
+        self.assertLess(similarity(original, other), 0.2)
+        self.assertIsNone(minhash('', ''))
+
+class DuplicateDetectionTests(TestCase):
+    """Test reposts are flagged on save and collapsed in the list"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.seller = User.objects.create_user(username='seller', password='TestPass123!')
+        self.other = User.objects.create_user(username='other', password='TestPass123!')
+        self.category = Category.objects.create(name='plastic', name_ar='بلاستيك')
+
+    def tearDown(self):
+        item_counters.flush()
+
+    def create(self, user, title='زجاجات بلاستيك', description=DESCRIPTION, **kwargs):
+        return Item.objects.create(
+            title=title, description=description, category=self.category, user=user,
+            condition='good', quantity=1, unit='كيلو', location='الجيزة', status='active', **kwargs
+        )
+
+    def test_signature_and_bands_stored(self):
+        """Test saving an item stores its signature and one bucket per band"""
+        item = self.create(self.seller)
+        self.assertTrue(ItemSignature.objects.get(item=item).minhash)
+        self.assertEqual(ItemBand.objects.filter(item=item).count(), BANDS)
+
+    def test_repost_points_to_first_original(self):
+        """Test reposts from the same seller point to the first listing"""
+        original = self.create(self.seller)
+        repost = self.create(self.seller, description=DESCRIPTION + ' اليوم')
+        third = self.create(self.seller)
+        for item in (original, repost, third):
+            item.refresh_from_db()
+        self.assertIsNone(original.duplicate_of_id)
+        self.assertEqual(repost.duplicate_of_id, original.id)
+        self.assertEqual(third.duplicate_of_id, original.id)
+
+    def test_other_sellers_not_flagged(self):
+        """Test identical text from another seller is not a repost"""
+        self.create(self.seller)
+        item = self.create(self.other)
+        item.refresh_from_db()
+        self.assertIsNone(item.duplicate_of_id)
+
+    def test_edit_clears_flag(self):
+        """Test rewriting a repost clears its flag"""
+        self.create(self.seller)
+        repost = self.create(self.seller)
+        repost.refresh_from_db()
+        repost.title = 'حديد خردة'
+        repost.description = 'قضبان حديد صدئة من موقع بناء قديم'
+        repost.save()
+        repost.refresh_from_db()
+        self.assertIsNone(repost.duplicate_of_id)
+
+    def test_bulk_created_reposts(self):
+        """Test reposts inside one imported batch are flagged"""
+        items = Item.objects.bulk_create([
+            Item(title='زجاجات بلاستيك', description=DESCRIPTION, category=self.category, user=self.seller,
+                 condition='good', quantity=1, unit='كيلو', location='الجيزة', status='active')
+            for _ in range(3)
+        ])
+        items_bulk_created.send(sender=Item, items=items)
+        flags = list(Item.objects.order_by('pk').values_list('duplicate_of_id', flat=True))
+        self.assertEqual(flags, [None, items[0].pk, items[0].pk])
+
+    def test_list_collapses_reposts(self):
+        """Test the list hides reposts while the original is active"""
+        original = self.create(self.seller)
+        repost = self.create(self.seller)
+        url = reverse('item_list')
+        self.assertEqual([row['id'] for row in self.client.get(url).data['results']], [original.id])
+
+        ids = {row['id'] for row in self.client.get(url, {'include_duplicates': 1}).data['results']}
+        self.assertEqual(ids, {original.id, repost.id})
+
+        original.status = 'sold'
+        original.save()
+        self.assertEqual([row['id'] for row in self.client.get(url).data['results']], [repost.id])
+
+    def test_similar_items(self):
+        """Test similar listings are ranked from shared bands"""
+        item = self.create(self.seller)
+        close = self.create(self.other, description=DESCRIPTION + ' اليوم')
+        self.create(self.other, title='حديد خردة', description='قضبان حديد صدئة من موقع بناء قديم')
+
+        with self.assertNumQueries(3):
+            ranked = duplicate_detector.similar(item.id)
+        self.assertEqual([item_id for item_id, _ in ranked], [close.id])
+
+        response = self.client.get(reverse('similar_items', kwargs={'pk': item.id}))
+        self.assertEqual([row['id'] for row in response.data['results']], [close.id])
+        self.assertGreater(response.data['results'][0]['similarity'], 0.8)
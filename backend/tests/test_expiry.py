@@ -0,0 +1,83 @@
+"""
+Item Expiry Tests
+Testing the batched expiry sweeper
+"""
+from datetime import timedelta
+from unittest import mock
+from django.db.models.query import QuerySet
+from django.test import TestCase
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from items.models import Item, Category, SearchPosting
+from items.conditional import ITEMS_VERSION
+from items.expiry import expire_due_items
+from items.facets import item_facets
+from items.stats import platform_stats
+from performance.cache import advanced_cache
+
+User = get_user_model()
+
+class ExpirySweeperTests(TestCase):
+    """Test expired items leave the active set with dependents in sync"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='seller', password='TestPass123!')
+        self.category = Category.objects.create(name='textiles', name_ar='منسوجات')
+        now = timezone.now()
+        self.items = [
+            Item.objects.create(
+                title=f'قماش {i}',
+                description='بقايا قماش',
+                category=self.category,
+                user=self.user,
+                condition='good',
+                quantity=1,
+                unit='متر',
+                location='المحلة',
+                status='active',
+                expires_at=now + timedelta(days=1 if i >= 5 else -i - 1),
+            )
+            for i in range(7)
+        ]
+
+    def test_expires_due_items_in_batches(self):
+        """Test only past-due active items expire, across several batches"""
+        expired = expire_due_items(batch_size=2)
+        self.assertEqual(expired, 5)
+        self.assertEqual(Item.objects.filter(status='expired').count(), 5)
+        self.assertEqual(Item.objects.filter(status='active').count(), 2)
+        self.assertEqual(expire_due_items(batch_size=2), 0)
+
+    def test_dependents_stay_consistent(self):
+        """Test facets, stats and the search index follow the bulk update"""
+        expire_due_items()
+        self.assertEqual(platform_stats.as_dict(), platform_stats.count_all())
+        expected = item_facets.compute_counts(Item.objects.filter(status='active'))
+        self.assertEqual(item_facets.stored_counts()['condition'], dict(expected['condition']))
+        expired_ids = Item.objects.filter(status='expired').values_list('id', flat=True)
+        self.assertFalse(SearchPosting.objects.filter(item_id__in=list(expired_ids)).exists())
+
+    def test_max_batches(self):
+        """Test a run can be bounded"""
+        self.assertEqual(expire_due_items(batch_size=2, max_batches=1), 2)
+
+    def test_raced_batch_signals_changed_rows(self):
+        """Test rows expired in a raced batch still refresh the version and index"""
+        sold = self.items[0]
+        update = QuerySet.update
+
+        def racing_update(queryset, **kwargs):
+            # Another worker sells an item between the read and the update
+            if kwargs.get('status') == 'expired':
+                update(Item.objects.filter(pk=sold.pk), status='sold')
+            return update(queryset, **kwargs)
+
+        version = advanced_cache.get_version(ITEMS_VERSION)
+        with mock.patch.object(QuerySet, 'update', racing_update):
+            with self.captureOnCommitCallbacks(execute=True):
+                expired = expire_due_items(max_batches=1)
+        self.assertEqual(expired, 4)
+        self.assertNotEqual(advanced_cache.get_version(ITEMS_VERSION), version)
+        expired_ids = list(Item.objects.filter(status='expired').values_list('id', flat=True))
+        self.assertFalse(SearchPosting.objects.filter(item_id__in=expired_ids).exists())
+        self.assertEqual(platform_stats.as_dict(), platform_stats.count_all())
@@ -0,0 +1,122 @@
+"""
+Facet Count Tests
+Testing incrementally maintained and filtered facet counts
+"""
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from items.models import Item, Category, FacetCount
+from items.facets import item_facets
+from performance.cache import advanced_cache
+
+User = get_user_model()
+
+class FacetCountTests(TestCase):
+    """Test facet table deltas and the facets endpoint"""
+
+    def setUp(self):
+        cache.clear()
+        advanced_cache.clear_local()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='seller', password='TestPass123!')
+        self.paper = Category.objects.create(name='paper', name_ar='ورق')
+        self.metals = Category.objects.create(name='metals', name_ar='معادن')
+
+    def create(self, category, status='active', condition='good', location='القاهرة'):
+        return Item.objects.create(
+            title='منتج',
+            description='وصف',
+            category=category,
+            user=self.user,
+            condition=condition,
+            quantity=1,
+            unit='كجم',
+            location=location,
+            status=status,
+        )
+
+    def stored(self):
+        return {
+            (row.facet, row.value): row.count
+            for row in FacetCount.objects.filter(count__gt=0)
+        }
+
+    def assertMatchesRecount(self):
+        expected = item_facets.compute_counts(Item.objects.filter(status='active'))
+        self.assertEqual(self.stored(), {
+            (facet, value): count
+            for facet, values in expected.items()
+            for value, count in values.items()
+        })
+
+    def test_status_transitions(self):
+        """Test the table follows creates, status changes, edits and deletes"""
+        first = self.create(self.paper)
+        second = self.create(self.metals, status='pending', condition='scrap')
+        self.assertEqual(self.stored()[('category', str(self.paper.id))], 1)
+        self.assertNotIn(('category', str(self.metals.id)), self.stored())
+
+        second.status = 'active'
+        second.save()
+        first.category = self.metals
+        first.save()
+        self.assertEqual(self.stored()[('category', str(self.metals.id))], 2)
+        self.assertMatchesRecount()
+
+        Item.objects.get(pk=second.pk).delete()
+        deferred = Item.objects.only('id').get(pk=first.pk)
+        deferred.status = 'sold'
+        deferred.save()
+        self.assertEqual(self.stored(), {})
+
+    def test_partial_save(self):
+        """Test update_fields saves only count the saved fields"""
+        item = self.create(self.paper)
+        item.status = 'sold'
+        item.condition = 'poor'
+        item.save(update_fields=['condition'])
+        self.assertMatchesRecount()
+
+    def test_unfiltered_endpoint_reads_table(self):
+        """Test homepage facets come from the table in a fixed number of queries"""
+        for _ in range(3):
+            self.create(self.paper)
+        self.create(self.metals, location='الإسكندرية')
+
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('item_facets'))
+        self.assertEqual(response.data['category'][0], {'value': self.paper.id, 'label': 'ورق', 'count': 3})
+        self.assertEqual(response.data['location'][1]['count'], 1)
+
+    def test_filtered_endpoint(self):
+        """Test filtered facets are computed over matching items"""
+        self.create(self.paper, condition='good')
+        self.create(self.paper, condition='scrap')
+        self.create(self.metals, condition='scrap')
+
+        response = self.client.get(reverse('item_facets'), {'condition': 'scrap'})
+        categories = {row['value']: row['count'] for row in response.data['category']}
+        self.assertEqual(categories, {self.paper.id: 1, self.metals.id: 1})
+        self.assertEqual(response.data['condition'], [{'value': 'scrap', 'label': 'خردة', 'count': 2}])
+
+    def test_counts_grouped_per_facet(self):
+        """Test counts take one query that returns a row per facet value, not per combination"""
+        self.create(self.paper, condition='good', location='طنطا')
+        self.create(self.paper, condition='scrap', location='المنصورة')
+        self.create(self.metals, condition='scrap', location='أسوان')
+
+        queryset = Item.objects.filter(status='active')
+        with self.assertNumQueries(1):
+            counts = item_facets.compute_counts(queryset)
+        self.assertEqual(counts['category'], {str(self.paper.id): 2, str(self.metals.id): 1})
+        self.assertEqual(counts['condition'], {'good': 1, 'scrap': 2})
+        self.assertEqual(len(counts['location']), 3)
+
+    def test_rebuild(self):
+        """Test a full rebuild matches the incremental table"""
+        self.create(self.paper)
+        FacetCount.objects.update(count=99)
+        item_facets.rebuild()
+        self.assertMatchesRecount()
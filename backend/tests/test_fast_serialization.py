@@ -0,0 +1,101 @@
+"""
+Fast Serialization Tests
+Testing the values() list path renders the same bytes as the DRF serializers
+"""
+from decimal import Decimal
+from unittest import mock
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from items import views
+from items.caching import build_categories, category_cache, render_json
+from items.counters import item_counters
+from items.models import Item, Category, ItemImage
+from items.serializers import CategorySerializer
+
+User = get_user_model()
+
+class FastSerializationTests(TestCase):
+    """Test the values() path against the regular serializer output"""
+
+    def setUp(self):
+        cache.clear()
+        category_cache.clear_local()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='seller', password='TestPass123!', first_name='منى', avatar='avatars/mona.png'
+        )
+        self.category = Category.objects.create(name='furniture', name_ar='أثاث', icon='chair')
+        self.item = Item.objects.create(
+            title='كرسي خشب "قديم"',
+            description='سطر جديد',
+            category=self.category,
+            user=self.user,
+            condition='good',
+            quantity=2,
+            unit='قطعة',
+            price=Decimal('125.50'),
+            price_type='fixed',
+            location='المعادي',
+            status='active',
+        )
+        ItemImage.objects.create(
+            item=self.item, image='items/chair.jpg', is_primary=True,
+            variants={'thumbnail': 'items/variants/1/thumbnail.jpg'}
+        )
+        Item.objects.create(
+            title='طاولة', description='بدون صور', category=self.category, user=self.user,
+            condition='fair', quantity=1, unit='قطعة', location='أسوان', status='active',
+        )
+
+    def tearDown(self):
+        item_counters.flush()
+
+    def assertSameBody(self, url, **params):
+        fast = self.client.get(url, params)
+        with mock.patch.object(views, 'accepts_fast_json', return_value=False):
+            regular = self.client.get(url, params)
+        self.assertEqual(fast.status_code, 200)
+        self.assertEqual(fast['Content-Type'], regular['Content-Type'])
+        self.assertEqual(fast.content, regular.content)
+        return fast.json()
+
+    def test_item_list(self):
+        """Test the list endpoint output is byte-identical"""
+        data = self.assertSameBody(reverse('item_list'))
+        self.assertEqual(len(data['results']), 2)
+        self.assertEqual(data['results'][1]['price'], '125.50')
+        self.assertTrue(data['results'][1]['primary_image'].endswith('/items/chair.jpg'))
+
+    def test_near_and_pending_counters(self):
+        """Test distances and unflushed counters are included"""
+        item_counters.incr(self.item.pk, 'views')
+        data = self.assertSameBody(reverse('item_list'), near='29.96,31.25')
+        self.assertEqual([item['id'] for item in data['results']], [self.item.pk])
+        self.assertEqual(data['results'][0]['views'], 1)
+        self.assertIsNotNone(data['results'][0]['distance'])
+
+    def test_cursor_pages(self):
+        """Test cursors built from values() rows page through the list"""
+        data = self.assertSameBody(reverse('item_list'), page_size=1)
+        self.assertIsNotNone(data['next'])
+        response = self.client.get(data['next'])
+        self.assertEqual(response.json()['results'][0]['id'], self.item.pk)
+
+    def test_my_items(self):
+        """Test the authenticated list of the user's own items"""
+        self.client.force_authenticate(self.user)
+        self.assertSameBody(reverse('my_items'))
+
+    def test_indented_json_uses_serializer(self):
+        """Test indented JSON keeps the regular renderer"""
+        response = self.client.get(reverse('item_list'), HTTP_ACCEPT='application/json; indent=2')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'\n  ', response.content)
+
+    def test_categories(self):
+        """Test the cached categories body matches CategorySerializer"""
+        expected = render_json(CategorySerializer(Category.objects.filter(is_active=True), many=True).data)
+        self.assertEqual(build_categories(), expected)
@@ -0,0 +1,96 @@
+"""
+Geo Search Tests
+Testing gazetteer geocoding and proximity filtering of items
+"""
+from django.test import TestCase, SimpleTestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from items.models import Item, Category
+from items import geo
+
+User = get_user_model()
+
+class GeoHelperTests(SimpleTestCase):
+    """Test geocoding and geohash helpers"""
+
+    def test_geocode_prefers_specific_place(self):
+        """Test a district wins over the city it is in"""
+        self.assertEqual(geo.geocode('مدينة نصر، القاهرة'), (30.0561, 31.3301))
+        self.assertEqual(geo.geocode('الاسكندريه'), (31.2001, 29.9187))
+        self.assertEqual(geo.geocode('Maadi, Cairo'), (29.9602, 31.2569))
+        self.assertIsNone(geo.geocode('مكان غير معروف'))
+
+    def test_haversine(self):
+        """Test Cairo to Alexandria distance"""
+        distance = geo.haversine(30.0444, 31.2357, 31.2001, 29.9187)
+        self.assertAlmostEqual(distance, 179, delta=3)
+
+    def test_covering_cells_contain_point(self):
+        """Test the cells covering a box include the centre cell"""
+        box = geo.bounding_box(30.0444, 31.2357, 10)
+        cells = geo.covering_cells(*box)
+        self.assertTrue(cells)
+        self.assertTrue(geo.geohash_encode(30.0444, 31.2357).startswith(tuple(cells)))
+
+class ProximitySearchTests(TestCase):
+    """Test near/radius filtering on item endpoints"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='seller', password='TestPass123!', location='الجيزة')
+        self.category = Category.objects.create(name='plastic', name_ar='بلاستيك')
+
+        def create(title, location):
+            return Item.objects.create(
+                title=title,
+                description='بلاستيك للتدوير',
+                category=self.category,
+                user=self.user,
+                condition='good',
+                quantity=1,
+                unit='كجم',
+                location=location,
+                status='active',
+            )
+
+        self.nasr_city = create('زجاجات', 'مدينة نصر')
+        self.heliopolis = create('أكياس', 'مصر الجديدة')
+        self.alexandria = create('براميل', 'الإسكندرية')
+
+    def test_locations_geocoded_on_save(self):
+        """Test coordinates and geohash are filled from the place name"""
+        self.assertEqual((self.nasr_city.latitude, self.nasr_city.longitude), (30.0561, 31.3301))
+        self.assertEqual(self.nasr_city.geohash, geo.geohash_encode(30.0561, 31.3301))
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.latitude, 30.0131)
+
+        self.nasr_city.location = 'المعادي'
+        self.nasr_city.save()
+        self.assertEqual(self.nasr_city.latitude, 29.9602)
+
+    def test_near_filter_orders_by_distance(self):
+        """Test items within the radius come back nearest first"""
+        response = self.client.get(reverse('item_list'), {'near': '30.06,31.33', 'radius': 10})
+        ids = [row['id'] for row in response.data['results']]
+        self.assertEqual(ids, [self.nasr_city.id, self.heliopolis.id])
+        self.assertLess(response.data['results'][0]['distance'], 1)
+
+        # Cursor pages over the computed distance
+        first = self.client.get(reverse('item_list'), {'near': '30.06,31.33', 'radius': 10, 'page_size': 1})
+        second = self.client.get(first.data['next'])
+        self.assertEqual([row['id'] for row in second.data['results']], [self.heliopolis.id])
+
+    def test_location_name_becomes_proximity(self):
+        """Test a known place name matches nearby items, not only the exact text"""
+        response = self.client.get(reverse('search_items'), {'location': 'القاهرة', 'radius': 15})
+        ids = {row['id'] for row in response.data['results']}
+        self.assertEqual(ids, {self.nasr_city.id, self.heliopolis.id})
+
+        response = self.client.get(reverse('search_items'), {'q': 'بلاستيك', 'near': '31.2,29.9', 'radius': 20})
+        self.assertEqual([row['id'] for row in response.data['results']], [self.alexandria.id])
+
+    def test_invalid_near(self):
+        """Test malformed coordinates return no items"""
+        response = self.client.get(reverse('item_list'), {'near': 'abc'})
+        self.assertEqual(response.data['results'], [])
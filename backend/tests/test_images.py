@@ -0,0 +1,36 @@
+"""
+Image Pipeline Tests
+Testing thumbnail and WebP derivative generation
+"""
+from io import BytesIO
+from PIL import Image
+from django.test import SimpleTestCase
+from performance.utils import ImageOptimizer
+
+class ImageVariantTests(SimpleTestCase):
+    """Test ImageOptimizer.render_variants"""
+
+    def jpeg_bytes(self, orientation=None):
+        image = Image.new('RGB', (800, 400), 'green')
+        exif = Image.Exif()
+        exif[0x010f] = 'Camera'
+        if orientation:
+            exif[0x0112] = orientation
+        output = BytesIO()
+        image.save(output, 'JPEG', exif=exif)
+        return output.getvalue()
+
+    def test_all_variants_rendered(self):
+        """Test 150/300/600 thumbnails and a WebP copy are produced"""
+        variants = ImageOptimizer.render_variants(self.jpeg_bytes())
+        self.assertEqual(set(variants), {'150', '300', '600', 'webp'})
+        self.assertEqual(Image.open(BytesIO(variants['600'])).size, (600, 300))
+        self.assertEqual(Image.open(BytesIO(variants['150'])).size, (150, 75))
+        self.assertEqual(Image.open(BytesIO(variants['webp'])).format, 'WEBP')
+
+    def test_orientation_fixed_and_exif_stripped(self):
+        """Test EXIF rotation is applied and metadata removed"""
+        variants = ImageOptimizer.render_variants(self.jpeg_bytes(orientation=6))
+        thumbnail = Image.open(BytesIO(variants['600']))
+        self.assertEqual(thumbnail.size, (300, 600))
+        self.assertEqual(dict(thumbnail.getexif()), {})
@@ -0,0 +1,88 @@
+"""
+Bulk Import Tests
+Testing streaming CSV/JSONL item import
+"""
+import io
+import json
+import tempfile
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from items.models import Item, Category, SearchPosting
+from items.stats import platform_stats
+from items.search import search_index
+from items.importer import ItemImporter
+
+User = get_user_model()
+
+CSV_BODY = (
+    'title,description,category,condition,quantity,unit,price,price_type,location\n'
+    'كرتون,كرتون نظيف,paper,good,100,كجم,,free,القاهرة\n'
+    'ورق أبيض,ورق مكاتب,ورق,excellent,50,كجم,12.50,fixed,الجيزة\n'
+    'بدون فئة,وصف,unknown,good,1,كجم,,free,طنطا\n'
+    'كمية خاطئة,وصف,paper,good,abc,كجم,,free,طنطا\n'
+)
+
+class BulkImportTests(TestCase):
+    """Test validation, insertion and per-row error reporting"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='collector', password='TestPass123!')
+        self.category = Category.objects.create(name='paper', name_ar='ورق')
+        self.client.force_authenticate(self.user)
+
+    def test_csv_body(self):
+        """Test valid rows are created and bad rows reported by line"""
+        response = self.client.post(reverse('item_import'), CSV_BODY.encode(), content_type='text/csv')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(response.data['failed'], 2)
+        self.assertEqual([error['row'] for error in response.data['errors']], [4, 5])
+        self.assertIn('category', response.data['errors'][0]['errors'])
+
+        item = Item.objects.get(title='ورق أبيض')
+        self.assertEqual((item.user, item.status, str(item.price)), (self.user, 'pending', '12.50'))
+        self.assertEqual(item.latitude, 30.0131)
+        self.assertEqual(platform_stats.as_dict(), platform_stats.count_all())
+
+    def test_jsonl_upload(self):
+        """Test JSONL files and malformed lines"""
+        lines = [
+            json.dumps({'title': 'علب', 'description': 'علب ألومنيوم', 'category': self.category.id,
+                        'condition': 'scrap', 'quantity': 3, 'unit': 'كجم', 'location': 'دمياط'}),
+            '{not json',
+        ]
+        upload = SimpleUploadedFile('lots.jsonl', '\n'.join(lines).encode(), content_type='application/octet-stream')
+        response = self.client.post(reverse('item_import'), {'file': upload}, format='multipart')
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['errors'][0]['row'], 2)
+
+    def test_active_imports_are_indexed(self):
+        """Test bulk-created active items reach the search index"""
+        importer = ItemImporter(self.user)
+        row = {'title': 'نحاس', 'description': 'أسلاك', 'category': 'paper', 'condition': 'scrap',
+               'quantity': 1, 'unit': 'كجم', 'location': 'القاهرة'}
+        items = [importer.build_item(dict(row, status='active', category=self.category))]
+        importer.insert(items)
+        self.assertTrue(SearchPosting.objects.filter(item=items[0]).exists())
+        self.assertEqual(search_index.search_ids('نحاس'), [items[0].id])
+
+    def test_unsupported_format(self):
+        """Test requests without a CSV/JSONL payload are rejected"""
+        response = self.client.post(reverse('item_import'), {'title': 'x'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_management_command(self):
+        """Test import_items reads a file in batches"""
+        stdout = io.StringIO()
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', encoding='utf-8') as handle:
+            handle.write(CSV_BODY)
+            handle.flush()
+            call_command('import_items', handle.name, user='collector', batch_size=1,
+                         stdout=stdout, stderr=io.StringIO())
+        self.assertEqual(Item.objects.filter(user=self.user).count(), 2)
+        self.assertIn('2', stdout.getvalue())
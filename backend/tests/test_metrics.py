@@ -0,0 +1,120 @@
+"""
+Metrics Tests
+Testing per-route histograms, multiprocess snapshots and the Prometheus endpoint
+"""
+import json
+import os
+import tempfile
+from unittest import mock
+from django.core.cache import cache
+from django.test import TestCase, SimpleTestCase, RequestFactory, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from items.counters import item_counters
+from items.models import Item, Category
+from performance.metrics import MetricsRegistry, metrics
+from performance.views import metrics_view
+
+User = get_user_model()
+
+class MetricsRegistryTests(SimpleTestCase):
+    """Test histogram rendering and merging of worker snapshots"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.registry = MetricsRegistry(self.directory, flush_interval=0, buckets=(0.1, 1.0))
+
+    def test_histogram_text_format(self):
+        """Test buckets are cumulative and end with +Inf, sum and count"""
+        labels = (('method', 'GET'), ('route', '/api/items/'), ('status', '200'))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            self.registry.observe('http_request_duration_seconds', labels, value)
+        text = self.registry.render()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', text)
+        prefix = 'http_request_duration_seconds_bucket{method="GET",route="/api/items/",status="200",'
+        self.assertIn(prefix + 'le="0.1"} 2', text)
+        self.assertIn(prefix + 'le="1.0"} 3', text)
+        self.assertIn(prefix + 'le="+Inf"} 4', text)
+        self.assertIn('http_request_duration_seconds_count{method="GET",route="/api/items/",status="200"} 4', text)
+
+    def test_worker_files_merged(self):
+        """Test other workers' counters are summed and dead workers' gauges dropped"""
+        labels = (('route', '/api/items/'),)
+        self.registry.summarize('http_response_size_bytes', labels, 100)
+        self.registry.gauge_inc('http_requests_in_progress', labels, 1)
+        with open(os.path.join(self.directory, 'metrics-999999999-1.json'), 'w') as handle:
+            json.dump({
+                'buckets': [0.1, 1.0], 'histograms': [],
+                'summaries': [['http_response_size_bytes', [['route', '/api/items/']], [50.0, 2]]],
+                'gauges': [['http_requests_in_progress', [['route', '/api/items/']], 5]],
+            }, handle)
+        self.assertEqual(self.registry.flush(), 1)
+
+        text = self.registry.render()
+        self.assertIn('http_response_size_bytes_sum{route="/api/items/"} 150.0', text)
+        self.assertIn('http_response_size_bytes_count{route="/api/items/"} 3', text)
+        self.assertIn('http_requests_in_progress{route="/api/items/"} 1', text)
+
+    def test_reused_pid_keeps_dead_worker_counts(self):
+        """Test a file from an earlier process with the same pid is neither overwritten nor live"""
+        labels = (('route', '/api/items/'),)
+        self.registry.summarize('http_response_size_bytes', labels, 100)
+        self.registry.flush()
+        with open(os.path.join(self.directory, f'metrics-{os.getpid()}-1.json'), 'w') as handle:
+            json.dump({
+                'buckets': [0.1, 1.0], 'histograms': [],
+                'summaries': [['http_response_size_bytes', [['route', '/api/items/']], [50.0, 2]]],
+                'gauges': [['http_requests_in_progress', [['route', '/api/items/']], 5]],
+            }, handle)
+        self.assertNotEqual(self.registry.path(), os.path.join(self.directory, f'metrics-{os.getpid()}-1.json'))
+
+        text = self.registry.render()
+        self.assertIn('http_response_size_bytes_count{route="/api/items/"} 3', text)
+        self.assertNotIn('http_requests_in_progress', text)
+
+class RequestMetricsTests(TestCase):
+    """Test the middleware labels requests by route and the endpoint is protected"""
+
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        self.client = APIClient()
+        user = User.objects.create_user(username='seller', password='TestPass123!')
+        category = Category.objects.create(name='plastic', name_ar='بلاستيك')
+        self.item = Item.objects.create(
+            title='زجاجات', description='وصف', category=category, user=user,
+            condition='good', quantity=1, unit='كيلو', location='القاهرة', status='active',
+        )
+
+    def tearDown(self):
+        item_counters.flush()
+
+    def test_route_labels_and_breakdowns(self):
+        """Test detail requests share the route label with DB time and size recorded"""
+        with mock.patch.object(metrics, 'directory', tempfile.mkdtemp()):
+            for _ in range(2):
+                self.client.get(reverse('item_detail', kwargs={'pk': self.item.pk}))
+            self.client.get('/api/items/does-not-exist/')
+            text = metrics.render()
+        route = 'route="/api/items/<int:pk>/"'
+        self.assertIn(f'http_request_duration_seconds_count{{method="GET",{route},status="200"}} 2', text)
+        self.assertIn(f'http_request_db_seconds_count{{{route}}} 2', text)
+        self.assertIn(f'http_response_size_bytes_count{{{route}}} 2', text)
+        self.assertIn(f'http_requests_in_progress{{{route}}} 0', text)
+        self.assertIn('route="unmatched",status="404"', text)
+        self.assertNotIn(f'/api/items/{self.item.pk}/', text)
+
+    @override_settings(METRICS_ALLOWED_IPS=['127.0.0.1'], METRICS_TOKEN='s3cret')
+    def test_endpoint_access(self):
+        """Test only allowed addresses or the token can read the metrics"""
+        factory = RequestFactory()
+        request = factory.get('/metrics', REMOTE_ADDR='10.0.0.5')
+        request.user = mock.Mock(is_staff=False)
+        self.assertEqual(metrics_view(request).status_code, 403)
+
+        request = factory.get('/metrics', REMOTE_ADDR='10.0.0.5', HTTP_AUTHORIZATION='Bearer s3cret')
+        request.user = mock.Mock(is_staff=False)
+        response = metrics_view(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
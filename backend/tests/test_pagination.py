@@ -0,0 +1,90 @@
+"""
+Keyset Pagination Tests
+Testing cursor pagination on item listing and search endpoints
+"""
+import base64
+from decimal import Decimal
+from urllib.parse import urlparse, parse_qs
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from rest_framework import status
+from items.models import Item, Category
+
+User = get_user_model()
+
+class KeysetPaginationTests(TestCase):
+    """Test cursor pagination over every ordering field"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='seller', password='TestPass123!')
+        self.category = Category.objects.create(name='metals', name_ar='معادن')
+        self.items = []
+        for i in range(7):
+            self.items.append(Item.objects.create(
+                title=f'حديد {i}',
+                description='خردة حديد',
+                category=self.category,
+                user=self.user,
+                condition='scrap',
+                quantity=1,
+                unit='طن',
+                location='القاهرة',
+                status='active',
+                views=i % 3,
+                price=None if i % 3 == 0 else Decimal(i % 2 * 10),
+            ))
+
+    def collect(self, url, params):
+        """Follow next links and return ids in order"""
+        ids = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids.extend(row['id'] for row in response.data['results'])
+            if not response.data['next']:
+                return ids, response
+            cursor = parse_qs(urlparse(response.data['next']).query)['cursor'][0]
+            response = self.client.get(url, dict(params, cursor=cursor))
+
+    def test_walks_every_ordering(self):
+        """Test each item appears exactly once for every ordering"""
+        url = reverse('item_list')
+        for ordering in ['-created_at', 'created_at', '-views', 'views', 'price', '-price']:
+            ids, _ = self.collect(url, {'ordering': ordering, 'page_size': 2})
+            self.assertEqual(sorted(ids), sorted(item.id for item in self.items), ordering)
+
+    def test_default_order_matches_offset_order(self):
+        """Test pages follow (-created_at, -id)"""
+        ids, _ = self.collect(reverse('item_list'), {'page_size': 3})
+        expected = list(Item.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+
+    def test_previous_link(self):
+        """Test previous cursor returns the preceding page"""
+        url = reverse('item_list')
+        first = self.client.get(url, {'page_size': 3})
+        self.assertIsNone(first.data['previous'])
+        cursor = parse_qs(urlparse(first.data['next']).query)['cursor'][0]
+        second = self.client.get(url, {'page_size': 3, 'cursor': cursor})
+        cursor = parse_qs(urlparse(second.data['previous']).query)['cursor'][0]
+        back = self.client.get(url, {'page_size': 3, 'cursor': cursor})
+        self.assertEqual(
+            [row['id'] for row in back.data['results']],
+            [row['id'] for row in first.data['results']]
+        )
+
+    def test_invalid_cursor(self):
+        """Test malformed cursors are rejected"""
+        response = self.client.get(reverse('item_list'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        cursor = base64.urlsafe_b64encode(b'{"o":"relevance","v":null,"id":1}').decode()
+        response = self.client.get(reverse('search_items'), {'q': 'حديد', 'cursor': cursor})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_ranked_search_pages(self):
+        """Test search results paginate by relevance cursor"""
+        ids, _ = self.collect(reverse('search_items'), {'q': 'حديد', 'page_size': 2})
+        self.assertEqual(sorted(ids), sorted(item.id for item in self.items))
@@ -0,0 +1,132 @@
+"""
+Price Index Tests
+Testing t-digest quantiles, incremental price digests and suggestions
+"""
+import random
+from decimal import Decimal
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from items.models import Item, Category, PriceDigest
+from items.prices import TDigest, price_cache, price_index
+from items.signals import items_bulk_created
+
+User = get_user_model()
+
+class TDigestTests(TestCase):
+    """Test quantile accuracy and merging"""
+
+    def test_quantiles(self):
+        """Test quantiles of a large uniform sample stay close"""
+        rng = random.Random(7)
+        values = [rng.uniform(0, 1000) for _ in range(20000)]
+        digest = TDigest().add(values)
+        self.assertLess(len(digest.centroids), 200)
+        values.sort()
+        for q in (0.1, 0.5, 0.9, 0.99):
+            self.assertAlmostEqual(digest.quantile(q), values[int(q * len(values))], delta=10)
+
+    def test_merge_matches_single_digest(self):
+        """Test merged digests agree with one digest over all values"""
+        rng = random.Random(3)
+        parts = [[rng.gauss(100, 20) for _ in range(2000)] for _ in range(4)]
+        merged = TDigest()
+        for part in parts:
+            merged.merge(TDigest.from_dict(TDigest().add(part).to_dict()))
+        single = TDigest().add(value for part in parts for value in part)
+        self.assertEqual(merged.count, 8000)
+        self.assertAlmostEqual(merged.quantile(0.5), single.quantile(0.5), delta=1)
+
+class PriceIndexTests(TestCase):
+    """Test incremental updates and the suggestion endpoint"""
+
+    def setUp(self):
+        cache.clear()
+        price_cache.clear_local()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='seller', password='TestPass123!')
+        self.category = Category.objects.create(name='metals', name_ar='معادن')
+
+    def create(self, price, condition='scrap', unit='كيلو', quantity=1, **kwargs):
+        return Item.objects.create(
+            title='نحاس', description='نحاس خردة', category=self.category, user=self.user,
+            condition=condition, quantity=quantity, unit=unit, price=Decimal(price),
+            price_type='fixed', location='القاهرة', status='active', **kwargs
+        )
+
+    def test_created_items_update_digest(self):
+        """Test unit prices are added on create and normalized units share a digest"""
+        self.create('100', quantity=10)
+        self.create('12', unit='كيلو ')
+        self.create('0')
+        row = PriceDigest.objects.get()
+        self.assertEqual(TDigest.from_dict(row.listed).count, 2)
+        self.assertEqual(TDigest.from_dict(row.listed).min, 10)
+
+    def test_sold_items(self):
+        """Test sales feed the sold digest and are preferred"""
+        items = [self.create(str(price)) for price in (10, 11, 12, 13, 14)]
+        for item in items:
+            self.create('100')
+            item.status = 'sold'
+            item.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create('100')
+        suggestion = price_index.suggest(self.category.id, 'scrap', 'كيلو', quantity=2)
+        self.assertEqual(suggestion['source'], 'sold')
+        self.assertEqual(suggestion['scope'], 'condition')
+        self.assertAlmostEqual(suggestion['suggested_price'], 24, delta=0.5)
+
+    def test_falls_back_to_all_conditions(self):
+        """Test sparse conditions use the merged category digest"""
+        for price in (5, 6, 7, 8):
+            self.create(str(price))
+        self.create('9', condition='good')
+        suggestion = price_index.suggest(self.category.id, 'good', 'كيلو')
+        self.assertEqual((suggestion['scope'], suggestion['count']), ('category', 5))
+
+    def test_bulk_import_and_rebuild(self):
+        """Test bulk created items are added and rebuild matches"""
+        items = Item.objects.bulk_create([
+            Item(title='نحاس', description='نحاس', category=self.category, user=self.user,
+                 condition='scrap', quantity=1, unit='كيلو', price=Decimal(price),
+                 price_type='fixed', location='القاهرة', status='active')
+            for price in range(10, 20)
+        ])
+        items_bulk_created.send(sender=Item, items=items)
+        listed = PriceDigest.objects.get().listed
+        self.assertEqual(price_index.rebuild(), 10)
+        self.assertEqual(PriceDigest.objects.get().listed, listed)
+
+    def test_invalidation_scoped_to_category_and_unit(self):
+        """Test a price change only invalidates suggestions for its category and unit"""
+        for price in (20, 22, 24, 26, 28):
+            self.create(str(price))
+            self.create(str(price), unit='طن')
+        before = price_index.suggest(self.category.id, 'scrap', 'كيلو')
+        price_index.suggest(self.category.id, 'scrap', 'طن')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create('1000', unit='طن')
+        with self.assertNumQueries(0):
+            self.assertEqual(price_index.suggest(self.category.id, 'scrap', 'كيلو'), before)
+        self.assertEqual(price_index.suggest(self.category.id, 'scrap', 'طن')['count'], 6)
+
+    def test_endpoint(self):
+        """Test the suggestion endpoint answers from cache"""
+        for price in (20, 22, 24, 26, 28):
+            self.create(str(price))
+        url = reverse('price_suggestion')
+        params = {'category': self.category.id, 'condition': 'scrap', 'unit': 'كيلو', 'quantity': 10}
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 5)
+        self.assertLess(response.data['price_range']['min'], response.data['price_range']['max'])
+
+        with self.assertNumQueries(0):
+            self.client.get(url, params)
+        self.assertEqual(self.client.get(url, dict(params, category='metals')).status_code, 200)
+        self.assertEqual(self.client.get(url, dict(params, unit='طن')).status_code, 404)
+        self.assertEqual(self.client.get(url, dict(params, condition='')).status_code, 400)
@@ -0,0 +1,76 @@
+"""
+Query Budget Tests
+Guarding item endpoints against N+1 query regressions
+"""
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from items.models import Item, Category, ItemImage
+
+User = get_user_model()
+
+class QueryBudgetMixin:
+    """assertQueryBudget: fail when a block runs more queries than allowed"""
+
+    def assertQueryBudget(self, budget, func, *args, **kwargs):
+        with CaptureQueriesContext(connection) as context:
+            result = func(*args, **kwargs)
+        executed = len(context.captured_queries)
+        if executed > budget:
+            queries = '\n'.join(query['sql'] for query in context.captured_queries)
+            self.fail(f'{executed} queries executed, budget is {budget}:\n{queries}')
+        return result
+
+class ItemEndpointQueryTests(QueryBudgetMixin, TestCase):
+    """Test list and detail endpoints run a constant number of queries"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.category = Category.objects.create(name='glass', name_ar='زجاج')
+
+    def create_items(self, count):
+        for i in range(count):
+            user = User.objects.create_user(username=f'seller{Item.objects.count()}', password='TestPass123!')
+            item = Item.objects.create(
+                title=f'زجاج {i}',
+                description='زجاجات فارغة',
+                category=self.category,
+                user=user,
+                condition='good',
+                quantity=5,
+                unit='كجم',
+                location='طنطا',
+                status='active',
+                is_featured=True,
+            )
+            ItemImage.objects.create(item=item, image=f'items/{i}.jpg', is_primary=True)
+            ItemImage.objects.create(item=item, image=f'items/{i}-b.jpg', is_primary=False)
+
+    def test_item_list_budget(self):
+        """Test a full list page costs two queries regardless of size"""
+        self.create_items(30)
+        response = self.assertQueryBudget(2, self.client.get, reverse('item_list'), {'page_size': 30})
+        self.assertEqual(len(response.data['results']), 30)
+        self.assertTrue(all(row['primary_image'] for row in response.data['results']))
+
+    def test_search_budget(self):
+        """Test ranked search pages do not query per row"""
+        self.create_items(20)
+        self.assertQueryBudget(5, self.client.get, reverse('search_items'), {'q': 'زجاج'})
+
+    def test_featured_budget(self):
+        """Test featured items are loaded with their relations"""
+        self.create_items(6)
+        self.assertQueryBudget(2, self.client.get, reverse('featured_items'))
+
+    def test_item_detail_budget(self):
+        """Test detail view loads user, category and images up front"""
+        self.create_items(1)
+        item = Item.objects.get()
+        response = self.assertQueryBudget(
+            2, self.client.get, reverse('item_detail', kwargs={'pk': item.id})
+        )
+        self.assertEqual(len(response.data['images']), 2)
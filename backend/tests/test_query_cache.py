@@ -0,0 +1,124 @@
+"""
+Query Cache Tests
+Testing compact row storage, rebuilt instances and automatic invalidation on writes
+"""
+from django.core.cache import cache
+from django.db.models import Count
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from items.models import Item, Category
+from performance.cache import CacheEntry, QueryCache, advanced_cache
+
+User = get_user_model()
+
+class QueryCacheTests(TestCase):
+    """Test cached querysets are stored as rows and follow model writes"""
+
+    def setUp(self):
+        cache.clear()
+        advanced_cache.clear_local()
+        self.user = User.objects.create_user(username='seller', password='TestPass123!')
+        self.plastic = Category.objects.create(name='plastic', name_ar='بلاستيك')
+        self.metals = Category.objects.create(name='metals', name_ar='معادن')
+        self.item = Item.objects.create(
+            title='زجاجات', description='وصف', category=self.plastic, user=self.user,
+            condition='good', quantity=1, unit='كيلو', location='القاهرة', status='active',
+        )
+
+    def stored(self, queryset):
+        key = advanced_cache.tagged_key(
+            QueryCache._generate_queryset_key(queryset), QueryCache.model_tags(queryset)
+        )
+        entry = cache.get(key)
+        return entry.value if isinstance(entry, CacheEntry) else entry
+
+    def test_rows_stored_not_instances(self):
+        """Test the cached payload holds plain tuples"""
+        queryset = Category.objects.order_by('pk').cached(60)
+        self.assertEqual(list(queryset), [self.plastic, self.metals])
+        payload = self.stored(queryset)
+        self.assertEqual(payload['kind'], 'model')
+        self.assertTrue(all(type(row) is tuple for row in payload['rows']))
+
+        with self.assertNumQueries(0):
+            categories = list(Category.objects.order_by('pk').cached(60))
+        self.assertEqual(categories[1].name_ar, 'معادن')
+        self.assertFalse(categories[0]._state.adding)
+
+    def test_select_related_and_annotations(self):
+        """Test related rows and annotations are rebuilt without queries"""
+        list(Item.objects.select_related('category', 'user').cached(60))
+        with self.assertNumQueries(0):
+            item = list(Item.objects.select_related('category', 'user').cached(60))[0]
+            self.assertEqual((item.category.name, item.user.username), ('plastic', 'seller'))
+
+        counts = Category.objects.annotate(total=Count('items')).order_by('pk').cached(60)
+        self.assertEqual([category.total for category in counts], [1, 0])
+
+    def test_deferred_fields(self):
+        """Test only() keeps other fields deferred on rebuilt instances"""
+        list(Item.objects.only('title').cached(60))
+        with self.assertNumQueries(0):
+            item = list(Item.objects.only('title').cached(60))[0]
+            self.assertEqual(item.title, 'زجاجات')
+        self.assertIn('description', item.get_deferred_fields())
+
+    def test_empty_querysets(self):
+        """Test querysets that cannot match return an empty list without a query"""
+        with self.assertNumQueries(0):
+            self.assertEqual(list(Item.objects.filter(id__in=[]).cached(60)), [])
+            self.assertEqual(list(Item.objects.none().cached(60)), [])
+
+    def test_values_round_trip(self):
+        """Test values() and named values_list() rows come back in the same shape"""
+        values = list(Category.objects.order_by('pk').values('id', 'name').cached(60))
+        self.assertEqual(values, list(Category.objects.order_by('pk').values('id', 'name')))
+        named = list(Category.objects.order_by('pk').values_list('name', named=True).cached(60))
+        self.assertEqual(named[0].name, 'plastic')
+        first = Category.objects.filter(name='metals').values_list('id', flat=True).cached(60)
+        self.assertEqual(first.first(), self.metals.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(first.first(), self.metals.pk)
+
+    def test_save_and_delete_invalidate(self):
+        """Test saving or deleting a model refreshes cached results"""
+        list(Category.objects.order_by('pk').cached(60))
+        self.plastic.name_ar = 'بلاستيك صلب'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.plastic.save()
+        self.assertEqual(list(Category.objects.order_by('pk').cached(60))[0].name_ar, 'بلاستيك صلب')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.metals.delete()
+        self.assertEqual(list(Category.objects.order_by('pk').cached(60)), [self.plastic])
+
+    def test_bulk_writes_invalidate(self):
+        """Test update(), bulk_update() and bulk_create() refresh cached results"""
+        def titles():
+            return list(Item.objects.order_by('pk').values_list('title', flat=True).cached(60))
+
+        self.assertEqual(titles(), ['زجاجات'])
+        with self.captureOnCommitCallbacks(execute=True):
+            Item.objects.filter(pk=self.item.pk).update(title='علب')
+        self.assertEqual(titles(), ['علب'])
+
+        self.item.title = 'كرتون'
+        with self.captureOnCommitCallbacks(execute=True):
+            Item.objects.bulk_update([self.item], ['title'])
+        self.assertEqual(titles(), ['كرتون'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Item.objects.bulk_create([Item(
+                title='حديد', description='وصف', category=self.metals, user=self.user,
+                condition='scrap', quantity=1, unit='كيلو', location='القاهرة',
+            )])
+        self.assertEqual(titles(), ['كرتون', 'حديد'])
+
+    def test_related_model_write_invalidates_join(self):
+        """Test a select_related query follows writes to the joined model"""
+        queryset = Item.objects.select_related('category').order_by('pk')
+        self.assertEqual(list(queryset.cached(60))[0].category.name_ar, 'بلاستيك')
+        self.plastic.name_ar = 'بلاستيك صلب'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.plastic.save()
+        self.assertEqual(list(queryset.cached(60))[0].category.name_ar, 'بلاستيك صلب')
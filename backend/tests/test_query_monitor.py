@@ -0,0 +1,94 @@
+"""
+Query Monitor Tests
+Testing SQL fingerprints, per-fingerprint aggregates and periodic flushes
+"""
+from unittest import mock
+from django.db import connection
+from django.test import TestCase, SimpleTestCase
+from items.models import Category
+from performance import decorators
+from performance.decorators import monitor_query_performance
+from performance.models import QueryPerformance
+from performance.queries import QueryMonitor, normalize_sql
+from performance.utils import DatabaseOptimizer
+
+class NormalizeSqlTests(SimpleTestCase):
+    """Test literals and value lists are stripped from fingerprints"""
+
+    def test_literals_removed(self):
+        """Test strings, numbers and placeholders become ?"""
+        self.assertEqual(
+            normalize_sql("SELECT * FROM t1 WHERE name = 'O''Brien' AND id = 42 AND price > %s"),
+            "SELECT * FROM t1 WHERE name = ? AND id = ? AND price > ?",
+        )
+
+    def test_lists_collapsed(self):
+        """Test IN lists and multi-row VALUES share one fingerprint"""
+        self.assertEqual(
+            normalize_sql('SELECT "id" FROM "items_item" WHERE "id" IN (%s, %s,\n %s)'),
+            normalize_sql('SELECT "id" FROM "items_item" WHERE "id" IN (1, 2)'),
+        )
+        self.assertEqual(
+            normalize_sql('INSERT INTO "t" ("a", "b") VALUES (%s, %s), (%s, %s), (%s, %s)'),
+            'INSERT INTO "t" ("a", "b") VALUES (?, ?), ...',
+        )
+
+class QueryMonitorTests(TestCase):
+    """Test queries are aggregated in memory and flushed as one row per fingerprint"""
+
+    def setUp(self):
+        self.monitor = QueryMonitor(flush_interval=0, slow_threshold=0)
+
+    def test_aggregates_per_fingerprint(self):
+        """Test the same query with different values is counted together"""
+        with connection.execute_wrapper(self.monitor):
+            for name in ('plastic', 'metals', 'paper'):
+                Category.objects.filter(name=name).first()
+        stats = list(self.monitor.pending().values())
+        self.assertEqual(len(stats), 1)
+        self.assertEqual(stats[0]['calls'], 3)
+        self.assertEqual(stats[0]['table'], 'items_category')
+        self.assertLessEqual(stats[0]['p50'], stats[0]['p99'])
+        self.assertNotIn('plastic', stats[0]['sql'])
+
+    def test_flush_writes_rows_with_plan(self):
+        """Test a flush writes aggregates and an EXPLAIN plan for slow selects"""
+        with connection.execute_wrapper(self.monitor):
+            Category.objects.filter(name='plastic').count()
+            Category.objects.filter(name='metals').count()
+            Category.objects.create(name='paper', name_ar='ورق')
+        self.assertEqual(self.monitor.flush(), 2)
+        self.assertEqual(self.monitor.pending(), {})
+
+        select = QueryPerformance.objects.get(query_sql__startswith='SELECT')
+        self.assertEqual(select.calls, 2)
+        self.assertTrue(select.explain_plan)
+        self.assertFalse(QueryPerformance.objects.get(query_sql__startswith='INSERT').explain_plan)
+        # the flush's own queries are not measured
+        self.assertEqual(self.monitor.pending(), {})
+
+        slow = DatabaseOptimizer.get_slow_queries(threshold=-1)
+        self.assertEqual({row['total_calls'] for row in slow}, {1, 2})
+
+    def test_flush_cap_keeps_remainder(self):
+        """Test fingerprints beyond max_fingerprints are kept for the next flush"""
+        self.monitor.max_fingerprints = 1
+        with connection.execute_wrapper(self.monitor):
+            Category.objects.filter(name='plastic').count()
+            Category.objects.create(name='paper', name_ar='ورق')
+        with self.assertLogs('performance', 'WARNING'):
+            self.assertEqual(self.monitor.flush(), 1)
+        self.assertEqual(len(self.monitor.pending()), 1)
+        self.assertEqual(self.monitor.flush(), 1)
+        self.assertEqual(QueryPerformance.objects.count(), 2)
+
+    def test_decorator_captures_sql(self):
+        """Test monitor_query_performance records the function's real queries"""
+        @monitor_query_performance
+        def load():
+            return list(Category.objects.all())
+
+        with mock.patch.object(decorators, 'query_monitor', self.monitor):
+            load()
+        [stats] = self.monitor.pending().values()
+        self.assertTrue(stats['sql'].startswith('SELECT'))
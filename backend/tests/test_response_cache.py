@@ -0,0 +1,105 @@
+"""
+Response Cache Tests
+Testing full cached responses, variants, compression and invalidation tags
+"""
+import gzip
+from django.core.cache import cache
+from django.test import TestCase, RequestFactory
+from django.contrib.auth import get_user_model
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from items.models import Category
+from performance.cache import advanced_cache
+from performance.decorators import cache_api_response
+
+User = get_user_model()
+
+calls = []
+
+@cache_api_response(timeout=60, models=(Category,))
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def category_names(request):
+    calls.append(request.user.pk)
+    response = Response({
+        'names': list(Category.objects.order_by('pk').values_list('name', flat=True)),
+        'user': request.user.pk,
+    })
+    response['X-Total'] = str(len(response.data['names']))
+    return response
+
+@cache_api_response(timeout=60, scope='public')
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def not_found(request):
+    calls.append(None)
+    return Response({'error': 'not found'}, status=404)
+
+class ResponseCacheTests(TestCase):
+    """Test GET responses are replayed with status, headers and body"""
+
+    def setUp(self):
+        cache.clear()
+        advanced_cache.clear_local()
+        calls.clear()
+        self.factory = RequestFactory()
+        Category.objects.create(name='plastic', name_ar='بلاستيك')
+
+    def get(self, view=category_names, **extra):
+        extra.setdefault('HTTP_ACCEPT', 'application/json')
+        return view(self.factory.get('/api/test/', extra.pop('data', {}), **extra))
+
+    def test_hit_replays_full_response(self):
+        """Test a hit skips the view and keeps status, headers and content"""
+        miss = self.get()
+        self.assertEqual(miss['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            hit = self.get()
+        self.assertEqual(calls, [None])
+        self.assertEqual(hit['X-Cache'], 'HIT')
+        self.assertEqual(hit.status_code, 200)
+        self.assertEqual(hit.content, miss.content)
+        self.assertEqual((hit['Content-Type'], hit['X-Total']), (miss['Content-Type'], '1'))
+        self.assertIn('Accept-Encoding', hit['Vary'])
+
+    def test_gzip_body_for_accepting_clients(self):
+        """Test the stored gzip body is sent as-is only when accepted"""
+        plain = self.get()
+        compressed = self.get(HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(compressed.content), plain.content)
+        for refused in ('gzip;q=0, identity', 'identity'):
+            response = self.get(HTTP_ACCEPT_ENCODING=refused)
+            self.assertEqual(response['X-Cache'], 'HIT')
+            self.assertFalse(response.has_header('Content-Encoding'))
+            self.assertEqual(response.content, plain.content)
+
+    def test_variants(self):
+        """Test query params, Accept and the authenticated user get separate entries"""
+        self.get()
+        self.get(data={'page': 2})
+        self.assertIn(b'\n', self.get(HTTP_ACCEPT='application/json; indent=2').content)
+        user = User.objects.create_user(username='buyer', password='TestPass123!')
+        request = self.factory.get('/api/test/', HTTP_ACCEPT='application/json')
+        request.user = user
+        self.assertEqual(category_names(request)['X-Cache'], 'MISS')
+        self.assertEqual(len(calls), 4)
+        self.get(data={'page': 2})
+        self.assertEqual(len(calls), 4)
+
+    def test_model_and_view_invalidation(self):
+        """Test writes to the view's models and view.invalidate() drop the entry"""
+        self.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name='metals', name_ar='معادن')
+        self.assertEqual(self.get()['X-Total'], '2')
+        category_names.invalidate()
+        self.get()
+        self.assertEqual(len(calls), 3)
+
+    def test_errors_not_cached(self):
+        """Test non-200 responses always run the view"""
+        self.assertEqual(self.get(not_found).status_code, 404)
+        self.get(not_found)
+        self.assertEqual(len(calls), 2)
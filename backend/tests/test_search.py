@@ -0,0 +1,153 @@
+"""
+Search Index Tests
+Testing Arabic normalization, the inverted index and search endpoints
+"""
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from rest_framework import status
+from items.models import Item, Category, SearchPosting
+from items.search import normalize_text, analyze, search_index
+from items.stats import platform_stats
+
+User = get_user_model()
+
+class NormalizationTests(TestCase):
+    """Test Arabic text normalization and stemming"""
+
+    def test_diacritics_removed(self):
+        """Test tashkeel and tatweel removal"""
+        self.assertEqual(normalize_text('بَلاسْتِيـــك'), 'بلاستيك')
+
+    def test_letter_variants_unified(self):
+        """Test alef, yaa and taa marbuta variants"""
+        self.assertEqual(normalize_text('أإآ'), 'ااا')
+        self.assertEqual(normalize_text('مستشفى'), 'مستشفي')
+        self.assertEqual(normalize_text('خردة'), 'خرده')
+
+    def test_light_stemming(self):
+        """Test prefix and suffix stripping"""
+        self.assertEqual(analyze('والبلاستيك'), analyze('بلاستيك'))
+        self.assertEqual(analyze('البلاستيكية'), analyze('بلاستيك'))
+        self.assertEqual(analyze('Bottles'), ['bottle'])
+
+    def test_stopwords_dropped(self):
+        """Test stopword removal"""
+        self.assertEqual(analyze('حديد في المخزن'), analyze('حديد مخزن'))
+
+class SearchIndexTests(TestCase):
+    """Test incremental index maintenance and ranking"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='seller', password='TestPass123!')
+        self.plastic = Category.objects.create(name='plastic', name_ar='بلاستيك')
+        self.metals = Category.objects.create(name='metals', name_ar='معادن')
+
+    def create_item(self, **kwargs):
+        data = {
+            'title': 'عنصر',
+            'description': 'وصف',
+            'category': self.plastic,
+            'user': self.user,
+            'condition': 'good',
+            'quantity': 1,
+            'unit': 'كجم',
+            'location': 'القاهرة',
+            'status': 'active',
+        }
+        data.update(kwargs)
+        return Item.objects.create(**data)
+
+    def test_item_indexed_on_save(self):
+        """Test postings are created for active items"""
+        item = self.create_item(title='زجاجات بلاستيكية')
+        self.assertTrue(SearchPosting.objects.filter(item=item).exists())
+        self.assertEqual(search_index.search_ids('زجاجات'), [item.id])
+
+    def test_inactive_item_removed_from_index(self):
+        """Test status change removes postings"""
+        item = self.create_item(title='حديد خردة')
+        item.status = 'sold'
+        item.save()
+        self.assertFalse(SearchPosting.objects.filter(item=item).exists())
+        self.assertEqual(search_index.search_ids('حديد'), [])
+
+    def test_counter_update_skips_reindex(self):
+        """Test saving non-indexed fields leaves postings untouched"""
+        item = self.create_item(title='حديد')
+        posting_ids = set(SearchPosting.objects.filter(item=item).values_list('id', flat=True))
+        item.views += 1
+        item.save(update_fields=['views'])
+        self.assertEqual(
+            set(SearchPosting.objects.filter(item=item).values_list('id', flat=True)),
+            posting_ids
+        )
+
+    def test_title_match_ranked_first(self):
+        """Test title matches outrank description matches"""
+        in_description = self.create_item(title='كرتون', description='فيه نحاس قديم')
+        in_title = self.create_item(title='نحاس أحمر', description='كابلات')
+        self.assertEqual(search_index.search_ids('نحاس'), [in_title.id, in_description.id])
+
+    def test_document_count_from_stats(self):
+        """Test scoring reads the active item count from platform stats, not the items table"""
+        item = self.create_item(title='نحاس')
+        platform_stats.cached_dict()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(search_index.search_ids('نحاس'), [item.id])
+        self.assertFalse(any('"items_item"' in query['sql'] for query in queries.captured_queries))
+
+    def test_category_name_searchable(self):
+        """Test category names are indexed"""
+        item = self.create_item(title='قطع', category=self.metals)
+        self.assertEqual(search_index.search_ids('معادن'), [item.id])
+
+    def test_filters_intersect_postings(self):
+        """Test filters are applied as posting-list intersections"""
+        cairo = self.create_item(title='ألومنيوم', condition='scrap')
+        self.create_item(title='ألومنيوم', condition='good', location='الإسكندرية')
+        self.assertEqual(
+            search_index.search_ids('الومنيوم', {'condition': 'scrap'}),
+            [cairo.id]
+        )
+        self.assertEqual(
+            search_index.search_ids('الومنيوم', {'location': 'القاهره'}),
+            [cairo.id]
+        )
+
+    def test_search_endpoint(self):
+        """Test search_items uses the index"""
+        item = self.create_item(title='بلاستيك مضغوط')
+        self.create_item(title='خشب', category=self.metals)
+        client = APIClient()
+        response = client.get(reverse('search_items'), {'q': 'البلاستيك', 'category': 'plastic'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['id'] for row in response.data['results']], [item.id])
+
+    def test_stopword_query_falls_back_to_text_match(self):
+        """Test queries without index terms still match titles and descriptions"""
+        item = self.create_item(title='The Wall', description='old bricks')
+        self.create_item(title='خشب')
+        client = APIClient()
+        response = client.get(reverse('search_items'), {'q': 'the'})
+        self.assertEqual([row['id'] for row in response.data['results']], [item.id])
+        response = client.get(reverse('item_list'), {'search': 'the'}, HTTP_ACCEPT='application/json')
+        self.assertEqual([row['id'] for row in response.data['results']], [item.id])
+
+    def test_list_search_ranked_and_paginated(self):
+        """Test ?search= on the item list filters by subquery, ranks by relevance and paginates"""
+        in_description = self.create_item(title='كرتون', description='فيه نحاس قديم')
+        in_title = self.create_item(title='نحاس أحمر', description='كابلات')
+        self.create_item(title='خشب')
+        client = APIClient()
+        response = client.get(reverse('item_list'), {'search': 'نحاس', 'page_size': 1}, HTTP_ACCEPT='application/json')
+        self.assertEqual([row['id'] for row in response.data['results']], [in_title.id])
+        response = client.get(response.data['next'], HTTP_ACCEPT='application/json')
+        self.assertEqual([row['id'] for row in response.data['results']], [in_description.id])
+        self.assertIsNone(response.data['next'])
+
+        response = client.get(reverse('item_facets'), {'search': 'نحاس'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -0,0 +1,151 @@
+"""
+Search Result Cache Tests
+Testing normalized result keys, term-generation invalidation and cached page rows
+"""
+from unittest import mock
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from items import views
+from items.counters import item_counters
+from items.models import Item, Category
+from items.search import search_index, search_results
+
+User = get_user_model()
+
+class SearchResultCacheTests(TestCase):
+    """Test cached result ids follow index changes of matching items only"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='seller', password='TestPass123!')
+        self.plastic = Category.objects.create(name='plastic', name_ar='بلاستيك')
+        self.metals = Category.objects.create(name='metals', name_ar='معادن')
+
+    def create(self, title, category=None, **kwargs):
+        data = dict(
+            title=title, description='وصف', category=category or self.plastic, user=self.user,
+            condition='good', quantity=1, unit='كيلو', location='القاهرة', status='active',
+        )
+        data.update(kwargs)
+        with self.captureOnCommitCallbacks(execute=True):
+            return Item.objects.create(**data)
+
+    def ids(self, query, **filters):
+        return [item_id for item_id, _ in search_results.get_or_search(search_index, query, filters)]
+
+    def test_normalized_query_hits(self):
+        """Test word order and diacritics share one cached result"""
+        item = self.create('حديد خردة')
+        self.assertEqual(self.ids('حديد خردة'), [item.id])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.ids('خُردة  الحديد'), [item.id])
+
+    def test_unrelated_change_keeps_result(self):
+        """Test items without the query terms do not invalidate it"""
+        item = self.create('حديد خردة', category=self.metals)
+        self.ids('حديد')
+        self.create('زجاجات مياه')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.ids('حديد'), [item.id])
+
+    def test_matching_changes_invalidate(self):
+        """Test new, edited and sold items with the terms refresh the result"""
+        first = self.create('حديد خردة', category=self.metals)
+        self.assertEqual(self.ids('حديد'), [first.id])
+        second = self.create('حديد تسليح', category=self.metals)
+        self.assertEqual(set(self.ids('حديد')), {first.id, second.id})
+
+        first.title = 'نحاس'
+        with self.captureOnCommitCallbacks(execute=True):
+            first.save()
+        self.assertEqual(self.ids('حديد'), [second.id])
+
+        second.status = 'sold'
+        with self.captureOnCommitCallbacks(execute=True):
+            second.save()
+        self.assertEqual(self.ids('حديد'), [])
+
+    def test_deleted_item_invalidates(self):
+        """Test deleting an item refreshes results for its terms"""
+        item = self.create('حديد خردة', category=self.metals)
+        self.assertEqual(self.ids('حديد'), [item.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            item.delete()
+        self.assertEqual(self.ids('حديد'), [])
+
+    def test_filter_change_invalidates(self):
+        """Test a changed filter value refreshes results for the item's terms"""
+        item = self.create('حديد خردة', category=self.metals)
+        self.assertEqual(self.ids('حديد', condition='scrap'), [])
+        item.condition = 'scrap'
+        with self.captureOnCommitCallbacks(execute=True):
+            item.save()
+        self.assertEqual(self.ids('حديد', condition='scrap'), [item.id])
+
+class SearchPageRowsTests(TestCase):
+    """Test search pages are hydrated from cached item rows"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='seller', password='TestPass123!')
+        self.category = Category.objects.create(name='plastic', name_ar='بلاستيك')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.items = [
+                Item.objects.create(
+                    title=f'بلاستيك {index}', description='وصف', category=self.category, user=self.user,
+                    condition='good', quantity=1, unit='كيلو', location='القاهرة', status='active',
+                )
+                for index in range(3)
+            ]
+
+    def tearDown(self):
+        item_counters.flush()
+
+    def search(self, **params):
+        return self.client.get(reverse('search_items'), dict({'q': 'بلاستيك'}, **params))
+
+    def test_same_output_as_serializer(self):
+        """Test cached rows render like ItemListSerializer"""
+        fast = self.search()
+        with mock.patch.object(views, 'accepts_fast_json', return_value=False):
+            regular = self.search()
+        self.assertEqual(fast.content, regular.content)
+        self.assertEqual(len(fast.json()['results']), 3)
+
+    def test_rows_cached_and_invalidated(self):
+        """Test repeated pages skip the item query until an item changes"""
+        self.search()
+        with self.assertNumQueries(0):
+            self.search()
+
+        item = self.items[0]
+        item.title = 'بلاستيك مقوى'
+        with self.captureOnCommitCallbacks(execute=True):
+            item.save()
+        titles = {row['id']: row['title'] for row in self.search().json()['results']}
+        self.assertEqual(titles[item.id], 'بلاستيك مقوى')
+
+    def test_category_rename_refreshes_rows(self):
+        """Test nested category data is not served stale"""
+        self.search()
+        self.category.name_ar = 'بلاستيك صلب'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.save()
+        rows = self.search().json()['results']
+        self.assertEqual({row['category']['name_ar'] for row in rows}, {'بلاستيك صلب'})
+
+    def test_counters_visible(self):
+        """Test pending and flushed views show on cached rows"""
+        self.search()
+        item_counters.incr(self.items[0].id, 'views', 2)
+        views_by_id = {row['id']: row['views'] for row in self.search().json()['results']}
+        self.assertEqual(views_by_id[self.items[0].id], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            item_counters.flush()
+        views_by_id = {row['id']: row['views'] for row in self.search().json()['results']}
+        self.assertEqual(views_by_id[self.items[0].id], 2)
@@ -0,0 +1,80 @@
+"""
+Platform Stats Tests
+Testing the materialized statistics row
+"""
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from items.models import Item, Category, PlatformStats
+from items.stats import platform_stats
+from performance.cache import advanced_cache
+
+User = get_user_model()
+
+class PlatformStatsTests(TestCase):
+    """Test signal deltas against a full recount"""
+
+    def setUp(self):
+        cache.clear()
+        advanced_cache.clear_local()
+        self.category = Category.objects.create(name='glass', name_ar='زجاج')
+        self.seller = User.objects.create_user(username='seller', password='TestPass123!')
+        self.other = User.objects.create_user(username='other', password='TestPass123!')
+
+    def create(self, user, status='active'):
+        return Item.objects.create(
+            title='زجاج',
+            description='زجاج مكسور',
+            category=self.category,
+            user=user,
+            condition='scrap',
+            quantity=1,
+            unit='كجم',
+            location='طنطا',
+            status=status,
+        )
+
+    def assertMatchesRecount(self):
+        self.assertEqual(platform_stats.as_dict(), platform_stats.count_all())
+
+    def test_deltas_follow_changes(self):
+        """Test creates, status changes and deletes keep the row exact"""
+        first = self.create(self.seller)
+        second = self.create(self.seller, status='pending')
+        self.create(self.other)
+        self.create(self.other)
+        self.assertMatchesRecount()
+
+        second.status = 'sold'
+        second.save()
+        first.delete()
+        self.assertMatchesRecount()
+        self.assertEqual(platform_stats.as_dict()['completed_deals'], 1)
+
+        self.other.delete()
+        self.seller.is_active = False
+        self.seller.save()
+        self.assertMatchesRecount()
+
+    def test_endpoint_reads_single_row(self):
+        """Test the stats endpoint runs one query"""
+        self.create(self.seller)
+        client = APIClient()
+        with self.assertNumQueries(1):
+            response = client.get(reverse('stats'))
+        self.assertEqual(response.data['total_items'], 1)
+        self.assertEqual(response.data['total_users'], 1)
+        self.assertEqual(response.data['registered_users'], 2)
+
+        # الطلبات التالية من الكاش حتى تحديثه في الخلفية
+        with self.assertNumQueries(0):
+            self.assertEqual(client.get(reverse('stats')).data['total_items'], 1)
+
+    def test_reconcile_repairs_drift(self):
+        """Test the recount overwrites a drifted row"""
+        self.create(self.seller)
+        PlatformStats.objects.update(total_items=42)
+        platform_stats.reconcile()
+        self.assertMatchesRecount()